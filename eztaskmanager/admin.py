@@ -40,7 +40,7 @@ class AppCommandAdmin(admin.ModelAdmin):
     list_editable = ("active",)
     list_filter = ("active",)
     ordering = ("app_name", "name")
-    readonly_fields = ("app_name", "name")
+    readonly_fields = ("app_name", "name", "fingerprint")
     search_field = ("app_name", "name")
 
     def has_add_permission(self, request, obj=None):
@@ -159,11 +159,14 @@ class LaunchReportAdmin(LaunchReportMixin, admin.ModelAdmin):
         "task",
         "invocation_result",
         "invocation_datetime",
+        "attempt",
+        "retry_of",
+        "cancel_requested_at",
         "log_tail_html",
         "n_log_errors",
         "n_log_warnings",
     )
-    list_display = ("task", "invocation_result", "invocation_datetime")
+    list_display = ("task", "invocation_result", "invocation_datetime", "attempt")
     list_filter = ("invocation_result",)
     ordering = ("-invocation_datetime", "-id")
     search_field = ("task__name", "task__status", "task__spooler_id")
@@ -186,7 +189,7 @@ class LaunchReportInline(LaunchReportMixin, admin.TabularInline):
     max_num = 5
     extra = 0
     fields = readonly_fields = (
-        "invocation_result", "invocation_datetime", "log_tail_html", "n_log_errors", "n_log_warnings",
+        "invocation_result", "invocation_datetime", "attempt", "log_tail_html", "n_log_errors", "n_log_warnings",
     )
     ordering = [
         "-invocation_datetime",
@@ -238,7 +241,7 @@ class TaskCategoryAdmin(admin.ModelAdmin):
     """Admin options for task categories."""
 
     inlines = [TaskInline]
-    list_display = ("name",)
+    list_display = ("name", "queue", "priority", "job_timeout", "max_concurrency")
 
 
 @admin.register(Task)
@@ -250,7 +253,7 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
     removing the DB record.
     """
 
-    actions = ["launch_tasks", "stop_tasks"]
+    actions = ["launch_tasks", "stop_tasks", "cancel_tasks", "spread_tasks"]
     change_form_template = "admin/custom_changeform.html"
     inlines = [LaunchReportInline]
     list_display = (
@@ -263,17 +266,35 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         "repetition",
     )
     list_display_links = ('name_desc',)
-    list_filter = ("status", "cached_last_invocation_result", "category")
+    list_filter = ("status", "cached_last_invocation_result", "category", "queue")
     ordering = ("-cached_last_invocation_datetime",)
     fieldsets = (
         (
             "Definition",
             {"fields": ("name", "command", "arguments", "category", "note")},
         ),
+        (
+            "Execution",
+            {"fields": (
+                "queue", "priority", "job_timeout", ("memory_limit", "cpu_time_limit"), ("result_ttl", "failure_ttl"),
+                "overlap_policy"
+            )},
+        ),
+        (
+            "Retries",
+            {"fields": (
+                "retry_max_attempts", ("retry_delay", "retry_backoff", "retry_jitter"), "retry_on"
+            )},
+        ),
+        (
+            "Circuit breaker",
+            {"fields": (("circuit_breaker_threshold", "circuit_probe_interval"),)},
+        ),
         (
             "Scheduling",
             {"fields": (
-                "scheduling", "repetition_period", "repetition_rate", "cached_next_ride", "scheduled_job_id"
+                "scheduling", "repetition_period", "repetition_rate", "cron_string", "schedule_jitter",
+                ("misfire_policy", "misfire_grace_time"), "cached_next_ride", "scheduled_job_id"
             )},
         ),
         (
@@ -285,6 +306,8 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
                     "last_result_with_logviewer_link",
                     "cached_last_invocation_n_errors",
                     "cached_last_invocation_n_warnings",
+                    "n_skipped_runs",
+                    ("circuit_state", "n_consecutive_failures"),
                 )
             },
         ),
@@ -297,6 +320,9 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         "cached_next_ride",
         "cached_last_invocation_n_errors",
         "cached_last_invocation_n_warnings",
+        "n_skipped_runs",
+        "circuit_state",
+        "n_consecutive_failures",
     )
     save_as = True
     save_on_top = True
@@ -324,8 +350,34 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
 
     stop_tasks.short_description = 'Stop selected tasks'
 
+    def cancel_tasks(self, request, queryset):
+        """Ask the running runs of many tasks to stop."""
+        from eztaskmanager.services.cancellation import request_cancellation
+
+        n_runs = sum(request_cancellation(task) for task in queryset)
+        self.message_user(request, f'{n_runs} running runs asked to stop.')
+
+    cancel_tasks.short_description = 'Cancel the running runs of selected tasks'
+
+    def spread_tasks(self, request, queryset):
+        """Spread the scheduling of many periodic tasks across their interval, re-launching the scheduled ones."""
+        from eztaskmanager.services.queues import get_task_service
+        from eztaskmanager.services.scheduling import spread_schedules
+
+        service = get_task_service()
+        tasks = spread_schedules(queryset)
+        for task in tasks:
+            task.save()
+            if task.status == Task.STATUS_SCHEDULED:
+                service.add(task)
+        self.message_user(request, f'{len(tasks)} periodic tasks spread.')
+
+    spread_tasks.short_description = 'Spread the scheduling of selected periodic tasks'
+
     def repetition(self, obj):
         """Return the string representation of the repetition."""
+        if obj.cron_string:
+            return obj.cron_string
         if obj.repetition_rate and obj.repetition_period:
             return f"{obj.repetition_rate} {obj.repetition_period}"
         else:
@@ -399,4 +451,16 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
                 request, "This task was successfully stopped", level=messages.SUCCESS
             )
             return HttpResponseRedirect(".")
+        if "_cancel-task" in request.POST:
+            from eztaskmanager.services.cancellation import request_cancellation
+
+            if request_cancellation(task):
+                self.message_user(
+                    request, "The running task was asked to stop", level=messages.SUCCESS
+                )
+            else:
+                self.message_user(
+                    request, "This task is not running", level=messages.WARNING
+                )
+            return HttpResponseRedirect(".")
         return super().response_change(request, task)
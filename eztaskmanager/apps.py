@@ -3,9 +3,14 @@ from pydoc import locate
 from typing import Dict, Type
 
 from django.apps import AppConfig
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 
-from eztaskmanager.settings import EZTASKMANAGER_NOTIFICATION_HANDLERS
+from eztaskmanager.settings import (EZTASKMANAGER_EXECUTION_MODE,
+                                    EZTASKMANAGER_HEARTBEAT_INTERVAL,
+                                    EZTASKMANAGER_HEARTBEAT_TIMEOUT,
+                                    EZTASKMANAGER_NOTIFICATION_HANDLERS,
+                                    EZTASKMANAGER_QUEUE_SERVICE_TYPE)
 
 
 class EZTaskmanagerConfig(AppConfig):
@@ -39,6 +44,34 @@ class EZTaskmanagerConfig(AppConfig):
                 if instance:
                     self.notification_handlers[name] = instance
 
+    def _check_heartbeat_settings(self) -> None:
+        """
+        Check that a running task is not considered lost between two of its heartbeats.
+
+        Raises:
+            ImproperlyConfigured: If the heartbeats are enabled, and their timeout is not longer than their interval.
+        """
+        if EZTASKMANAGER_HEARTBEAT_INTERVAL and EZTASKMANAGER_HEARTBEAT_TIMEOUT <= EZTASKMANAGER_HEARTBEAT_INTERVAL:
+            raise ImproperlyConfigured(
+                f"EZTASKMANAGER_HEARTBEAT_TIMEOUT ({EZTASKMANAGER_HEARTBEAT_TIMEOUT}) must be longer than "
+                f"EZTASKMANAGER_HEARTBEAT_INTERVAL ({EZTASKMANAGER_HEARTBEAT_INTERVAL})"
+            )
+
+    def _check_execution_mode(self) -> None:
+        """
+        Check that the commands are executed in subprocesses only by long-lived workers.
+
+        Raises:
+            ImproperlyConfigured: If the 'subprocess' execution mode is set with the RQ service, whose workers
+                fork a process for each job, that would start a whole pool of command processes for a single run.
+        """
+        if EZTASKMANAGER_EXECUTION_MODE == "subprocess" and EZTASKMANAGER_QUEUE_SERVICE_TYPE == "RQ":
+            raise ImproperlyConfigured(
+                "EZTASKMANAGER_EXECUTION_MODE = 'subprocess' is not supported by the RQ queue service"
+            )
+
     def ready(self) -> None:
         """Run stuff when Django starts."""
+        self._check_heartbeat_settings()
+        self._check_execution_mode()
         self._register_notification_handlers()
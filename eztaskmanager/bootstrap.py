@@ -0,0 +1,19 @@
+"""Entry point of the child processes of the pool of command processes (see services.subprocesses).
+
+The children are not forked from the worker, whose threads may hold locks at any time, but started
+by a fork server, or spawned, in a new interpreter: Django is set up before importing the services.
+This module is imported by the children before Django is set up, so it imports nothing else.
+"""
+import django
+
+
+def serve_commands(conn, preloaded=()):
+    """Set Django up, and execute the commands received over the pipe, preloading the commands of the worker."""
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from eztaskmanager.services.subprocesses import serve
+
+    serve(conn, preloaded)
@@ -0,0 +1,58 @@
+"""Workers benchmark command."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eztaskmanager.models import AppCommand
+from eztaskmanager.services.benchmarks import MODES, benchmark
+
+
+class Command(BaseCommand):
+    """Compare the throughput of the worker modes, executing the same jobs through the database queue."""
+
+    help = "Compare the throughput of the worker modes, executing the same jobs through the database queue"
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "modes", nargs="*",
+            help=f"Worker modes to compare (all of {', '.join(MODES)} if none is given)",
+        )
+        parser.add_argument(
+            "--command",
+            default="test_logging_command", dest="command",
+            help="Name of the collected command executed by the jobs",
+        )
+        parser.add_argument(
+            "--arguments",
+            default="--info=benchmark, --sleep=0.05", dest="arguments",
+            help="Arguments of the command, as in the tasks (the default simulates an I/O bound command)",
+        )
+        parser.add_argument(
+            "-n", "--jobs",
+            default=100, type=int, dest="jobs",
+            help="Number of jobs executed by each mode",
+        )
+        parser.add_argument(
+            "-c", "--concurrency",
+            default=4, type=int, dest="concurrency",
+            help="Number of jobs executed at once: processes for fork, threads for threads and warm",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        if not AppCommand.objects.filter(name=options["command"]).exists():
+            raise CommandError(f"Command {options['command']} not found, run collectcommands first")
+        for mode in options["modes"]:
+            if mode not in MODES:
+                raise CommandError(f"Unknown mode {mode}, choose among {', '.join(MODES)}")
+        # in the order of MODES, so that the forked processes do not inherit commands imported by the others
+        for mode in [m for m in MODES if m in options["modes"]] or MODES:
+            result = benchmark(
+                mode, options["command"], arguments=options["arguments"],
+                n_jobs=options["jobs"], concurrency=options["concurrency"],
+            )
+            self.stdout.write(
+                f"{result['mode']:>10}: {result['jobs']} jobs in {result['seconds']:.2f}s, "
+                f"{result['jobs_per_second']:.1f} jobs/s, {result['seconds_per_job'] * 1000:.1f} ms/job, "
+                f"startup {result['startup']:.2f}s"
+            )
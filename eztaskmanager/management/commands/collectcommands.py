@@ -3,11 +3,17 @@
 from django.core.management import get_commands
 
 from eztaskmanager.models import AppCommand
+from eztaskmanager.services.commands import collect_command_metadata
 from eztaskmanager.services.logger import LoggerEnabledCommand
 
 
 class Command(LoggerEnabledCommand):
-    """Collect all the available commands and sync them with the database."""
+    """
+    Collect all the available commands and sync them with the database.
+
+    The help text and the specs of the arguments of each command are stored with it, so that the
+    admin does not load the commands; they are collected again when the module of a command changes.
+    """
 
     help = "Collect all the available commands and sync them with the database"
 
@@ -19,11 +25,22 @@ class Command(LoggerEnabledCommand):
             dest="excludecore",
             help="Exclude django.core commands from the list",
         )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            dest="force",
+            help="Collect the metadata of all the commands, even if their modules did not change",
+        )
 
     def handle(self, *args, **options):
         """Handle method."""
         exclude_core = options.get("excludecore", False)
         for command, app in get_commands().items():
             if not (exclude_core and app.startswith("django")):
-                AppCommand.objects.get_or_create(name=command, app_name=app)
-                self.stdout.write(f"{app}: {command}")
+                app_command, _created = AppCommand.objects.get_or_create(name=command, app_name=app)
+                try:
+                    refreshed = collect_command_metadata(app_command, force=options.get("force", False))
+                except Exception as e:
+                    self.stderr.write(f"{app}: {command} (metadata not collected: {e})")
+                    continue
+                self.stdout.write(f"{app}: {command}" + (" (metadata collected)" if refreshed else ""))
@@ -0,0 +1,69 @@
+"""Database queue worker command."""
+
+from django.core.management.base import BaseCommand
+
+from eztaskmanager.services.workers import run_workers
+from eztaskmanager.settings import (EZTASKMANAGER_DBQUEUE_POLL_INTERVAL,
+                                    EZTASKMANAGER_WORKER_MAX_JOBS,
+                                    EZTASKMANAGER_WORKER_MAX_MEMORY)
+
+
+class Command(BaseCommand):
+    """Start workers consuming the database queue (EZTASKMANAGER_QUEUE_SERVICE_TYPE = 'DB')."""
+
+    help = "Start workers consuming the database queue"
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "queues", nargs="*",
+            help="Names of the queues to consume (all queues if none is given)",
+        )
+        parser.add_argument(
+            "-c", "--concurrency",
+            default=1, type=int, dest="concurrency",
+            help="Number of concurrent consumers, each in its own process",
+        )
+        parser.add_argument(
+            "-t", "--threads",
+            default=1, type=int, dest="threads",
+            help="Number of jobs executed at once by each consumer, in a pool of threads (for I/O bound tasks)",
+        )
+        parser.add_argument(
+            "--preload",
+            action="store_true", dest="preload",
+            help="Import the active commands once at startup, instead of at each job",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            default=EZTASKMANAGER_WORKER_MAX_JOBS, type=int, dest="max_jobs",
+            help="Recycle each consumer after this number of jobs",
+        )
+        parser.add_argument(
+            "--max-memory",
+            default=EZTASKMANAGER_WORKER_MAX_MEMORY, type=float, dest="max_memory",
+            help="Recycle each consumer when its resident memory grows past this number of MB",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            default=EZTASKMANAGER_DBQUEUE_POLL_INTERVAL, type=float, dest="poll_interval",
+            help="Seconds to sleep when no jobs are due",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true", dest="burst",
+            help="Stop when no more jobs are due",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        run_workers(
+            concurrency=options["concurrency"],
+            threads=options["threads"],
+            preload=options["preload"],
+            max_jobs=options["max_jobs"],
+            max_memory=options["max_memory"],
+            poll_interval=options["poll_interval"],
+            burst=options["burst"],
+            queues=options["queues"],
+        )
@@ -0,0 +1,35 @@
+"""Reaper of the runs lost by dead workers."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from eztaskmanager.services.heartbeats import reap_lost_runs
+from eztaskmanager.settings import EZTASKMANAGER_HEARTBEAT_INTERVAL
+
+
+class Command(BaseCommand):
+    """Mark the running tasks whose heartbeat expired as LOST, restoring their status."""
+
+    help = "Mark the running tasks whose heartbeat expired as LOST, restoring their status"
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "--loop",
+            action="store_true", dest="loop",
+            help="Keep reaping, every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            default=EZTASKMANAGER_HEARTBEAT_INTERVAL, type=float, dest="interval",
+            help="Seconds between two reaps, with --loop",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        while True:
+            for report in reap_lost_runs():
+                self.stdout.write(f"Lost: {report.task} (report {report.id}, worker {report.worker_id or '?'})")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
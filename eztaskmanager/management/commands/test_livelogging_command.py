@@ -13,6 +13,7 @@ class Command(LoggerEnabledCommand):
 
     Generates 10 numbers per second, logging them at debug level.
     Every 100 iterations generates an info message, showing global process.
+    Stops when the run is cancelled.
 
     """
 
@@ -38,6 +39,9 @@ class Command(LoggerEnabledCommand):
         """Handle method."""
         random.seed()
         for n in range(1, options['limit'] + 1):
+            if self.should_stop():
+                self.logger.info(f"Cancelled at {n}/{options['limit']}")
+                break
             self.logger.debug(f"A debug message was generated ({n})")
             err_dice = random.randint(0, 100)
             warn_dice = random.randint(0, 100)
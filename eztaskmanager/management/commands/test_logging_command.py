@@ -1,4 +1,5 @@
 """Test logging command."""
+import time
 
 from django.core import management
 
@@ -26,6 +27,9 @@ class Command(LoggerEnabledCommand):
         parser.add_argument(
             "--error", default="ND", dest="error", help="Test error output"
         )
+        parser.add_argument(
+            "--sleep", default=0, type=float, dest="sleep", help="Seconds to sleep, simulating I/O"
+        )
         parser.add_argument(
             "--test-embedded",
             action="store_true",
@@ -43,6 +47,8 @@ class Command(LoggerEnabledCommand):
             self.logger.warning(str(options["warning"]))
         if options["error"] != "ND":
             self.logger.error(str(options["error"]))
+        if options["sleep"]:
+            time.sleep(options["sleep"])
         if options["test_embedded"]:
             management.call_command(
                 "test_logging_command",
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0003_alter_task_cached_next_ride_alter_task_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_at', models.DateTimeField(db_index=True, verbose_name='Execution time')),
+                ('interval', models.PositiveIntegerField(blank=True, help_text='Interval in seconds between executions, for periodic jobs', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queued_jobs', to='eztaskmanager.task')),
+            ],
+            options={
+                'verbose_name': 'Queued job',
+                'verbose_name_plural': 'Queued jobs',
+                'ordering': ['run_at', 'id'],
+            },
+        ),
+    ]
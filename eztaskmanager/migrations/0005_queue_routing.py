@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0004_queuedjob'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='queuedjob',
+            options={'ordering': ['-priority', 'run_at', 'id'], 'verbose_name': 'Queued job', 'verbose_name_plural': 'Queued jobs'},
+        ),
+        migrations.AddField(
+            model_name='queuedjob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'LOW'), (5, 'NORMAL'), (9, 'HIGH')], default=5),
+        ),
+        migrations.AddField(
+            model_name='queuedjob',
+            name='queue',
+            field=models.CharField(db_index=True, default='default', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'LOW'), (5, 'NORMAL'), (9, 'HIGH')], help_text="High priority jobs are put in front of their queue. Defaults to the category's priority.", null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='queue',
+            field=models.CharField(blank=True, help_text="The queue this task is sent to, so that it can be consumed by dedicated workers. Defaults to the category's queue.", max_length=100),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='priority',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'LOW'), (5, 'NORMAL'), (9, 'HIGH')], help_text='The priority of the tasks of this category, unless set in the task', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='queue',
+            field=models.CharField(blank=True, help_text='The queue the tasks of this category are sent to, unless set in the task', max_length=100),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0005_queue_routing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='failure_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text="Seconds the failed jobs are kept by the queue backend. Defaults to the category's TTL.", null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='job_timeout',
+            field=models.PositiveIntegerField(blank=True, help_text="Max execution time in seconds, the run is stopped and reported as TIMEOUT when it expires. Defaults to the category's timeout.", null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='result_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text="Seconds the job results are kept by the queue backend. Defaults to the category's TTL.", null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='failure_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds the failed jobs of the tasks of this category are kept, unless set in the task', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='job_timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Max execution time of the tasks of this category, in seconds, unless set in the task', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='result_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds the results of the tasks of this category are kept, unless set in the task', null=True),
+        ),
+        migrations.AlterField(
+            model_name='launchreport',
+            name='invocation_result',
+            field=models.CharField(choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='cached_last_invocation_result',
+            field=models.CharField(blank=True, choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT')], max_length=20, null=True, verbose_name='Last result'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0006_job_timeouts_and_ttls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='n_skipped_runs',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Runs skipped or coalesced, because the previous one was still running', verbose_name='Skipped runs'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='overlap_policy',
+            field=models.CharField(choices=[('allow', 'Allow parallel runs'), ('skip', 'Skip the run'), ('coalesce', 'Coalesce into one pending run')], default='allow', help_text='What to do with a run starting while the previous one is still running: run both, skip the new one, or run it once the previous one is finished.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='pending_run',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether a run was coalesced, to be executed when the running one is finished'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='running_since',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Start of the run holding the lock of the task, if any', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0007_overlap_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskcategory',
+            name='max_concurrency',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Max number of tasks of this category running at once, on all workers (unlimited if empty)', null=True),
+        ),
+        migrations.CreateModel(
+            name='ConcurrencySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100)),
+                ('index', models.PositiveSmallIntegerField()),
+                ('holder', models.CharField(blank=True, max_length=64)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Concurrency slot',
+                'verbose_name_plural': 'Concurrency slots',
+                'unique_together': {('scope', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0008_concurrency_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='schedule_jitter',
+            field=models.PositiveIntegerField(blank=True, help_text='Max seconds of random delay added to the scheduling when the task is launched, so that tasks scheduled at round times do not all start together. Defaults to EZTASKMANAGER_SCHEDULE_JITTER.', null=True),
+        ),
+    ]
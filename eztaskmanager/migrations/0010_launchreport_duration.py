@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0009_schedule_jitter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='launchreport',
+            name='duration',
+            field=models.FloatField(blank=True, help_text='Duration of the execution, in seconds', null=True),
+        ),
+    ]
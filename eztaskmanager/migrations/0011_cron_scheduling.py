@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+import eztaskmanager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0010_launchreport_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedjob',
+            name='cron_string',
+            field=models.CharField(blank=True, help_text='Cron expression of the executions, for cron jobs', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='cron_string',
+            field=models.CharField(blank=True, help_text='A cron expression, evaluated in UTC, e.g. "0 2 * * 1-5" for weekdays at 02:00. Overrides the repetition period and rate; the task is not run before the initial scheduling, if set.', max_length=100, validators=[eztaskmanager.models.validate_cron_string], verbose_name='Cron expression'),
+        ),
+    ]
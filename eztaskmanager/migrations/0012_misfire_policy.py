@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0011_cron_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='launchreport',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, help_text='Details of the execution, e.g. the runs coalesced into it after a misfire'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='catchup_runs',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Missed runs still to be executed, one after the other, with the RUN ALL misfire policy'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='misfire_grace_time',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds a run can be late without being a misfire. Defaults to EZTASKMANAGER_MISFIRE_GRACE_TIME.', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='misfire_policy',
+            field=models.CharField(choices=[('run_once', 'Run once'), ('run_all', 'Run all the missed runs, one after the other'), ('skip', 'Skip')], default='run_once', help_text='What to do with a run of a recurring task starting later than the grace time, e.g. after an outage of the scheduler or of the workers', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='n_skipped_runs',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Runs skipped or coalesced, because the previous one was still running, or misfired', verbose_name='Skipped runs'),
+        ),
+    ]
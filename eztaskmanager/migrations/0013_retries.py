@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:38
+
+import django.core.validators
+import django.db.models.deletion
+import eztaskmanager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0012_misfire_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='launchreport',
+            name='attempt',
+            field=models.PositiveIntegerField(default=1, help_text='The attempt of the run: 1 for the first execution, 2 for the first retry, ...'),
+        ),
+        migrations.AddField(
+            model_name='launchreport',
+            name='retry_of',
+            field=models.ForeignKey(blank=True, help_text='The report of the first attempt, for the retries of a run', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retries', to='eztaskmanager.launchreport'),
+        ),
+        migrations.AddField(
+            model_name='queuedjob',
+            name='kwargs',
+            field=models.JSONField(blank=True, default=dict, help_text='Keyword arguments of the execution, e.g. the attempt of a retried run'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='retry_backoff',
+            field=models.FloatField(default=2.0, help_text='Multiplier of the delay at each further retry', validators=[django.core.validators.MinValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='retry_delay',
+            field=models.PositiveIntegerField(default=60, help_text='Seconds before the first retry'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='retry_jitter',
+            field=models.PositiveIntegerField(default=0, help_text='Max seconds of random delay added to each retry'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='retry_max_attempts',
+            field=models.PositiveIntegerField(default=1, help_text='Max number of attempts of a run, including the first one (1 means no retries)', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Max attempts'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='retry_on',
+            field=models.CharField(blank=True, default='failed,timeout', help_text='Comma-separated results of the runs to be retried, among: failed, timeout, errors, warnings', max_length=100, validators=[eztaskmanager.models.validate_retryable_results], verbose_name='Retryable results'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0013_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='circuit_breaker_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='Consecutive failures after which the schedule of a recurring task is suspended, and replaced by probe runs. Defaults to EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD; 0 disables it.', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='circuit_probe_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds between the probe runs of a suspended task. Defaults to EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL.', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='circuit_state',
+            field=models.CharField(choices=[('closed', 'Closed'), ('open', 'Open'), ('half_open', 'Half open')], default='closed', editable=False, help_text='Open when the schedule is suspended after too many consecutive failures, half open while a probe run is running', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='n_consecutive_failures',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Runs failed or timed out since the last successful one', verbose_name='Consecutive failures'),
+        ),
+    ]
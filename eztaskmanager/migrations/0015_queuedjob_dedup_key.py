@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0014_circuit_breaker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedjob',
+            name='dedup_key',
+            field=models.CharField(blank=True, help_text='Set on the immediate runs launched from the admin, so that a task is queued only once', max_length=100, null=True, unique=True),
+        ),
+    ]
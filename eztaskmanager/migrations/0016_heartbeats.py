@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0015_queuedjob_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='launchreport',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Last heartbeat of the run, while it is running', null=True),
+        ),
+        migrations.AddField(
+            model_name='launchreport',
+            name='worker_id',
+            field=models.CharField(blank=True, help_text='The worker executing the run: host, process and thread', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='launchreport',
+            name='invocation_result',
+            field=models.CharField(choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='cached_last_invocation_result',
+            field=models.CharField(blank=True, choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST')], max_length=20, null=True, verbose_name='Last result'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0016_heartbeats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='cpu_time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text="CPU seconds a run can use; the run is stopped and reported as LIMIT EXCEEDED past them. Defaults to the category's limit.", null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='memory_limit',
+            field=models.PositiveIntegerField(blank=True, help_text="MB of memory a run can allocate, beyond the memory of its worker when it starts; the run is stopped and reported as LIMIT EXCEEDED past it. Defaults to the category's limit.", null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='cpu_time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='CPU seconds a run of the tasks of this category can use, unless set in the task', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='memory_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='MB of memory a run of the tasks of this category can allocate, unless set in the task', null=True),
+        ),
+        migrations.AlterField(
+            model_name='launchreport',
+            name='invocation_result',
+            field=models.CharField(choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST'), ('limit', 'LIMIT EXCEEDED')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='cached_last_invocation_result',
+            field=models.CharField(blank=True, choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST'), ('limit', 'LIMIT EXCEEDED')], max_length=20, null=True, verbose_name='Last result'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0017_resource_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='launchreport',
+            name='cancel_requested_at',
+            field=models.DateTimeField(blank=True, help_text='When the cancellation of the run was requested', null=True),
+        ),
+        migrations.AlterField(
+            model_name='launchreport',
+            name='invocation_result',
+            field=models.CharField(choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST'), ('limit', 'LIMIT EXCEEDED'), ('cancelled', 'CANCELLED')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='cached_last_invocation_result',
+            field=models.CharField(blank=True, choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT'), ('lost', 'LOST'), ('limit', 'LIMIT EXCEEDED'), ('cancelled', 'CANCELLED')], max_length=20, null=True, verbose_name='Last result'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:13
+
+import re
+
+from django.db import migrations, models
+
+
+def parse_arguments(value):
+    # a frozen copy of eztaskmanager.models.parse_arguments, as it was when the field was added
+    res = {}
+    if not value or value.strip() == "":
+        return []
+    for arg in re.split(r"\s*,\s*", value):
+        arg_chunks = [x for x in re.split(r"\s*=\s*|\s+", arg) if x]
+        if arg_chunks:
+            res[arg_chunks[0]] = " ".join(arg_chunks[1:]) or None
+    return [[argument, params] for argument, params in res.items()]
+
+
+def parse_task_arguments(apps, schema_editor):
+    Task = apps.get_model("eztaskmanager", "Task")
+    for task in Task.objects.exclude(arguments=""):
+        Task.objects.filter(pk=task.pk).update(parsed_arguments=parse_arguments(task.arguments))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0018_cancellation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='parsed_arguments',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='The arguments, split into [argument, parameters] pairs when the task is saved'),
+        ),
+        migrations.RunPython(parse_task_arguments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eztaskmanager', '0019_parsed_arguments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appcommand',
+            name='cached_arguments',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='The specs of the arguments of the command, as collected by collectcommands'),
+        ),
+        migrations.AddField(
+            model_name='appcommand',
+            name='cached_help_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='appcommand',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the module of the command, when its metadata were collected', max_length=64),
+        ),
+    ]
@@ -1,13 +1,91 @@
 import re
-from io import StringIO
+from datetime import timedelta
 
+from crontab import CronTab
 from django.apps import apps
-from django.core.management import load_command_class
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, load_command_class
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
-from eztaskmanager.settings import EZTASKMANAGER_N_REPORTS_INLINE
+from eztaskmanager.settings import (EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL,
+                                    EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD,
+                                    EZTASKMANAGER_CPU_TIME_LIMIT,
+                                    EZTASKMANAGER_DEFAULT_QUEUE,
+                                    EZTASKMANAGER_FAILURE_TTL,
+                                    EZTASKMANAGER_JOB_TIMEOUT,
+                                    EZTASKMANAGER_MEMORY_LIMIT,
+                                    EZTASKMANAGER_N_REPORTS_INLINE,
+                                    EZTASKMANAGER_RESULT_TTL,
+                                    EZTASKMANAGER_SCHEDULE_JITTER)
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 9
+PRIORITY_CHOICES = (
+    (PRIORITY_LOW, "LOW"),
+    (PRIORITY_NORMAL, "NORMAL"),
+    (PRIORITY_HIGH, "HIGH"),
+)
+
+
+class InvalidStatusTransition(ValueError):
+    """A task can not move between two statuses."""
+
+
+class UnsavedTaskState(ValueError):
+    """The state or runtime fields of a task were changed in memory, and would not be written by save()."""
+
+
+def validate_cron_string(value):
+    """Validate a cron expression."""
+    try:
+        CronTab(value)
+    except ValueError as e:
+        raise ValidationError(_("Invalid cron expression: %(error)s"), params={"error": e})
+
+
+def validate_retryable_results(value):
+    """Validate a comma-separated list of results of the reports."""
+    results = {result for result, _label in LaunchReport.RESULT_CHOICES if result}
+    invalid = [r for r in parse_retryable_results(value) if r not in results]
+    if invalid:
+        raise ValidationError(
+            _("Invalid results: %(invalid)s. Choose among: %(results)s"),
+            params={"invalid": ", ".join(invalid), "results": ", ".join(sorted(results))}
+        )
+
+
+def parse_retryable_results(value):
+    """Return the results in a comma-separated list."""
+    return [r.strip().lower() for r in value.split(",") if r.strip()]
+
+
+def parse_arguments(value):
+    """
+    Split the arguments of a task into [argument, parameters] pairs, in order.
+
+    Arguments are separated by commas, and their parameters by blanks or an equals sign;
+    the parameters of an argument are joined with a blank, or None if there are none.
+    eg: "-f, --secondarg param1 param2, --thirdarg=pippo" gives
+    [["-f", None], ["--secondarg", "param1 param2"], ["--thirdarg", "pippo"]]
+    """
+    res = {}
+    if not value or value.strip() == "":
+        return []
+    for arg in re.split(r"\s*,\s*", value):
+        arg_chunks = [x for x in re.split(r"\s*=\s*|\s+", arg) if x]
+        if arg_chunks:
+            res[arg_chunks[0]] = " ".join(arg_chunks[1:]) or None
+    return [[argument, params] for argument, params in res.items()]
+
+
+def next_cron_time(cron_string, after):
+    """Return the first fire time of a cron expression, evaluated in UTC, strictly after `after`."""
+    return CronTab(cron_string).next(now=after.astimezone(timezone.timezone.utc), return_datetime=True)
 
 
 class AppCommand(models.Model):
@@ -16,6 +94,15 @@ class AppCommand(models.Model):
     name = models.CharField(max_length=100)
     app_name = models.CharField(max_length=100)
     active = models.BooleanField(default=True)
+    fingerprint = models.CharField(
+        max_length=64, blank=True, editable=False,
+        help_text=_("SHA-256 of the module of the command, when its metadata were collected")
+    )
+    cached_help_text = models.TextField(blank=True, editable=False)
+    cached_arguments = models.JSONField(
+        default=list, blank=True, editable=False,
+        help_text=_("The specs of the arguments of the command, as collected by collectcommands")
+    )
 
     def get_command_class(self):
         """Get the command class."""
@@ -23,11 +110,20 @@ class AppCommand(models.Model):
 
     @property
     def help_text(self):
-        """Get the command help text."""
-        output = StringIO()
-        command_class = self.get_command_class()
-        command_class.create_parser("", self.name).print_help(file=output)
-        return output.getvalue()
+        """Get the command help text, as collected by collectcommands."""
+        return self.cached_help_text
+
+    def get_parser(self):
+        """
+        Return a parser of the arguments of the command, rebuilt from the collected specs, without loading it.
+
+        Returns None if the metadata of the command were not collected.
+        """
+        from eztaskmanager.services.commands import build_parser
+
+        if not self.cached_arguments:
+            return None
+        return build_parser(self.name, self.cached_arguments)
 
     def __str__(self):
         """Return the string representation of the app command."""
@@ -48,12 +144,20 @@ class LaunchReport(models.Model):
     RESULT_FAILED = "failed"
     RESULT_ERRORS = "errors"
     RESULT_WARNINGS = "warnings"
+    RESULT_TIMEOUT = "timeout"
+    RESULT_LOST = "lost"
+    RESULT_LIMIT = "limit"
+    RESULT_CANCELLED = "cancelled"
     RESULT_CHOICES = (
         (RESULT_NO, "---"),
         (RESULT_OK, "OK"),
         (RESULT_FAILED, "FAILED"),
         (RESULT_ERRORS, "ERRORS"),
         (RESULT_WARNINGS, "WARNINGS"),
+        (RESULT_TIMEOUT, "TIMEOUT"),
+        (RESULT_LOST, "LOST"),
+        (RESULT_LIMIT, "LIMIT EXCEEDED"),
+        (RESULT_CANCELLED, "CANCELLED"),
     )
 
     task = models.ForeignKey("Task", on_delete=models.CASCADE)
@@ -61,6 +165,33 @@ class LaunchReport(models.Model):
         max_length=20, choices=RESULT_CHOICES, default=RESULT_NO
     )
     invocation_datetime = models.DateTimeField(auto_now_add=True)
+    duration = models.FloatField(
+        blank=True, null=True,
+        help_text=_("Duration of the execution, in seconds")
+    )
+    metadata = models.JSONField(
+        default=dict, blank=True,
+        help_text=_("Details of the execution, e.g. the runs coalesced into it after a misfire")
+    )
+    retry_of = models.ForeignKey(
+        "self", on_delete=models.SET_NULL, blank=True, null=True, related_name="retries",
+        help_text=_("The report of the first attempt, for the retries of a run")
+    )
+    attempt = models.PositiveIntegerField(
+        default=1, help_text=_("The attempt of the run: 1 for the first execution, 2 for the first retry, ...")
+    )
+    heartbeat_at = models.DateTimeField(
+        blank=True, null=True, db_index=True,
+        help_text=_("Last heartbeat of the run, while it is running")
+    )
+    worker_id = models.CharField(
+        max_length=255, blank=True,
+        help_text=_("The worker executing the run: host, process and thread")
+    )
+    cancel_requested_at = models.DateTimeField(
+        blank=True, null=True,
+        help_text=_("When the cancellation of the run was requested")
+    )
 
     @classmethod
     def get_notification_handlers(cls):
@@ -116,14 +247,14 @@ class LaunchReport(models.Model):
         """Return the number of log lines for this report."""
         return self.logs.count()
 
-    @property
+    @cached_property
     def n_log_errors(self):
-        """Return the number of errors in this report."""
+        """Return the number of errors in this report, counted once per instance."""
         return self.logs.filter(level="ERROR").count()
 
-    @property
+    @cached_property
     def n_log_warnings(self):
-        """Return the number of warnings in this report."""
+        """Return the number of warnings in this report, counted once per instance."""
         return self.logs.filter(level="WARNING").count()
 
     def delete(self, *args, **kwargs):
@@ -165,6 +296,38 @@ class TaskCategory(models.Model):
     """A task category, used to group tasks when numbers go up."""
 
     name = models.CharField(max_length=255)
+    queue = models.CharField(
+        max_length=100, blank=True,
+        help_text=_("The queue the tasks of this category are sent to, unless set in the task")
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=PRIORITY_CHOICES, blank=True, null=True,
+        help_text=_("The priority of the tasks of this category, unless set in the task")
+    )
+    job_timeout = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Max execution time of the tasks of this category, in seconds, unless set in the task")
+    )
+    memory_limit = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("MB of memory a run of the tasks of this category can allocate, unless set in the task")
+    )
+    cpu_time_limit = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("CPU seconds a run of the tasks of this category can use, unless set in the task")
+    )
+    result_ttl = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Seconds the results of the tasks of this category are kept, unless set in the task")
+    )
+    failure_ttl = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Seconds the failed jobs of the tasks of this category are kept, unless set in the task")
+    )
+    max_concurrency = models.PositiveSmallIntegerField(
+        blank=True, null=True,
+        help_text=_("Max number of tasks of this category running at once, on all workers (unlimited if empty)")
+    )
 
     def __str__(self):
         """Return the string representation of the task category."""
@@ -182,6 +345,12 @@ class Task(models.Model):
     A command related task.
 
     Represents a management command with a defined set of arguments (
+
+    The STATE_FIELDS (the status, the scheduled job id and the cache) are written by transition(),
+    and the RUNTIME_FIELDS by the atomic updates of the runs: a plain save() of an existing task leaves
+    them alone, so that a stale copy does not overwrite them, and raises UnsavedTaskState if one of them
+    was changed in memory, instead of losing the change. They are saved only if listed in `update_fields`.
+    The edits of the other fields still in memory are written by transition(), with the status.
     """
 
     REPETITION_PERIOD_MINUTE = "minute"
@@ -206,6 +375,50 @@ class Task(models.Model):
         (STATUS_SCHEDULED, "SCHEDULED"),
         (STATUS_STARTED, "STARTED"),
     )
+    # the statuses each status can move to, see transition()
+    STATUS_TRANSITIONS = {
+        STATUS_IDLE: (STATUS_IDLE, STATUS_SPOOLED, STATUS_SCHEDULED, STATUS_STARTED),
+        STATUS_SPOOLED: (STATUS_IDLE, STATUS_SCHEDULED, STATUS_STARTED),
+        STATUS_SCHEDULED: (STATUS_IDLE, STATUS_SCHEDULED, STATUS_STARTED),
+        STATUS_STARTED: (STATUS_IDLE, STATUS_SPOOLED, STATUS_SCHEDULED),
+    }
+
+    OVERLAP_ALLOW = "allow"
+    OVERLAP_SKIP = "skip"
+    OVERLAP_COALESCE = "coalesce"
+    OVERLAP_CHOICES = (
+        (OVERLAP_ALLOW, _("Allow parallel runs")),
+        (OVERLAP_SKIP, _("Skip the run")),
+        (OVERLAP_COALESCE, _("Coalesce into one pending run")),
+    )
+
+    MISFIRE_RUN_ONCE = "run_once"
+    MISFIRE_RUN_ALL = "run_all"
+    MISFIRE_SKIP = "skip"
+    MISFIRE_CHOICES = (
+        (MISFIRE_RUN_ONCE, _("Run once")),
+        (MISFIRE_RUN_ALL, _("Run all the missed runs, one after the other")),
+        (MISFIRE_SKIP, _("Skip")),
+    )
+
+    CIRCUIT_CLOSED = "closed"
+    CIRCUIT_OPEN = "open"
+    CIRCUIT_HALF_OPEN = "half_open"
+    CIRCUIT_CHOICES = (
+        (CIRCUIT_CLOSED, _("Closed")),
+        (CIRCUIT_OPEN, _("Open")),
+        (CIRCUIT_HALF_OPEN, _("Half open")),
+    )
+
+    # fields changed only with atomic updates, by the runs of the task; left alone by save()
+    RUNTIME_FIELDS = (
+        "running_since", "pending_run", "n_skipped_runs", "catchup_runs", "n_consecutive_failures", "circuit_state"
+    )
+    # fields changed only by the status transitions and the runs, with their cache; left alone by save()
+    STATE_FIELDS = (
+        "status", "scheduled_job_id", "cached_last_invocation_datetime", "cached_last_invocation_result",
+        "cached_last_invocation_n_errors", "cached_last_invocation_n_warnings", "cached_next_ride",
+    )
 
     name = models.CharField(max_length=255)
     command = models.ForeignKey(
@@ -219,6 +432,10 @@ class Task(models.Model):
             "eg: -f, --secondarg param1 param2, --thirdarg=pippo, --thirdarg"
         ),
     )
+    parsed_arguments = models.JSONField(
+        default=list, blank=True, editable=False,
+        help_text=_("The arguments, split into [argument, parameters] pairs when the task is saved")
+    )
     category = models.ForeignKey(
         TaskCategory,
         on_delete=models.DO_NOTHING,
@@ -229,10 +446,136 @@ class Task(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_IDLE, editable=False
     )
+    queue = models.CharField(
+        max_length=100, blank=True,
+        help_text=_(
+            "The queue this task is sent to, so that it can be consumed by dedicated workers. "
+            "Defaults to the category's queue."
+        )
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=PRIORITY_CHOICES, blank=True, null=True,
+        help_text=_("High priority jobs are put in front of their queue. Defaults to the category's priority.")
+    )
+    job_timeout = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "Max execution time in seconds, the run is stopped and reported as TIMEOUT when it expires. "
+            "Defaults to the category's timeout."
+        )
+    )
+    memory_limit = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "MB of memory a run can allocate, beyond the memory of its worker when it starts; "
+            "the run is stopped and reported as LIMIT EXCEEDED past it. Defaults to the category's limit."
+        )
+    )
+    cpu_time_limit = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "CPU seconds a run can use; the run is stopped and reported as LIMIT EXCEEDED past them. "
+            "Defaults to the category's limit."
+        )
+    )
+    result_ttl = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Seconds the job results are kept by the queue backend. Defaults to the category's TTL.")
+    )
+    failure_ttl = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Seconds the failed jobs are kept by the queue backend. Defaults to the category's TTL.")
+    )
+    overlap_policy = models.CharField(
+        max_length=20, choices=OVERLAP_CHOICES, default=OVERLAP_ALLOW,
+        help_text=_(
+            "What to do with a run starting while the previous one is still running: "
+            "run both, skip the new one, or run it once the previous one is finished."
+        )
+    )
+    retry_max_attempts = models.PositiveIntegerField(
+        default=1, validators=[MinValueValidator(1)], verbose_name=_("Max attempts"),
+        help_text=_("Max number of attempts of a run, including the first one (1 means no retries)")
+    )
+    retry_delay = models.PositiveIntegerField(
+        default=60, help_text=_("Seconds before the first retry")
+    )
+    retry_backoff = models.FloatField(
+        default=2.0, validators=[MinValueValidator(1.0)],
+        help_text=_("Multiplier of the delay at each further retry")
+    )
+    retry_jitter = models.PositiveIntegerField(
+        default=0, help_text=_("Max seconds of random delay added to each retry")
+    )
+    retry_on = models.CharField(
+        max_length=100, default="failed,timeout", blank=True, validators=[validate_retryable_results],
+        verbose_name=_("Retryable results"),
+        help_text=_("Comma-separated results of the runs to be retried, among: failed, timeout, errors, warnings")
+    )
+    circuit_breaker_threshold = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "Consecutive failures after which the schedule of a recurring task is suspended, "
+            "and replaced by probe runs. Defaults to EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD; 0 disables it."
+        )
+    )
+    circuit_probe_interval = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "Seconds between the probe runs of a suspended task. "
+            "Defaults to EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL."
+        )
+    )
+    n_consecutive_failures = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Consecutive failures"),
+        help_text=_("Runs failed or timed out since the last successful one")
+    )
+    circuit_state = models.CharField(
+        max_length=20, choices=CIRCUIT_CHOICES, default=CIRCUIT_CLOSED, editable=False,
+        help_text=_(
+            "Open when the schedule is suspended after too many consecutive failures, "
+            "half open while a probe run is running"
+        )
+    )
+    running_since = models.DateTimeField(
+        blank=True, null=True, editable=False,
+        help_text=_("Start of the run holding the lock of the task, if any")
+    )
+    pending_run = models.BooleanField(
+        default=False, editable=False,
+        help_text=_("Whether a run was coalesced, to be executed when the running one is finished")
+    )
+    n_skipped_runs = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Skipped runs"),
+        help_text=_("Runs skipped or coalesced, because the previous one was still running, or misfired")
+    )
+    misfire_policy = models.CharField(
+        max_length=20, choices=MISFIRE_CHOICES, default=MISFIRE_RUN_ONCE,
+        help_text=_(
+            "What to do with a run of a recurring task starting later than the grace time, "
+            "e.g. after an outage of the scheduler or of the workers"
+        )
+    )
+    misfire_grace_time = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Seconds a run can be late without being a misfire. Defaults to EZTASKMANAGER_MISFIRE_GRACE_TIME.")
+    )
+    catchup_runs = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text=_("Missed runs still to be executed, one after the other, with the RUN ALL misfire policy")
+    )
     scheduling = models.DateTimeField(
         blank=True, null=True,
         verbose_name=_("Initial scheduling")
     )
+    schedule_jitter = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_(
+            "Max seconds of random delay added to the scheduling when the task is launched, "
+            "so that tasks scheduled at round times do not all start together. "
+            "Defaults to EZTASKMANAGER_SCHEDULE_JITTER."
+        )
+    )
 
     @property
     def scheduling_utc(self):
@@ -246,11 +589,36 @@ class Task(models.Model):
         max_length=20, choices=REPETITION_PERIOD_CHOICES, blank=True
     )
     repetition_rate = models.PositiveSmallIntegerField(blank=True, null=True)
+    cron_string = models.CharField(
+        max_length=100, blank=True, validators=[validate_cron_string],
+        verbose_name=_("Cron expression"),
+        help_text=_(
+            'A cron expression, evaluated in UTC, e.g. "0 2 * * 1-5" for weekdays at 02:00. '
+            "Overrides the repetition period and rate; the task is not run before the initial scheduling, if set."
+        )
+    )
 
     @property
     def is_periodic(self):
-        """A periodic task is such only if both repetition period and rate are set."""
-        return self.repetition_period is not None and self.repetition_rate is not None
+        """A periodic task is such only if both repetition period and rate are set, and there is no cron expression."""
+        return not self.cron_string and self.repetition_period is not None and self.repetition_rate is not None
+
+    @property
+    def is_cron(self):
+        """Whether the task is scheduled with a cron expression."""
+        return bool(self.cron_string)
+
+    @property
+    def is_recurring(self):
+        """Whether the task is executed repeatedly, at fixed intervals or following a cron expression."""
+        return self.is_periodic or self.is_cron
+
+    def next_cron_time(self, after=None):
+        """Return the next fire time of the cron expression, not before the initial scheduling."""
+        after = after or timezone.now()
+        if self.scheduling and self.scheduling_utc > after:
+            after = self.scheduling_utc - timedelta(microseconds=1)
+        return next_cron_time(self.cron_string, after)
 
     note = models.TextField(
         blank=True, null=True, help_text=_("A note on how this task is used.")
@@ -311,46 +679,85 @@ class Task(models.Model):
 
         return period_to_seconds[self.repetition_period] * self.repetition_rate
 
+    def _inherited(self, name, default=None):
+        """Return the value of a task field, falling back to the category's, then to `default`."""
+        value = getattr(self, name)
+        if value in (None, "") and self.category_id:
+            value = getattr(self.category, name)
+        return default if value in (None, "") else value
+
     @property
-    def _args_dict(self):
-        """
-        This method returns a dictionary containing arguments and their corresponding parameters.
+    def queue_name(self):
+        """The name of the queue the task is sent to."""
+        return self._inherited("queue", EZTASKMANAGER_DEFAULT_QUEUE)
 
-        It parses the 'arguments' attribute of the instance and splits it into individual arguments
-        * using a comma as a delimiter. Each argument is then further split into chunks using whitespace or
-          an equals sign as a separator. The first chunk is considered the argument name, while
-        * the second chunk, if present, is considered the parameter. The resulting arguments and parameters
-          are stored in the dictionary 'res'.
+    @property
+    def effective_priority(self):
+        """The priority of the task's jobs."""
+        return self._inherited("priority", PRIORITY_NORMAL)
 
-        Parameters:
-        - None
+    @property
+    def retryable_results(self):
+        """The results of the runs to be retried."""
+        return parse_retryable_results(self.retry_on)
 
-        Returns:
-        - res (dict): A dictionary containing argument-parameter pairs.
-          If the 'arguments' attribute is empty or consists of whitespace characters only,
-          an empty dictionary is returned.
+    @property
+    def effective_schedule_jitter(self):
+        """The max random delay added to the scheduling of the task, in seconds."""
+        if self.schedule_jitter is not None:
+            return self.schedule_jitter
+        return EZTASKMANAGER_SCHEDULE_JITTER
+
+    @property
+    def effective_circuit_breaker_threshold(self):
+        """The consecutive failures suspending the schedule of the task, 0 or None if disabled."""
+        if self.circuit_breaker_threshold is not None:
+            return self.circuit_breaker_threshold
+        return EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD
+
+    @property
+    def effective_circuit_probe_interval(self):
+        """The seconds between the probe runs of the task, while its circuit is open."""
+        return self.circuit_probe_interval or EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL
+
+    @property
+    def effective_job_timeout(self):
+        """The max execution time of the task's jobs, in seconds (None for the backend's default)."""
+        return self._inherited("job_timeout", EZTASKMANAGER_JOB_TIMEOUT)
+
+    @property
+    def effective_memory_limit(self):
+        """The MB of memory a run of the task can allocate (None if unlimited)."""
+        return self._inherited("memory_limit", EZTASKMANAGER_MEMORY_LIMIT)
+
+    @property
+    def effective_cpu_time_limit(self):
+        """The CPU seconds a run of the task can use (None if unlimited)."""
+        return self._inherited("cpu_time_limit", EZTASKMANAGER_CPU_TIME_LIMIT)
+
+    @property
+    def effective_result_ttl(self):
+        """The seconds the results of the task's jobs are kept (None for the backend's default)."""
+        return self._inherited("result_ttl", EZTASKMANAGER_RESULT_TTL)
+
+    @property
+    def effective_failure_ttl(self):
+        """The seconds the failed jobs of the task are kept (None for the backend's default)."""
+        return self._inherited("failure_ttl", EZTASKMANAGER_FAILURE_TTL)
+
+    @property
+    def _args_dict(self):
+        """
+        Return a dictionary of the arguments, with their parameters, as parsed when the task was saved.
 
         Example usage:
         ```
-        instance = MyClass()
-        arguments = "arg1, arg2=param2, arg3 = param3"
-        result = instance._args_dict()  # { 'arg1': None, 'arg2': 'param2', 'arg3': 'param3' }
+        task.arguments = "arg1, arg2=param2, arg3 = param3"
+        task.save()
+        result = task._args_dict  # { 'arg1': None, 'arg2': 'param2', 'arg3': 'param3' }
         ```
         """
-        res = {}
-        if not self.arguments or self.arguments.strip() == "":
-            return res
-        args = re.split(r"\s*,\s*", self.arguments)
-        for arg in args:
-            arg_chunks = [x for x in re.split(r"\s*=\s*|\s+", arg) if x]
-            argument = arg_chunks[0]
-            params = arg_chunks[1:] if len(arg_chunks) > 1 else None
-            if params and len(params) > 1:
-                params = ' '.join(params)
-            elif params:
-                params = params[0]
-            res[argument] = params
-        return res
+        return dict(self.parsed_arguments)
 
     @property
     def args(self):
@@ -369,7 +776,7 @@ class Task(models.Model):
     @property
     def complete_args(self):
         """
-        Returns a list containing all the non-null values from the dictionary of arguments.
+        Returns a list containing all the arguments and their non-null parameters, as parsed when the task was saved.
 
         Get all task args in order to avoid problems with required options.
 
@@ -378,16 +785,23 @@ class Task(models.Model):
         As suggested here:
         https://stackoverflow.com/questions/32036562/call-command-argument-is-required
         """
-        return list(
-            filter(
-                lambda x: x is not None,
-                (
-                    item
-                    for sublist in [(k, v) for k, v in self._args_dict.items()]
-                    for item in sublist
-                ),
-            )
-        )
+        return [item for pair in self.parsed_arguments for item in pair if item is not None]
+
+    def clean(self):
+        """Validate the arguments against the collected specs of the arguments of the command."""
+        super().clean()
+        self.parsed_arguments = parse_arguments(self.arguments)
+        parser = self.command.get_parser() if self.command_id else None
+        if parser is None:
+            # not collected, left to the workers
+            return
+        try:
+            parser.parse_args(self.complete_args)
+        except (CommandError, SystemExit) as e:
+            raise ValidationError({"arguments": ValidationError(
+                _("Invalid arguments for %(command)s: %(error)s"),
+                params={"command": self.command.name, "error": e}
+            )})
 
     def compute_cache(self):
         """Compute cached values for this task."""
@@ -408,20 +822,130 @@ class Task(models.Model):
             self.cached_last_invocation_n_warnings = None
             self.cached_next_ride = None
 
-        self.save()
+        self.save(update_fields=[f for f in self.STATE_FIELDS if f.startswith("cached_")])
+
+    def prune_reports(self, n: int = EZTASKMANAGER_N_REPORTS_INLINE, compute_cache: bool = True):
+        """
+        Delete all Task's LaunchReports except latest `n`.
 
-    def prune_reports(self, n: int = EZTASKMANAGER_N_REPORTS_INLINE):
-        """Delete all Task's LaunchReports except latest `n`."""
+        The reports are only deleted if there are more than `n`; the task cache is then
+        computed again, unless `compute_cache` is False.
+        """
         if n:
-            last_n_reports_ids = (
+            newest_pruned_ids = list(
                 LaunchReport.objects.filter(task=self)
-                .order_by("-id")[:n]
-                .values_list("id", flat=True)
+                .order_by("-id")
+                .values_list("id", flat=True)[n:n + 1]
             )
-            LaunchReport.objects.filter(task=self).exclude(
-                pk__in=list(last_n_reports_ids)
-            ).delete()
-            self.compute_cache()
+            if newest_pruned_ids:
+                LaunchReport.objects.filter(task=self, id__lte=newest_pruned_ids[0]).delete()
+            if compute_cache:
+                self.compute_cache()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Load a task, keeping the loaded values, to find the fields changed in memory."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if value is not models.DEFERRED
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        """Reload the fields of the task from the database, as its loaded values."""
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._keep_loaded_values(fields)
+
+    def _keep_loaded_values(self, names=None):
+        # the current values of the fields are now the ones in the database; all the loaded fields, if None
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if names is None:
+                keep = field.attname not in deferred
+            else:
+                keep = field.name in names or field.attname in names
+            if keep:
+                loaded[field.attname] = getattr(self, field.attname)
+
+    def changed_fields(self):
+        """Return the names of the fields changed in memory since the task was loaded or saved."""
+        loaded = getattr(self, "_loaded_values", {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def mark_written(self, **fields):
+        """Set the `fields` of the task, already written to the database, e.g. by an atomic update."""
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._keep_loaded_values(fields)
+
+    def reset_scheduled_job(self):
+        """Reset the scheduled job id, once its job is cancelled, unless a new job replaced it meanwhile."""
+        Task.objects.filter(pk=self.pk, scheduled_job_id=self.scheduled_job_id).update(scheduled_job_id=None)
+        self.mark_written(scheduled_job_id=None)
+
+    def transition(self, status, expected=None, **fields):
+        """
+        Move the task to `status`, with a conditional update on its current status.
+
+        The status and the given `fields` are written, with the edits of the other fields still in memory
+        (see changed_fields); if the task is no longer in the `expected` status, e.g. because a run
+        or the admin moved it meanwhile, nothing is written, and the in-memory task is left alone.
+
+        Args:
+            status: The new status.
+            expected: The status the task is moved from; its in-memory status, if not given.
+            **fields: The other fields written with the status, e.g. the scheduled job id.
+
+        Returns:
+            bool: Whether the task was moved.
+
+        Raises:
+            InvalidStatusTransition: If `status` can not be reached from `expected`.
+        """
+        expected = self.status if expected is None else expected
+        if status not in self.STATUS_TRANSITIONS[expected]:
+            raise InvalidStatusTransition(f"Task {self.pk} can not move from {expected} to {status}")
+        protected = (*self.RUNTIME_FIELDS, *self.STATE_FIELDS, *fields)
+        edits = {name: getattr(self, name) for name in self.changed_fields() if name not in protected}
+        if "arguments" in edits:
+            edits["parsed_arguments"] = parse_arguments(self.arguments)
+        if not Task.objects.filter(pk=self.pk, status=expected).update(status=status, **edits, **fields):
+            return False
+        self.mark_written(status=status, **edits, **fields)
+        return True
+
+    def save(self, *args, **kwargs):
+        """
+        Save the task, leaving alone the RUNTIME_FIELDS and STATE_FIELDS of existing records, unless listed.
+
+        The arguments are parsed into parsed_arguments whenever they are saved.
+
+        Raises:
+            UnsavedTaskState: If a RUNTIME_FIELDS or STATE_FIELDS of an existing record was changed in memory,
+                and is not listed in `update_fields`.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "arguments" in update_fields:
+            self.parsed_arguments = parse_arguments(self.arguments)
+            if update_fields is not None and "parsed_arguments" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "parsed_arguments"]
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            unsaved = [name for name in self.changed_fields() if name in self.RUNTIME_FIELDS + self.STATE_FIELDS]
+            if unsaved:
+                raise UnsavedTaskState(
+                    f"Task {self.pk}: {', '.join(unsaved)} can only be saved listed in update_fields, "
+                    f"or with transition()"
+                )
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.RUNTIME_FIELDS + self.STATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self._keep_loaded_values(kwargs.get("update_fields"))
 
     def __str__(self):
         """Return the string representation of the task."""
@@ -432,3 +956,88 @@ class Task(models.Model):
 
         verbose_name = _("Task")
         verbose_name_plural = _("Tasks")
+
+
+class QueuedJob(models.Model):
+    """
+    A job waiting in the database queue.
+
+    Used by the DatabaseTaskQueueService, as a broker-less alternative to Redis.
+    Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, when the database supports it.
+    One-off jobs are removed when claimed, periodic jobs are moved to their next execution time.
+    """
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="queued_jobs")
+    run_at = models.DateTimeField(db_index=True, verbose_name=_("Execution time"))
+    queue = models.CharField(max_length=100, default=EZTASKMANAGER_DEFAULT_QUEUE, db_index=True)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
+    interval = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text=_("Interval in seconds between executions, for periodic jobs")
+    )
+    cron_string = models.CharField(
+        max_length=100, blank=True,
+        help_text=_("Cron expression of the executions, for cron jobs")
+    )
+    kwargs = models.JSONField(
+        default=dict, blank=True,
+        help_text=_("Keyword arguments of the execution, e.g. the attempt of a retried run")
+    )
+    dedup_key = models.CharField(
+        max_length=100, blank=True, null=True, unique=True,
+        help_text=_("Set on the immediate runs launched from the admin, so that a task is queued only once")
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def is_periodic(self):
+        """A job is periodic when it has an interval or a cron expression."""
+        return bool(self.interval or self.cron_string)
+
+    def next_run_after(self, dt):
+        """Return the first execution time of a periodic job, strictly after `dt`, keeping the original phase."""
+        if self.run_at > dt:
+            return self.run_at
+        if self.cron_string:
+            return next_cron_time(self.cron_string, dt)
+        elapsed = (dt - self.run_at).total_seconds()
+        n_intervals = int(elapsed // self.interval) + 1
+        return self.run_at + timedelta(seconds=n_intervals * self.interval)
+
+    def __str__(self):
+        """Return the string representation of the queued job."""
+        return f"QueuedJob {self.id} - {self.task.name} at {self.run_at}"
+
+    class Meta:
+        """Django model options."""
+
+        ordering = ["-priority", "run_at", "id"]
+        verbose_name = _("Queued job")
+        verbose_name_plural = _("Queued jobs")
+
+
+class ConcurrencySlot(models.Model):
+    """
+    A slot of a distributed semaphore, limiting the number of tasks running at once.
+
+    A semaphore with limit N is made of the slots with index 0 to N-1 of its scope
+    (e.g. "global", or "category:<id>"). A run holds one slot of each of its scopes;
+    slots are taken and released with conditional updates, and expire, so that
+    slots held by crashed workers are eventually freed.
+    """
+
+    scope = models.CharField(max_length=100)
+    index = models.PositiveSmallIntegerField()
+    holder = models.CharField(max_length=64, blank=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        """Return the string representation of the slot."""
+        return f"{self.scope}[{self.index}]"
+
+    class Meta:
+        """Django model options."""
+
+        unique_together = ("scope", "index")
+        verbose_name = _("Concurrency slot")
+        verbose_name_plural = _("Concurrency slots")
@@ -1,101 +1,283 @@
+import datetime
 import logging
+import random
+import threading
 from typing import Optional
 
 from django.core.management import call_command
+from django.db.models import Count, F, Q
+from django.utils import timezone
 
 from eztaskmanager.models import LaunchReport, Task
-from eztaskmanager.services.logger import (DatabaseLogHandler,
+from eztaskmanager.services.cancellation import (RunCancelled,
+                                                 hard_stop_signal)
+from eztaskmanager.services.circuit import record_circuit_result, start_probe
+from eztaskmanager.services.heartbeats import Heartbeat, get_worker_id
+from eztaskmanager.services.limits import (ResourceLimitExceeded,
+                                           resource_limits)
+from eztaskmanager.services.locks import (acquire_concurrency_slots,
+                                          acquire_run_lock, record_skipped_run,
+                                          release_concurrency_slots,
+                                          release_run_lock)
+from eztaskmanager.services.logger import (get_task_logger, log_context,
                                            verbosity2loglevel)
 from eztaskmanager.services.notifications import emit_notifications
-from eztaskmanager.services.queues import get_task_service
+from eztaskmanager.services.preload import get_command
+from eztaskmanager.services.queues import (TIMEOUT_EXCEPTIONS,
+                                           get_task_service, time_limit)
+from eztaskmanager.services.retries import schedule_retry
+from eztaskmanager.services.scheduling import (add_catchup_runs,
+                                               check_misfire,
+                                               pop_catchup_run)
+from eztaskmanager.services.subprocesses import get_command_pool
+from eztaskmanager.settings import (EZTASKMANAGER_CONCURRENCY_RETRY_DELAY,
+                                    EZTASKMANAGER_EXECUTION_MODE,
+                                    EZTASKMANAGER_HEARTBEAT_INTERVAL)
 
+logger = logging.getLogger(__name__)
 
-def run_management_command(task_id: int):
+
+def run_management_command(task_id: int, enforce_timeout: bool = False, scheduled: bool = False,
+                           scheduled_at: Optional[datetime.datetime] = None, retry_of: Optional[int] = None,
+                           attempt: int = 1, probe: bool = False, fired_at: Optional[str] = None):
     """
     Execute a management command.
 
     Creates a LaunchReport for this execution.
+    If the job timeout of the task expires, the report's result is TIMEOUT.
+
+    Unless the overlap policy of the task is ALLOW, the run takes the run lock of the task;
+    if a previous run still holds it, the run is skipped (only counted, no report is created),
+    or coalesced into a pending run, enqueued when the previous one is finished.
+    A lock left by a crashed worker expires after the job timeout or EZTASKMANAGER_RUN_LOCK_TTL.
+
+    The command is executed holding a slot of the global and category concurrency semaphores;
+    when a limit is reached, the run is enqueued again after EZTASKMANAGER_CONCURRENCY_RETRY_DELAY
+    seconds (plus a random jitter, spreading the retries of the waiting runs).
+
+    A scheduled run of a recurring task starting later than its misfire grace time (e.g. after
+    an outage) is a misfire: the fires missed in the meantime have already been coalesced
+    into this run by the queue backend, and the misfire policy of the task decides whether
+    it is skipped, executed once, or executed followed by the missed runs, one after the other.
+    The details of the misfire are stored in the metadata of the report.
+
+    A run whose result is among the task's retryable results is enqueued again, after an
+    exponential backoff, until the task's max number of attempts is reached; the reports
+    of the retries are linked to the report of the first attempt.
+
+    After too many consecutive failures, the circuit breaker of a recurring task suspends
+    its schedule, replacing it with probe runs; the scheduled runs still firing in the
+    meantime are skipped. The first successful run restores the schedule.
+
+    While the command runs, the heartbeat of the report is refreshed, so that the run can be
+    recovered by the reaper (see heartbeats.reap_lost_runs) if the worker dies.
+
+    The bookkeeping of a plain run takes a fixed number of queries: the report and the task are
+    written with `update_fields`, and the log counts are read once, with the cancellation request.
 
     :param task_id: The task object representing the management command to be executed.
     :type task_id: int
+    :param enforce_timeout: Whether to enforce the job timeout here, for backends not enforcing it.
+    :type enforce_timeout: bool
+    :param scheduled: Whether the run was fired by the scheduler, rather than launched on demand.
+    :type scheduled: bool
+    :param scheduled_at: The time the run was scheduled at; defaults to the cached next ride of the task.
+    :type scheduled_at: datetime.datetime
+    :param retry_of: The id of the report of the first attempt, for the retries of a run.
+    :type retry_of: int
+    :param attempt: The attempt of the run, 1 for the first execution.
+    :type attempt: int
+    :param probe: Whether the run is a probe of a task suspended by its circuit breaker.
+    :type probe: bool
+    :param fired_at: The fire time, in ISO format, of a scheduled run deferred by the concurrency limits;
+      the run is executed as scheduled at that time, bypassing the checks of the backends on scheduled jobs.
+    :type fired_at: str
 
     :return: None
     """
     task: Optional[Task] = None
 
-    # Define your format
-    fmt = '%(asctime)s - %(levelname)s - %(message)s'
-    datefmt = '%m-%d-%Y %H:%M:%S'  # You can define the date format as per your requirement
-    formatter = logging.Formatter(fmt, datefmt)
+    # the records are routed to the report of the run by log_context
+    local_logger = get_task_logger()
 
-    local_logger = logging.getLogger("eztaskmanager.services.logger")
+    if fired_at:
+        # a scheduled run deferred by the concurrency limits is enqueued as an unscheduled job
+        scheduled, scheduled_at = True, datetime.datetime.fromisoformat(fired_at)
 
     # task re-hydration
     try:
-        task: Task = Task.objects.get(id=task_id)
-        local_logger.setLevel(verbosity2loglevel(int(task.options.get('verbosity', 1))))
+        task: Task = Task.objects.select_related("command", "category").get(id=task_id)
     except Task.DoesNotExist:
         local_logger.error(f"Task with id {task_id} not found")
     finally:
         local_logger.info('Finished')
 
+    # the slots are taken first, so that a deferred run is enqueued again as it was received
+    slots_holder = None
+    if task is not None:
+        slots_holder = acquire_concurrency_slots(task)
+        if slots_holder is None:
+            delay = EZTASKMANAGER_CONCURRENCY_RETRY_DELAY * (1 + random.random() / 2)
+            fire_time = (scheduled_at or task.cached_next_ride) if scheduled else None
+            run_kwargs = {
+                "probe": probe, "retry_of": retry_of, "attempt": attempt if attempt > 1 else None,
+                "fired_at": fire_time.isoformat() if fire_time else None,
+            }
+            get_task_service().enqueue(
+                task, at=timezone.now() + datetime.timedelta(seconds=delay),
+                **{name: value for name, value in run_kwargs.items() if value}
+            )
+            logger.info(f"Task {task_id} reached its concurrency limit, run deferred by {delay:.0f} seconds")
+            return
+
+    if task is not None and probe and not start_probe(task):
+        release_concurrency_slots(slots_holder)
+        logger.info(f"Task {task_id} circuit is not open, probe dropped")
+        return
+    if task is not None and scheduled and task.circuit_state != Task.CIRCUIT_CLOSED:
+        release_concurrency_slots(slots_holder)
+        Task.objects.filter(pk=task.pk).update(n_skipped_runs=F("n_skipped_runs") + 1)
+        logger.info(f"Task {task_id} is suspended by its circuit breaker, run skipped")
+        return
+
+    misfire = None
+    if task is not None and scheduled and task.is_recurring:
+        misfire = check_misfire(task, scheduled_at or task.cached_next_ride)
+        if misfire and task.misfire_policy == Task.MISFIRE_SKIP:
+            release_concurrency_slots(slots_holder)
+            _, next_ride = get_task_service().fetch_job_with_next_time(task)
+            Task.objects.filter(pk=task.pk).update(
+                n_skipped_runs=F("n_skipped_runs") + 1, cached_next_ride=next_ride
+            )
+            logger.info(f"Task {task_id} misfired by {misfire['delay']:.0f} seconds, run skipped")
+            return
+
+    locked = task is not None and task.overlap_policy != Task.OVERLAP_ALLOW
+    if locked and not acquire_run_lock(task):
+        release_concurrency_slots(slots_holder)
+        record_skipped_run(task)
+        outcome = "skipped" if task.overlap_policy == Task.OVERLAP_SKIP else "coalesced"
+        logger.info(f"Task {task_id} is still running, run {outcome}")
+        return
+
     if task is not None:
         service = get_task_service()
-        report = LaunchReport(task=task)
+        report = LaunchReport(
+            task=task, attempt=attempt, worker_id=get_worker_id(),
+            # without heartbeats, the run is never refreshed, and must not be reaped
+            heartbeat_at=timezone.now() if EZTASKMANAGER_HEARTBEAT_INTERVAL else None,
+        )
+        # restored by the reaper, if the run is lost
+        report.metadata["task_status"] = task.status
+        if retry_of and LaunchReport.objects.filter(pk=retry_of).exists():
+            report.retry_of_id = retry_of
+        if misfire:
+            report.metadata["misfire"] = misfire
+            if task.misfire_policy == Task.MISFIRE_RUN_ALL:
+                add_catchup_runs(task, misfire["missed_runs"])
         report.save()
 
-        task.prune_reports()
+        # the task cache is written at the end of the run
+        task.prune_reports(compute_cache=False)
 
         result = LaunchReport.RESULT_OK
 
-        # Check and Set DatabaseLogHandler
-        if not any(isinstance(handler, DatabaseLogHandler) for handler in local_logger.handlers):
-            handler = DatabaseLogHandler(report.id)
-            local_logger.addHandler(handler)
+        with log_context(report.id, verbosity2loglevel(int(task.options.get('verbosity', 1)))):
+            local_logger.info('Starting')
+            task_original_status = task.status
+            # overlapping runs leave the status to the run started first
+            started = task_original_status != Task.STATUS_STARTED and task.transition(Task.STATUS_STARTED)
 
-        # Check and Set StreamHandler
-        if not any(isinstance(handler, logging.StreamHandler) for handler in local_logger.handlers):
-            handler = logging.StreamHandler()
-            handler.setFormatter(formatter)
-            local_logger.addHandler(handler)
+            # Execute the command
+            try:
+                timeout = task.effective_job_timeout if enforce_timeout else None
+                limits = {"memory": task.effective_memory_limit, "cpu_time": task.effective_cpu_time_limit}
+                with Heartbeat(report) as heartbeat:
+                    if EZTASKMANAGER_EXECUTION_MODE == "subprocess":
+                        stop = threading.Event()
+                        heartbeat.hard_stop = stop.set
+                        get_command_pool().call_command(
+                            task.command.name, *task.complete_args, timeout=timeout, limits=limits, stop=stop,
+                            launch_report_id=report.id
+                        )
+                    else:
+                        with time_limit(timeout), resource_limits(**limits), hard_stop_signal() as hard_stop:
+                            heartbeat.hard_stop = hard_stop
+                            call_command(get_command(task.command.name), *task.complete_args,
+                                         launch_report_id=report.id)
+            except tuple(TIMEOUT_EXCEPTIONS) as e:
+                result = LaunchReport.RESULT_TIMEOUT
+                # the job timeout, enforced here or by the queue backend
+                report.metadata["limit"] = {"resource": "wall_clock", "limit": task.effective_job_timeout}
+                local_logger.error(f"TIMEOUT expired: {e}")
+            except ResourceLimitExceeded as e:
+                result = LaunchReport.RESULT_LIMIT
+                report.metadata["limit"] = {"resource": e.resource, "limit": e.limit}
+                local_logger.error(f"LIMIT exceeded: {e}")
+            except RunCancelled as e:
+                result = LaunchReport.RESULT_CANCELLED
+                local_logger.warning(f"CANCELLED: {e}")
+            except Exception as e:
+                result = LaunchReport.RESULT_FAILED
+                local_logger.error(f"EXCEPTION raised: {e}")
+            finally:
+                release_concurrency_slots(slots_holder)
+                local_logger.info('Finished')
 
-        local_logger.info('Starting')
-        task_original_status = task.status
-        task.status = Task.STATUS_STARTED
-        task.save()
-
-        # Execute the command
-        try:
-            call_command(task.command.name, *task.complete_args, launch_report_id=report.id)
-        except Exception as e:
-            result = LaunchReport.RESULT_FAILED
-            local_logger.error(f"EXCEPTION raised: {e}")
-        finally:
-            local_logger.info('Finished')
-
-        if result != LaunchReport.RESULT_FAILED:
+        # the cancellation, set by the admin while running, and the log counts, in a single query
+        report.cancel_requested_at, report.n_log_errors, report.n_log_warnings = (
+            LaunchReport.objects.filter(pk=report.pk)
+            .annotate(
+                n_errors=Count("logs", filter=Q(logs__level="ERROR")),
+                n_warnings=Count("logs", filter=Q(logs__level="WARNING")),
+            )
+            .values_list("cancel_requested_at", "n_errors", "n_warnings")
+            .get()
+        )
+        if report.cancel_requested_at and result not in (LaunchReport.RESULT_TIMEOUT, LaunchReport.RESULT_LIMIT):
+            result = LaunchReport.RESULT_CANCELLED
+        elif result == LaunchReport.RESULT_OK:
             if report.n_log_errors:
                 result = LaunchReport.RESULT_ERRORS
             elif report.n_log_warnings:
                 result = LaunchReport.RESULT_WARNINGS
 
         report.invocation_result = result
-        report.save()
+        report.heartbeat_at = None
+        report.duration = (timezone.now() - report.invocation_datetime).total_seconds()
+        retry_at = schedule_retry(task, report, service)
+        if retry_at:
+            logger.info(f"Task {task_id} attempt {attempt} {result}, retrying at {retry_at:%Y-%m-%d %H:%M:%S}")
+        # cancel_requested_at is left alone, as it may be set by the admin meanwhile
+        report.save(update_fields=["invocation_result", "heartbeat_at", "duration", "metadata"])
+
+        cache = {
+            "cached_last_invocation_result": report.invocation_result,
+            "cached_last_invocation_n_errors": report.n_log_errors,
+            "cached_last_invocation_n_warnings": report.n_log_warnings,
+            "cached_last_invocation_datetime": report.invocation_datetime,
+        }
+        _, cache["cached_next_ride"] = service.fetch_job_with_next_time(task)
 
-        task.cached_last_invocation_result = report.invocation_result
-        task.cached_last_invocation_n_errors = report.n_log_errors
-        task.cached_last_invocation_n_warnings = report.n_log_warnings
-        task.cached_last_invocation_datetime = report.invocation_datetime
-        task.status = task_original_status
+        # a non-recurring task is set back to IDLE and its scheduled job id set to None
+        status, fields = task_original_status, cache
+        if status == Task.STATUS_SCHEDULED and not task.is_recurring:
+            status, fields = Task.STATUS_IDLE, {**cache, "scheduled_job_id": None}
 
-        _, task.cached_next_ride = service.fetch_job_with_next_time(task)
+        # the status is restored, unless another run or the admin moved the task meanwhile
+        if not (started and task.transition(status, expected=Task.STATUS_STARTED, **fields)):
+            for name, value in cache.items():
+                setattr(task, name, value)
+            task.save(update_fields=list(cache))
+            task.refresh_from_db(fields=["status", "scheduled_job_id"])
 
-        # a non-periodic task is set back to IDLE and its scheduled job id set to None
-        if task.status == Task.STATUS_SCHEDULED and not task.is_periodic:
-            task.status = Task.STATUS_IDLE
-            task.scheduled_job_id = None
+        if locked and release_run_lock(task):
+            service.enqueue(task)
+        elif pop_catchup_run(task):
+            service.enqueue(task)
 
-        task.save()
+        if record_circuit_result(task, report, service, probe=probe):
+            report.save(update_fields=["metadata"])
 
         # Finally, emit notifications
         try:
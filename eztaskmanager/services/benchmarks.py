@@ -0,0 +1,131 @@
+"""Throughput benchmarks of the workers.
+
+The same batch of jobs, runs of a single task, is executed through the database queue by:
+
+- `fork`: consumers forking a process per job, as the default RQ worker does;
+  each job pays a fork and a new database connection;
+- `threads`: a single DatabaseQueueWorker, executing the jobs in a pool of threads;
+- `warm`: the same, after preloading the commands (see preload_commands): the startup
+  time is measured separately, as it is paid once per worker.
+
+The benchmarks are run with the `benchmarkworkers` management command; with an empty command,
+executed one job at a time, the seconds per job measure the overhead of each mode.
+"""
+import logging
+import multiprocessing
+import os
+import time
+
+from django import db
+
+from eztaskmanager.models import AppCommand, QueuedJob, Task
+from eztaskmanager.services.preload import (clear_preloaded_commands,
+                                            preload_commands)
+from eztaskmanager.services.workers import DatabaseQueueWorker
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_QUEUE = "eztaskmanager-benchmark"
+
+
+class ForkingDatabaseQueueWorker(DatabaseQueueWorker):
+    """A consumer of the database queue executing each job in a forked process, the baseline of the benchmarks."""
+
+    def execute(self, job):
+        """Execute the job in a forked child process, and wait for it."""
+        # database connections must not be shared with the forked process
+        db.connections.close_all()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                super().execute(job)
+            finally:
+                db.connections.close_all()
+                os._exit(0)
+        os.waitpid(pid, 0)
+        with self._lock:
+            self.n_executed += 1
+
+
+def _start_forking_consumer(name):
+    ForkingDatabaseQueueWorker(name=name, burst=True, poll_interval=0, queues=[BENCHMARK_QUEUE]).work()
+
+
+def run_forking(processes):
+    """Consume the benchmark queue with `processes` consumers, forking a process per job."""
+    db.connections.close_all()
+    context = multiprocessing.get_context("fork")
+    consumers = [
+        context.Process(target=_start_forking_consumer, args=(f"benchmark-fork-{n}",))
+        for n in range(processes)
+    ]
+    for consumer in consumers:
+        consumer.start()
+    for consumer in consumers:
+        consumer.join()
+
+
+def run_threads(threads):
+    """Consume the benchmark queue with a single worker, executing `threads` jobs at once."""
+    DatabaseQueueWorker(
+        name="benchmark-threads", burst=True, poll_interval=0, queues=[BENCHMARK_QUEUE], threads=threads
+    ).work()
+
+
+def start_warm(command_name):
+    """Preload the command of the benchmark, forgotten at its end; return the seconds spent."""
+    return preload_commands(names=[command_name])
+
+
+MODES = {
+    "fork": run_forking,
+    "threads": run_threads,
+    "warm": run_threads,
+}
+
+STARTUPS = {
+    "warm": start_warm,
+}
+
+
+def benchmark(mode, command_name, arguments="", n_jobs=100, concurrency=4):
+    """
+    Execute `n_jobs` runs of the command with a worker mode, and measure the throughput.
+
+    A temporary task is created for the runs, and deleted with its reports at the end.
+
+    Args:
+        mode: The worker mode, one of MODES.
+        command_name: The name of the (collected) command executed by the jobs.
+        arguments: The arguments of the command, as in the tasks.
+        n_jobs: The number of jobs.
+        concurrency: The number of jobs executed at once.
+
+    Returns:
+        dict: The mode, the number of jobs, the startup and elapsed seconds, the jobs per second
+          and the seconds per job.
+    """
+    from eztaskmanager.services.queues import DatabaseTaskQueueService
+
+    command = AppCommand.objects.get(name=command_name)
+    task = Task.objects.create(
+        name=f"benchmark {mode} {command_name}", command=command, arguments=arguments,
+        queue=BENCHMARK_QUEUE, overlap_policy=Task.OVERLAP_ALLOW,
+    )
+    service = DatabaseTaskQueueService()
+    try:
+        for _ in range(n_jobs):
+            service.enqueue(task)
+        startup = STARTUPS[mode](command_name) if mode in STARTUPS else 0.0
+        start = time.perf_counter()
+        MODES[mode](concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        clear_preloaded_commands()
+        QueuedJob.objects.filter(queue=BENCHMARK_QUEUE).delete()
+        task.delete()
+    logger.info(f"Benchmark {mode}: {n_jobs} jobs in {elapsed:.2f} seconds, after a startup of {startup:.2f} seconds")
+    return {
+        "mode": mode, "jobs": n_jobs, "startup": startup, "seconds": elapsed,
+        "jobs_per_second": n_jobs / elapsed, "seconds_per_job": elapsed / n_jobs,
+    }
@@ -0,0 +1,74 @@
+"""Cancellation of the running tasks.
+
+Cancelling a task sets `cancel_requested_at` on the reports of its running runs.
+Commands check it cooperatively with `LoggerEnabledCommand.should_stop()`, and stop
+at their convenience, returning or raising RunCancelled; their runs are reported as CANCELLED.
+
+Commands not checking it are stopped by force once EZTASKMANAGER_CANCEL_GRACE_PERIOD seconds
+have passed since the request, by the heartbeat of the run: killing the child process,
+with the 'subprocess' execution mode, or raising RunCancelled in the worker's main thread.
+"""
+import signal
+import threading
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from eztaskmanager.models import LaunchReport
+
+
+class RunCancelled(Exception):
+    """A run was cancelled."""
+
+
+def request_cancellation(task):
+    """
+    Ask the running runs of the task to stop.
+
+    The running runs are the reports with no result yet, as they have no heartbeat
+    when the heartbeats are disabled.
+
+    Returns:
+        int: The number of runs asked to stop.
+    """
+    return LaunchReport.objects.filter(
+        task=task, invocation_result=LaunchReport.RESULT_NO, cancel_requested_at__isnull=True
+    ).update(cancel_requested_at=timezone.now())
+
+
+def get_cancel_request(report_id):
+    """Return when the cancellation of the run of the report was requested, or None."""
+    return LaunchReport.objects.filter(pk=report_id).values_list("cancel_requested_at", flat=True).first()
+
+
+@contextmanager
+def hard_stop_signal():
+    """
+    Allow a run executing in the main thread to be stopped by force, from another thread.
+
+    Yields:
+        A callable raising RunCancelled in the managed block, through SIGUSR1,
+        or None outside of the main thread, where signals are not available.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield None
+        return
+
+    def stop(signum, frame):
+        raise RunCancelled("stopped after the cancellation grace period")
+
+    lock = threading.Lock()
+    active = True
+
+    def hard_stop():
+        with lock:
+            if active:
+                signal.pthread_kill(threading.main_thread().ident, signal.SIGUSR1)
+
+    previous_handler = signal.signal(signal.SIGUSR1, stop)
+    try:
+        yield hard_stop
+    finally:
+        with lock:
+            active = False
+        signal.signal(signal.SIGUSR1, previous_handler)
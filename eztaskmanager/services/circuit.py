@@ -0,0 +1,112 @@
+"""Circuit breaker of the recurring tasks.
+
+Each run updates the consecutive failures of its task (FAILED, TIMEOUT or LIMIT EXCEEDED results).
+When they reach the task's threshold, the circuit opens: the schedule of the task is
+removed from the queue backend, and replaced by probe runs, every probe interval.
+A probe moves the circuit to half open while running; if it fails the circuit opens
+again, and the next probe is enqueued. The first successful run closes the circuit,
+resets the failures and restores the schedule of the task.
+
+The state moves with conditional updates, so concurrent runs never trip or reset a
+circuit twice. Each transition is recorded in the metadata of the report causing it.
+"""
+import datetime
+import logging
+
+from django.db.models import F
+from django.utils import timezone
+
+from eztaskmanager.models import LaunchReport, Task
+
+logger = logging.getLogger(__name__)
+
+FAILURE_RESULTS = (LaunchReport.RESULT_FAILED, LaunchReport.RESULT_TIMEOUT, LaunchReport.RESULT_LIMIT)
+
+
+def start_probe(task: Task):
+    """Move the open circuit of the task to half open; return whether the probe run must be executed."""
+    if Task.objects.filter(pk=task.pk, circuit_state=Task.CIRCUIT_OPEN).update(circuit_state=Task.CIRCUIT_HALF_OPEN):
+        task.mark_written(circuit_state=Task.CIRCUIT_HALF_OPEN)
+        return True
+    return False
+
+
+def schedule_probe(task: Task, service):
+    """Enqueue the next probe run of the task, after its probe interval."""
+    at = timezone.now() + datetime.timedelta(seconds=task.effective_circuit_probe_interval)
+    service.enqueue(task, at=at, probe=True)
+    Task.objects.filter(pk=task.pk).update(cached_next_ride=at)
+    task.mark_written(cached_next_ride=at)
+
+
+def resume_schedule(task: Task, service):
+    """Add the task back to the queue backend, moving the scheduling of periodic tasks past now, in phase."""
+    if task.status == Task.STATUS_SCHEDULED:
+        # re-launched while the circuit was open
+        return
+    now = timezone.now()
+    if task.is_periodic and task.scheduling and task.scheduling <= now:
+        n_intervals = int((now - task.scheduling).total_seconds() // task.interval_in_seconds) + 1
+        task.scheduling += datetime.timedelta(seconds=n_intervals * task.interval_in_seconds)
+        task.save()
+    service.add(task)
+
+
+def _transition(task: Task, report: LaunchReport, previous, state):
+    task.mark_written(circuit_state=state)
+    report.metadata["circuit"] = {
+        "from": previous, "to": state, "consecutive_failures": task.n_consecutive_failures
+    }
+    logger.warning(f"Task {task.id} circuit {previous} -> {state} ({task.n_consecutive_failures} consecutive failures)")
+    return previous, state
+
+
+def record_circuit_result(task: Task, report: LaunchReport, service, probe=False):
+    """
+    Update the consecutive failures of the task with the result of a run, and move its circuit.
+
+    The transition, if any, is stored in the metadata of the report, to be saved by the caller.
+
+    Args:
+        task: The task of the run, with the status it had before the run.
+        report: The report of the run.
+        service: The queue service, removing and restoring the schedule of the task.
+        probe: Whether the run is a probe of an open circuit.
+
+    Returns:
+        tuple: The (previous, new) states of the circuit, or None if it did not move.
+    """
+    if report.invocation_result not in FAILURE_RESULTS:
+        if task.n_consecutive_failures == 0 and task.circuit_state == Task.CIRCUIT_CLOSED:
+            return None
+        Task.objects.filter(pk=task.pk).update(n_consecutive_failures=0)
+        task.mark_written(n_consecutive_failures=0)
+        for previous in (Task.CIRCUIT_HALF_OPEN, Task.CIRCUIT_OPEN):
+            if Task.objects.filter(pk=task.pk, circuit_state=previous).update(circuit_state=Task.CIRCUIT_CLOSED):
+                resume_schedule(task, service)
+                return _transition(task, report, previous, Task.CIRCUIT_CLOSED)
+        return None
+
+    Task.objects.filter(pk=task.pk).update(n_consecutive_failures=F("n_consecutive_failures") + 1)
+    task.mark_written(
+        n_consecutive_failures=Task.objects.values_list("n_consecutive_failures", flat=True).get(pk=task.pk)
+    )
+
+    if probe:
+        half_open = Task.objects.filter(pk=task.pk, circuit_state=Task.CIRCUIT_HALF_OPEN)
+        if half_open.update(circuit_state=Task.CIRCUIT_OPEN):
+            schedule_probe(task, service)
+            return _transition(task, report, Task.CIRCUIT_HALF_OPEN, Task.CIRCUIT_OPEN)
+        return None
+
+    threshold = task.effective_circuit_breaker_threshold
+    closed = Task.objects.filter(pk=task.pk, circuit_state=Task.CIRCUIT_CLOSED)
+    if (
+        threshold and task.n_consecutive_failures >= threshold and
+        task.is_recurring and task.status == Task.STATUS_SCHEDULED and
+        closed.update(circuit_state=Task.CIRCUIT_OPEN)
+    ):
+        service.remove(task)
+        schedule_probe(task, service)
+        return _transition(task, report, Task.CIRCUIT_CLOSED, Task.CIRCUIT_OPEN)
+    return None
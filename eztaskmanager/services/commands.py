@@ -0,0 +1,130 @@
+"""Metadata of the collected commands.
+
+Loading a command imports its module, with all its dependencies, and building its parser
+runs its `add_arguments`. The `collectcommands` management command does it once per command,
+storing on the AppCommand its help text, the specs of its arguments and the fingerprint of
+its module; it loads the command again only when the fingerprint changes.
+
+The web process reads the stored metadata: the admin shows the stored help text, and the
+arguments of the tasks are validated with a parser rebuilt from the stored specs, without
+importing the code of the commands.
+"""
+import argparse
+import hashlib
+import importlib.util
+from io import StringIO
+
+from django.core.management.base import CommandParser
+
+# the names of argparse's actions, by class, to store them in the specs
+ACTION_NAMES = {
+    action_class: name
+    for name, action_class in argparse.ArgumentParser()._registries["action"].items()
+    if name is not None
+}
+
+
+def command_module(app_name, name):
+    """Return the dotted path of the module of a command, as loaded by `load_command_class`."""
+    return f"{app_name}.management.commands.{name}"
+
+
+def command_fingerprint(app_name, name):
+    """
+    Return the SHA-256 of the source of the module of a command, or None if it can not be found.
+
+    Only the packages of the module are imported, to find it, not the module itself.
+    """
+    try:
+        spec = importlib.util.find_spec(command_module(app_name, name))
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.loader is None:
+        return None
+    try:
+        source = spec.loader.get_data(spec.origin)
+    except (AttributeError, OSError):
+        return None
+    return hashlib.sha256(source).hexdigest()
+
+
+def _json_choices(choices):
+    if choices is None:
+        return None
+    # the rebuilt parser does not convert the values, so the choices are compared as strings
+    return [f"{choice}" for choice in choices]
+
+
+def describe_arguments(parser):
+    """Return the JSON-serializable specs of the arguments of a parser."""
+    specs = []
+    for action in parser._actions:
+        name = ACTION_NAMES.get(type(action))
+        if name == "parsers":
+            # the subcommands are checked as the choices of the first value
+            name = "store"
+        elif name is None:
+            # custom actions are described by what they consume
+            name = "store_true" if action.nargs == 0 else "store"
+        specs.append({
+            "option_strings": list(action.option_strings),
+            "dest": action.dest,
+            "action": name,
+            "nargs": action.nargs,
+            "required": action.required,
+            "choices": _json_choices(action.choices),
+            "help": action.help if isinstance(action.help, str) else None,
+        })
+    return specs
+
+
+def build_parser(name, specs):
+    """
+    Rebuild the parser of a command from the specs of its arguments (see describe_arguments).
+
+    The values are not converted, and the mutually exclusive groups are not enforced:
+    the parser checks the options, the number of values and their choices.
+    Parsing errors raise CommandError.
+    """
+    parser = CommandParser(prog=name, add_help=False, called_from_command_line=False)
+    for spec in specs:
+        kwargs = {"dest": spec["dest"], "action": spec["action"]}
+        if spec["action"] in ("store", "append", "extend"):
+            kwargs["nargs"] = spec["nargs"]
+            kwargs["choices"] = spec["choices"]
+        elif spec["action"] in ("store_const", "append_const"):
+            kwargs["const"] = None
+        elif spec["action"] == "version":
+            kwargs["version"] = ""
+        if spec["option_strings"]:
+            if spec["required"]:
+                kwargs["required"] = True
+            parser.add_argument(*spec["option_strings"], **kwargs)
+        else:
+            # the dest of positional arguments is their name
+            del kwargs["dest"]
+            parser.add_argument(spec["dest"], **kwargs)
+    return parser
+
+
+def collect_command_metadata(app_command, force=False):
+    """
+    Store the help text, the specs of the arguments and the fingerprint of a command on its AppCommand.
+
+    The command is loaded only if the fingerprint of its module changed, or if `force` is set.
+
+    Returns:
+        bool: Whether the metadata were refreshed.
+    """
+    fingerprint = command_fingerprint(app_command.app_name, app_command.name) or ""
+    if fingerprint and fingerprint == app_command.fingerprint and not force:
+        return False
+    command = app_command.get_command_class()
+    parser = command.create_parser("", app_command.name)
+    output = StringIO()
+    parser.print_help(file=output)
+    app_command.fingerprint = fingerprint
+    app_command.cached_help_text = output.getvalue()
+    app_command.cached_arguments = describe_arguments(parser)
+    app_command.save(update_fields=["fingerprint", "cached_help_text", "cached_arguments"])
+    return True
@@ -0,0 +1,172 @@
+"""Schedule forecast.
+
+Simulates the executions of the scheduled tasks in the next hours, computing the expected
+number of tasks running at once (the load), per category and per time bucket.
+
+The simulation never enumerates the runs of tasks repeating faster than the buckets:
+their load is the constant rate duration / interval (estimated from the first two fires,
+for cron tasks). Every other run is added to the buckets it overlaps in constant time,
+with a difference array, so the cost per task is bounded by the number of buckets,
+whatever the number and the duration of its runs.
+"""
+import datetime
+import math
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Avg
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from eztaskmanager.models import LaunchReport, Task
+from eztaskmanager.settings import (EZTASKMANAGER_FORECAST_CACHE_TIMEOUT,
+                                    EZTASKMANAGER_FORECAST_DEFAULT_DURATION)
+
+
+class LoadAccumulator:
+    """
+    The load of a number of contiguous time buckets.
+
+    Busy intervals and constant rates are added in constant time: partially covered buckets
+    are updated directly, fully covered ones through a difference array, summed in `loads`.
+    Times are seconds from the start of the first bucket.
+    """
+
+    def __init__(self, n_buckets, bucket_seconds):
+        self.n_buckets = n_buckets
+        self.bucket_seconds = bucket_seconds
+        self._partial = [0.0] * n_buckets
+        self._diff = [0.0] * (n_buckets + 1)
+
+    @property
+    def end(self):
+        """The end of the last bucket."""
+        return self.n_buckets * self.bucket_seconds
+
+    def add_interval(self, start, end, weight=1.0):
+        """Add a busy interval; each bucket gets `weight` times the fraction of it covered by the interval."""
+        start, end = max(start, 0), min(end, self.end)
+        if start >= end:
+            return
+        w = self.bucket_seconds
+        first, last = int(start // w), min(int(end // w), self.n_buckets - 1)
+        if first == last:
+            self._partial[first] += weight * (end - start) / w
+            return
+        self._partial[first] += weight * ((first + 1) * w - start) / w
+        self._diff[first + 1] += weight
+        self._diff[last] -= weight
+        self._partial[last] += weight * (end - last * w) / w
+
+    def add_rate(self, start, rate):
+        """Add a constant load `rate`, from `start` to the end of the buckets."""
+        self.add_interval(start, self.end, weight=rate)
+
+    @property
+    def loads(self):
+        """The load of each bucket."""
+        loads, covered = [], 0.0
+        for partial, diff in zip(self._partial, self._diff):
+            covered += diff
+            loads.append(partial + covered)
+        return loads
+
+
+def expected_durations(tasks):
+    """Return the average duration of the timed executions of the tasks, by task id, with one query."""
+    return dict(
+        LaunchReport.objects.filter(task__in=tasks, duration__isnull=False)
+        .values("task")
+        .annotate(avg_duration=Avg("duration"))
+        .values_list("task", "avg_duration")
+    )
+
+
+def add_cron_runs(accumulator, task, duration, start):
+    """Add the runs of a cron task to the accumulator, whose first bucket begins at `start`."""
+    end = start + datetime.timedelta(seconds=accumulator.end)
+    run = task.next_cron_time(start - datetime.timedelta(seconds=duration))
+    following = task.next_cron_time(run)
+    gap = (following - run).total_seconds()
+    if gap < accumulator.bucket_seconds:
+        # firing faster than the buckets: constant load, estimated from the first two fires
+        accumulator.add_rate((run - start).total_seconds(), duration / gap)
+        return
+    while run < end:
+        offset = (run - start).total_seconds()
+        accumulator.add_interval(offset, offset + duration)
+        run = task.next_cron_time(run)
+
+
+def add_task_runs(accumulator, task, duration, start):
+    """Add the runs of a task to the accumulator, whose first bucket begins at `start`."""
+    if task.is_cron:
+        add_cron_runs(accumulator, task, duration, start)
+        return
+
+    first_run = task.cached_next_ride or task.scheduling_utc
+    if first_run is None:
+        return
+    offset = (first_run - start).total_seconds()
+
+    if not task.is_periodic:
+        accumulator.add_interval(offset, offset + duration)
+        return
+
+    interval = task.interval_in_seconds
+    if interval < accumulator.bucket_seconds:
+        accumulator.add_rate(offset, duration / interval)
+        return
+
+    # the first run still running at the start of the buckets
+    k = max(0, math.ceil((-duration - offset) / interval))
+    run = offset + k * interval
+    while run < accumulator.end:
+        accumulator.add_interval(run, run + duration)
+        run += interval
+
+
+def compute_forecast(hours=24, bucket_minutes=60, start=None):
+    """
+    Simulate the executions of the scheduled tasks in the next `hours`.
+
+    The expected duration of each run is the average duration of the task's reports,
+    or EZTASKMANAGER_FORECAST_DEFAULT_DURATION for tasks never timed.
+
+    Returns:
+        dict: The forecast, with keys:
+            - buckets: the start time of each bucket;
+            - bucket_minutes: the width of the buckets;
+            - rows: a (category name, loads) pair for each category with scheduled tasks;
+            - total: the load of all the tasks, per bucket.
+    """
+    start = (start or timezone.now()).replace(second=0, microsecond=0)
+    bucket_seconds = bucket_minutes * 60
+    n_buckets = math.ceil(hours * 60 / bucket_minutes)
+
+    tasks = list(Task.objects.filter(status=Task.STATUS_SCHEDULED).select_related("category"))
+    durations = expected_durations(tasks)
+
+    accumulators = defaultdict(lambda: LoadAccumulator(n_buckets, bucket_seconds))
+    for task in tasks:
+        duration = durations.get(task.id) or EZTASKMANAGER_FORECAST_DEFAULT_DURATION
+        category = task.category.name if task.category_id else str(_("No category"))
+        add_task_runs(accumulators[category], task, duration, start)
+
+    rows = sorted((name, acc.loads) for name, acc in accumulators.items())
+    return {
+        "buckets": [start + datetime.timedelta(seconds=n * bucket_seconds) for n in range(n_buckets)],
+        "bucket_minutes": bucket_minutes,
+        "rows": rows,
+        "total": [sum(loads) for loads in zip(*(loads for _name, loads in rows))] or [0.0] * n_buckets,
+    }
+
+
+def get_forecast(hours=24, bucket_minutes=60):
+    """Return the forecast of the next `hours`, cached for EZTASKMANAGER_FORECAST_CACHE_TIMEOUT seconds."""
+    key = f"eztaskmanager:forecast:{hours}:{bucket_minutes}"
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = compute_forecast(hours=hours, bucket_minutes=bucket_minutes)
+        cache.set(key, forecast, EZTASKMANAGER_FORECAST_CACHE_TIMEOUT)
+    return forecast
@@ -0,0 +1,142 @@
+"""Heartbeats of the running tasks, and recovery of the runs lost by dead workers.
+
+While a command runs, a daemon thread refreshes the `heartbeat_at` timestamp of its report
+every EZTASKMANAGER_HEARTBEAT_INTERVAL seconds; `heartbeat_at` is cleared when the run ends,
+so only the running reports have one. With EZTASKMANAGER_HEARTBEAT_INTERVAL = 0, the
+heartbeats are disabled: the reports get no `heartbeat_at`, and no run is ever reaped.
+
+The heartbeat also stops by force the runs whose cancellation was requested more than
+EZTASKMANAGER_CANCEL_GRACE_PERIOD seconds before, if they can be stopped (see cancellation).
+
+The reaper looks for heartbeats older than EZTASKMANAGER_HEARTBEAT_TIMEOUT, through the index
+on `heartbeat_at`: its cost depends on the number of running tasks, not on all the reports.
+Each lost run is marked as LOST, the task gets back the status it had before the run,
+and the notifications are emitted.
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+
+from django import db
+from django.db.models import Q
+from django.utils import timezone
+
+from eztaskmanager.models import LaunchReport, Task
+from eztaskmanager.services.notifications import emit_notifications
+from eztaskmanager.settings import (EZTASKMANAGER_CANCEL_GRACE_PERIOD,
+                                    EZTASKMANAGER_HEARTBEAT_INTERVAL,
+                                    EZTASKMANAGER_HEARTBEAT_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_id():
+    """Return the id of the current worker: host, process and thread."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+class Heartbeat:
+    """
+    Context manager refreshing the heartbeat of a running report, from a daemon thread.
+
+    The first heartbeat is set on the report by the caller, when the report is created.
+
+    Attributes:
+        hard_stop: A callable stopping the run by force, set by the caller if the run can be stopped.
+    """
+
+    def __init__(self, report: LaunchReport, interval=EZTASKMANAGER_HEARTBEAT_INTERVAL,
+                 grace_period=EZTASKMANAGER_CANCEL_GRACE_PERIOD):
+        self.report = report
+        self.interval = interval
+        self.grace_period = grace_period
+        self.hard_stop = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"heartbeat-{report.id}", daemon=True)
+
+    def _check_cancellation(self, now):
+        from eztaskmanager.services.cancellation import get_cancel_request
+
+        requested_at = get_cancel_request(self.report.pk)
+        if requested_at and (now - requested_at).total_seconds() >= self.grace_period:
+            logger.warning(f"Run of report {self.report.pk} did not stop after its cancellation, stopping it")
+            hard_stop, self.hard_stop = self.hard_stop, None
+            hard_stop()
+
+    def _beat(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                now = timezone.now()
+                LaunchReport.objects.filter(pk=self.report.pk, heartbeat_at__isnull=False).update(
+                    heartbeat_at=now
+                )
+                if self.hard_stop is not None and self.grace_period is not None:
+                    self._check_cancellation(now)
+        except Exception as e:
+            logger.warning(f"Heartbeat of report {self.report.pk} stopped: {e}")
+        finally:
+            db.connection.close()
+
+    def __enter__(self):
+        if self.interval:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return False
+
+
+def reap_lost_runs(now=None):
+    """
+    Mark the runs whose heartbeat expired as LOST, restoring the status of their tasks.
+
+    Each run is reaped with a conditional update on its last heartbeat,
+    so concurrent reapers, or a late heartbeat, never reap a run twice.
+
+    Nothing is reaped when the heartbeats are disabled, as the running reports are not refreshed.
+
+    Returns:
+        list: The reports of the lost runs.
+    """
+    if not EZTASKMANAGER_HEARTBEAT_INTERVAL:
+        return []
+    now = now or timezone.now()
+    deadline = now - datetime.timedelta(seconds=EZTASKMANAGER_HEARTBEAT_TIMEOUT)
+    lost = []
+    for report in LaunchReport.objects.filter(heartbeat_at__lt=deadline).select_related("task"):
+        last_heartbeat = report.heartbeat_at
+        if not LaunchReport.objects.filter(pk=report.pk, heartbeat_at=last_heartbeat).update(
+            heartbeat_at=None, invocation_result=LaunchReport.RESULT_LOST
+        ):
+            continue
+        report.heartbeat_at = None
+        report.invocation_result = LaunchReport.RESULT_LOST
+        task = report.task
+        Task.objects.filter(pk=task.pk, status=Task.STATUS_STARTED).update(
+            status=report.metadata.get("task_status", Task.STATUS_IDLE)
+        )
+        # the run lock, if taken by the lost run
+        Task.objects.filter(pk=task.pk, running_since__lte=report.invocation_datetime).update(running_since=None)
+        Task.objects.filter(
+            Q(cached_last_invocation_datetime__isnull=True) |
+            Q(cached_last_invocation_datetime__lte=report.invocation_datetime),
+            pk=task.pk
+        ).update(
+            cached_last_invocation_result=LaunchReport.RESULT_LOST,
+            cached_last_invocation_datetime=report.invocation_datetime
+        )
+        logger.warning(
+            f"Run of task {task.id} on {report.worker_id or 'unknown worker'} lost, "
+            f"no heartbeat since {last_heartbeat}"
+        )
+        try:
+            emit_notifications(report)
+        except Exception:
+            pass
+        lost.append(report)
+    return lost
@@ -0,0 +1,93 @@
+"""Resource limits of the runs.
+
+The memory and CPU time limits of a run are applied with setrlimit to the process executing its command:
+
+- memory: RLIMIT_AS, the address space of the process, is raised by the limit; allocations past it raise MemoryError;
+- CPU time: RLIMIT_CPU, the CPU time of the process, is raised by the limit; past it, SIGXCPU is received.
+
+Both stop the run with ResourceLimitExceeded, and the previous limits are restored at its end.
+
+The limits apply to the whole process, so in the worker they are only enforced in the main thread,
+as the job timeouts; with the 'subprocess' execution mode, they are enforced in the child process
+executing the command, also for the runs of threaded workers.
+"""
+import math
+import os
+import signal
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # not available on Windows
+    resource = None
+
+
+class ResourceLimitExceeded(Exception):
+    """A run exceeded one of its resource limits."""
+
+    def __init__(self, resource_name, limit):
+        super().__init__(f"{resource_name} limit of {limit} exceeded")
+        self.resource = resource_name
+        self.limit = limit
+
+
+def _address_space():
+    """Return the address space of the current process, in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _raise_limit(kind, soft):
+    """Set the soft limit of `kind`, within its hard limit; return the previous limits."""
+    previous = resource.getrlimit(kind)
+    if previous[1] != resource.RLIM_INFINITY:
+        soft = min(soft, previous[1])
+    resource.setrlimit(kind, (soft, previous[1]))
+    return previous
+
+
+@contextmanager
+def resource_limits(memory=None, cpu_time=None):
+    """
+    Limit the memory and the CPU time of the managed block.
+
+    ResourceLimitExceeded is raised in the block if it allocates more than `memory` MB,
+    or uses more than `cpu_time` CPU seconds.
+
+    The limits are only enforced in the main thread of the process, where resource limits are available;
+    elsewhere, or if no limits are set, the block runs without limits.
+    """
+    if resource is None or not (memory or cpu_time) or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def exceeded(signum, frame):
+        raise ResourceLimitExceeded("cpu_time", cpu_time)
+
+    restore = []
+    previous_handler = None
+    try:
+        size = _address_space() if memory else None
+        if size is not None:
+            restore.append((resource.RLIMIT_AS, _raise_limit(resource.RLIMIT_AS, size + memory * 2 ** 20)))
+        if cpu_time:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            previous_handler = signal.signal(signal.SIGXCPU, exceeded)
+            used = math.ceil(usage.ru_utime + usage.ru_stime)
+            restore.append((resource.RLIMIT_CPU, _raise_limit(resource.RLIMIT_CPU, used + cpu_time)))
+        try:
+            yield
+        except MemoryError:
+            if size is None:
+                raise
+            raise ResourceLimitExceeded("memory", memory) from None
+    finally:
+        for kind, limits in reversed(restore):
+            resource.setrlimit(kind, limits)
+        if previous_handler is not None:
+            signal.signal(signal.SIGXCPU, previous_handler)
@@ -0,0 +1,126 @@
+"""Locks on the executions of the tasks.
+
+The run lock of a task prevents overlapping runs, for tasks whose overlap policy is not ALLOW.
+It is held in the task's record, and taken and released with conditional updates,
+so it is atomic whatever the queue backend and the number of worker nodes.
+
+The concurrency slots limit the number of runs at once, globally and per category,
+as distributed semaphores stored in the ConcurrencySlot table.
+"""
+import datetime
+import uuid
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from eztaskmanager.models import ConcurrencySlot, Task
+from eztaskmanager.settings import (EZTASKMANAGER_MAX_CONCURRENCY,
+                                    EZTASKMANAGER_RUN_LOCK_TTL)
+
+GLOBAL_SCOPE = "global"
+
+
+def run_lock_ttl(task: Task):
+    """Return the seconds after which the run lock of the task is considered stale."""
+    if task.effective_job_timeout:
+        # leave some room for the bookkeeping after the timeout
+        return task.effective_job_timeout + 60
+    return EZTASKMANAGER_RUN_LOCK_TTL
+
+
+def acquire_run_lock(task: Task):
+    """
+    Take the run lock of the task, if it is free or stale.
+
+    On success, `task.running_since` is set to the time of the acquisition,
+    which identifies the holder when the lock is released.
+
+    Returns:
+        bool: Whether the lock was taken.
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=run_lock_ttl(task))
+    acquired = Task.objects.filter(
+        Q(running_since__isnull=True) | Q(running_since__lt=stale), pk=task.pk
+    ).update(running_since=now)
+    if acquired:
+        task.mark_written(running_since=now)
+    return acquired == 1
+
+
+def release_run_lock(task: Task):
+    """
+    Release the run lock taken by `acquire_run_lock`, and pop the coalesced run, if any.
+
+    The lock is released only if it is still held by this run; a run that outlived
+    the lock TTL does not release the lock taken over by a later run.
+
+    Returns:
+        bool: Whether a coalesced run is pending, and must be enqueued.
+    """
+    Task.objects.filter(pk=task.pk, running_since=task.running_since).update(running_since=None)
+    task.mark_written(running_since=None)
+    return Task.objects.filter(pk=task.pk, pending_run=True).update(pending_run=False) == 1
+
+
+def record_skipped_run(task: Task):
+    """Count a run not executed because the lock was held; COALESCE tasks also get a pending run."""
+    values = {"n_skipped_runs": F("n_skipped_runs") + 1}
+    if task.overlap_policy == Task.OVERLAP_COALESCE:
+        values["pending_run"] = True
+    Task.objects.filter(pk=task.pk).update(**values)
+
+
+def concurrency_limits(task: Task):
+    """Return the (scope, limit) pairs of the semaphores a run of the task must enter."""
+    limits = []
+    if task.category_id and task.category.max_concurrency:
+        limits.append((f"category:{task.category_id}", task.category.max_concurrency))
+    if EZTASKMANAGER_MAX_CONCURRENCY:
+        limits.append((GLOBAL_SCOPE, EZTASKMANAGER_MAX_CONCURRENCY))
+    return limits
+
+
+def _acquire_slot(scope, limit, holder, expires_at):
+    """Take a free or expired slot among the first `limit` of `scope`; return whether one was taken."""
+    ConcurrencySlot.objects.bulk_create(
+        [ConcurrencySlot(scope=scope, index=i) for i in range(limit)], ignore_conflicts=True
+    )
+    now = timezone.now()
+    available = Q(holder="") | Q(expires_at__lt=now)
+    for slot_pk in ConcurrencySlot.objects.filter(available, scope=scope, index__lt=limit).values_list(
+        "pk", flat=True
+    ):
+        # another worker may take the slot between the select and the update
+        if ConcurrencySlot.objects.filter(available, pk=slot_pk).update(holder=holder, expires_at=expires_at):
+            return True
+    return False
+
+
+def acquire_concurrency_slots(task: Task):
+    """
+    Take a slot in each of the semaphores limiting the runs of the task.
+
+    Slots are taken in a fixed order (category, then global), and all released
+    if one of them is not available, so that runs never hold slots while waiting.
+
+    Returns:
+        str: The holder id to release the slots with (empty if there are no limits),
+        or None if a limit is reached.
+    """
+    limits = concurrency_limits(task)
+    if not limits:
+        return ""
+    holder = uuid.uuid4().hex
+    expires_at = timezone.now() + datetime.timedelta(seconds=run_lock_ttl(task))
+    for scope, limit in limits:
+        if not _acquire_slot(scope, limit, holder, expires_at):
+            release_concurrency_slots(holder)
+            return None
+    return holder
+
+
+def release_concurrency_slots(holder):
+    """Release the slots taken by `acquire_concurrency_slots`."""
+    if holder:
+        ConcurrencySlot.objects.filter(holder=holder).update(holder="", expires_at=None)
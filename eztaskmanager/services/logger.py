@@ -1,8 +1,30 @@
+"""Logging of the tasks, to the reports in the database.
+
+The log records of the tasks are written by the `eztaskmanager.services.logger` logger,
+through a single DatabaseLogHandler and a single StreamHandler, shared by all the runs
+of the process. The report a record belongs to, and the verbosity of the run, are held
+in context variables, set by `log_context` for the current thread or asyncio task:
+so runs in different threads or tasks of the same process log to their own report.
+"""
 import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 from django.core.management.base import BaseCommand
 
 from eztaskmanager.models import Log
+from eztaskmanager.settings import EZTASKMANAGER_CANCEL_CHECK_INTERVAL
+
+current_report_id: ContextVar = ContextVar("eztaskmanager_report_id", default=None)
+"""The id of the report the log records of the current context are written to."""
+
+current_log_level: ContextVar = ContextVar("eztaskmanager_log_level", default=logging.WARNING)
+"""The min level of the log records of the current context."""
+
+_handlers_lock = threading.Lock()
+_routed = False
 
 
 def verbosity2loglevel(verbosity):
@@ -18,35 +40,106 @@ def verbosity2loglevel(verbosity):
     return logging_level
 
 
+@contextmanager
+def log_context(report_id=None, level=None):
+    """Route the log records of the current context to the report `report_id`, from `level` up."""
+    tokens = []
+    if report_id is not None:
+        tokens.append((current_report_id, current_report_id.set(report_id)))
+    if level is not None:
+        tokens.append((current_log_level, current_log_level.set(level)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextLevelFilter(logging.Filter):
+    """Filter out the records below the log level of the current context."""
+
+    def filter(self, record):
+        """Return whether the record is at or above the level of the current context."""
+        return record.levelno >= current_log_level.get()
+
+
+def get_task_logger():
+    """Return the logger of the tasks, with the shared handlers routing the records by context."""
+    logger = logging.getLogger(__name__)
+    with _handlers_lock:
+        if _routed:
+            return logger
+        if not any(isinstance(h, DatabaseLogHandler) and h.launch_report_id is None for h in logger.handlers):
+            handler = DatabaseLogHandler()
+            handler.addFilter(ContextLevelFilter())
+            logger.addHandler(handler)
+        if not any(type(h) is logging.StreamHandler for h in logger.handlers):
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%m-%d-%Y %H:%M:%S'))
+            handler.addFilter(ContextLevelFilter())
+            logger.addHandler(handler)
+        # the level of each run is applied by the handlers' filters
+        logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def route_task_logs(handler):
+    """Send all the records of the tasks to `handler`, in place of the shared handlers (e.g. in a child process)."""
+    global _routed
+    logger = logging.getLogger(__name__)
+    with _handlers_lock:
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+        handler.addFilter(ContextLevelFilter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        _routed = True
+
+
 class LoggerEnabledCommand(BaseCommand):
-    """This class is a subclass of BaseCommand that adds logging functionality to the execute method."""
+    """This class is a subclass of BaseCommand that adds logging functionality to the execute method.
+
+    Long commands should check `should_stop()` regularly, and stop when it is true:
+    their run was cancelled (see eztaskmanager.services.cancellation).
+    """
 
     logger = None
+    launch_report_id = None
+    _stop_requested = False
+    _stop_checked_at = None
 
     def execute(self, *args, **kwargs):
-        """Override the BaseCommand method, adding stream and Database handlers, if not existing."""
-        verbosity = kwargs.get('verbosity', 1)
+        """Override the BaseCommand method, logging to the report `launch_report_id`, if given.
 
-        # Get the logger
-        logger = logging.getLogger(__name__)
-        logger.setLevel(verbosity2loglevel(verbosity))
+        Embedded commands without a `launch_report_id` log to the report of the enclosing run.
+        """
+        verbosity = kwargs.get('verbosity', 1)
 
         # Remove launch_report_id from options
         launch_report_id = kwargs.pop('launch_report_id', None)
+        self.launch_report_id = launch_report_id or current_report_id.get()
 
-        if launch_report_id:
-            # If launch_report_id is provided, use DatabaseLogHandler, avoid duplicates for embedded commands
-            if not any(isinstance(handler, DatabaseLogHandler) for handler in logger.handlers):
-                logger.addHandler(DatabaseLogHandler(launch_report_id))
+        # Set the logger as an instance variable
+        self.logger = get_task_logger()
 
-        # Always use the default handler, avoid duplicates for embedded commands
-        if not any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
-            logger.addHandler(logging.StreamHandler())
+        with log_context(launch_report_id, verbosity2loglevel(verbosity)):
+            super().execute(*args, **kwargs)
 
-        # Set the logger as an instance variable
-        self.logger = logger
+    def should_stop(self):
+        """Return whether the cancellation of the run was requested.
+
+        The request is checked at most every EZTASKMANAGER_CANCEL_CHECK_INTERVAL seconds,
+        so this can be called in the inner loops of the command.
+        """
+        if self._stop_requested or self.launch_report_id is None:
+            return self._stop_requested
+        now = time.monotonic()
+        if self._stop_checked_at is None or now - self._stop_checked_at >= EZTASKMANAGER_CANCEL_CHECK_INTERVAL:
+            from eztaskmanager.services.cancellation import get_cancel_request
 
-        super().execute(*args, **kwargs)
+            self._stop_checked_at = now
+            self._stop_requested = get_cancel_request(self.launch_report_id) is not None
+        return self._stop_requested
 
     def create_parser(self, prog_name, subcommand, **kwargs):
         """Create a parser."""
@@ -62,6 +155,8 @@ class DatabaseLogHandler(logging.Handler):
 
     This class extends the logging.Handler class and provides functionality to log messages to a database.
     Each log message is saved as a Log object in the database with the launch report level, and message attributes.
+    Without a `launch_report_id`, messages are saved to the report of the current context (see log_context),
+    and dropped outside of any report.
 
     Usage:
         log_handler = DatabaseLogHandler("launch_report_1")
@@ -69,14 +164,17 @@ class DatabaseLogHandler(logging.Handler):
         logger.error("An error occurred")
     """
 
-    def __init__(self, launch_report_id):
+    def __init__(self, launch_report_id=None):
         logging.Handler.__init__(self)
         self.launch_report_id = launch_report_id
 
     def emit(self, record):
         """Implement the method to send the log message to the DB."""
+        launch_report_id = self.launch_report_id or current_report_id.get()
+        if launch_report_id is None:
+            return
         log_entry = Log(
-            launch_report_id=self.launch_report_id,
+            launch_report_id=launch_report_id,
             level=record.levelname,
             message=self.format(record),
         )
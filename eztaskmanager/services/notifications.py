@@ -19,7 +19,10 @@ LEVEL_MAPPING = {
     "ok": 0,
     "warnings": 10,
     "errors": 20,
-    "failed": 30
+    "failed": 30,
+    "timeout": 35,
+    "limit": 37,
+    "lost": 40,
 }
 
 MESSAGES = {
@@ -28,7 +31,10 @@ MESSAGES = {
         "completed successfully with *{n_errors}* errors and *{n_warnings}* warnings.",
     20: 'Task *"{task_name}"* invoked at {invocation_time} '
         "completed successfully with *{n_errors}* errors and *{n_warnings}* warnings.",
-    30: 'Task *"{task_name}"* invoked at {invocation_time} *failed*.'
+    30: 'Task *"{task_name}"* invoked at {invocation_time} *failed*.',
+    35: 'Task *"{task_name}"* invoked at {invocation_time} *timed out*.',
+    37: 'Task *"{task_name}"* invoked at {invocation_time} was stopped, as it *exceeded a resource limit*.',
+    40: 'Task *"{task_name}"* invoked at {invocation_time} was *lost*, its worker stopped responding.',
 }
 
 
@@ -0,0 +1,80 @@
+"""Command classes preloaded by the warm workers.
+
+At every run, `call_command` loads the command: it imports its module, with all its dependencies,
+instantiates the command and builds its parser. A forking worker pays the import at every job,
+as the module is imported by the forked process, and lost with it.
+
+A warm worker preloads the commands of all the active AppCommands at startup, importing their
+modules once and building their parsers once. The runs of a preloaded command get a new instance
+of the cached class, sharing the cached parser, as parsing the arguments does not alter it.
+"""
+import logging
+import threading
+import time
+
+from eztaskmanager.models import AppCommand
+
+logger = logging.getLogger(__name__)
+
+_preloaded = {}
+_lock = threading.Lock()
+
+
+def preload_commands(names=None):
+    """
+    Import the commands of the active AppCommands, caching their classes and parsers.
+
+    Commands failing to load are logged, and left to be loaded at each run.
+
+    Args:
+        names: The names of the commands to preload, all the active commands if not given.
+
+    Returns:
+        float: The seconds spent preloading.
+    """
+    start = time.perf_counter()
+    app_commands = AppCommand.objects.filter(active=True)
+    if names is not None:
+        app_commands = app_commands.filter(name__in=names)
+    for app_command in app_commands:
+        try:
+            command = app_command.get_command_class()
+            parser = command.create_parser("", app_command.name)
+        except Exception as e:
+            logger.warning(f"Command {app_command} not preloaded: {e}")
+            continue
+        with _lock:
+            _preloaded[app_command.name] = (type(command), parser)
+    elapsed = time.perf_counter() - start
+    logger.info(f"{len(_preloaded)} commands preloaded in {elapsed:.2f} seconds")
+    return elapsed
+
+
+def preloaded_command_names():
+    """Return the names of the preloaded commands."""
+    with _lock:
+        return list(_preloaded)
+
+
+def clear_preloaded_commands():
+    """Forget the preloaded commands."""
+    with _lock:
+        _preloaded.clear()
+
+
+def get_command(name):
+    """
+    Return the command to be passed to `call_command`.
+
+    Returns:
+        A new instance of the preloaded command, using the cached parser, or the name of the command
+        if it was not preloaded.
+    """
+    with _lock:
+        preloaded = _preloaded.get(name)
+    if preloaded is None:
+        return name
+    command_class, parser = preloaded
+    command = command_class()
+    command.create_parser = lambda prog_name, subcommand, **kwargs: parser
+    return command
@@ -5,17 +5,42 @@ These are the class that implement the interface to the queue managers.
 The abstract TaskQueueService class is the interface each class has to implement.
 
 - RQTaskQueueService implements the service with Redis Queue.
-- CeleryTaskQueueService implements the service with Celery (TBD)
+- CeleryTaskQueueService implements the service with Celery.
+- DatabaseTaskQueueService implements the service with a database table, no broker needed.
+- ThreadTaskQueueService implements the service with a thread pool, inside the current process.
+
+The service used is chosen with the EZTASKMANAGER_QUEUE_SERVICE_TYPE setting
+("RQ", "Celery", "DB" or "Thread"), among the available ones.
+
+Immediate launches are idempotent: launching a task already queued, but not started yet,
+returns the queued job instead of enqueuing a duplicate one.
 """
 import datetime
+import heapq
+import itertools
 import logging
+import random
+import signal
+import threading
+import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pydoc import locate
 
+from django import db
+from django.core.cache import cache
+from django.db import connections, router, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from eztaskmanager.settings import EZTASKMANAGER_QUEUE_SERVICE_TYPE
-from ..models import Task
+from eztaskmanager.settings import (EZTASKMANAGER_CELERY_APP,
+                                    EZTASKMANAGER_CELERY_BROKER_URL,
+                                    EZTASKMANAGER_CELERY_RESULT_BACKEND,
+                                    EZTASKMANAGER_ENQUEUE_DEDUP_TTL,
+                                    EZTASKMANAGER_QUEUE_SERVICE_TYPE,
+                                    EZTASKMANAGER_THREAD_POOL_SIZE)
+from ..models import PRIORITY_HIGH, QueuedJob, Task, next_cron_time
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +53,42 @@ class TaskQueueService(ABC):
         """To be implemented in concrete subclasses."""
         pass
 
+    @abstractmethod
+    def enqueue(self, task, at=None, **kwargs):  # pragma: no cover
+        """To be implemented in concrete subclasses.
+
+        Enqueue a single run of the task, for immediate execution or at the `at` datetime,
+        leaving its scheduling alone. The `kwargs` are passed to `run_management_command`,
+        and must be JSON-serializable.
+        """
+        pass
+
+    def enqueue_once(self, task):
+        """Enqueue a run of the task for immediate execution, unless one is already queued and not started.
+
+        Returns the new job, or the one already queued. Services without a way to find
+        the queued runs of a task always enqueue a new one.
+        """
+        return self.enqueue(task)
+
     @abstractmethod
     def remove(self, task):  # pragma: no cover
         """To be implemented in concrete subclasses."""
         pass
 
+    @abstractmethod
+    def fetch_job_with_next_time(self, task):  # pragma: no cover
+        """To be implemented in concrete subclasses.
+
+        Return the scheduled job of the task and its next execution time, or (None, None).
+        """
+        pass
+
+
+def dedup_key(task):
+    """Return the key identifying the immediate run of the task, queued and not started yet."""
+    return f"eztaskmanager-task-{task.id}-immediate"
+
 
 class TaskQueueException(Exception):
     """Dedicated exception for TaskQueue classes."""
@@ -40,9 +96,470 @@ class TaskQueueException(Exception):
     pass
 
 
+def move_task(task, status, attempts=3, **fields):
+    """
+    Move the task to `status`, writing the status and `fields`, with its edits in memory (see Task.transition).
+
+    A run starting or finishing meanwhile moves the task; the transition is then tried again
+    from its new status, so that the run leaves the task alone at its end.
+
+    Raises:
+        TaskQueueException: If the task kept moving for `attempts` times.
+    """
+    for _attempt in range(attempts):
+        if task.transition(status, **fields):
+            return
+        task.refresh_from_db(fields=["status"])
+    raise TaskQueueException(_("The status of the task keeps changing, try again"))
+
+
+class TaskTimeoutException(Exception):
+    """Raised in a running command when the job timeout of its task expires."""
+
+    pass
+
+
+# the exceptions raised by the queue backends when a job timeout expires
+TIMEOUT_EXCEPTIONS = [TaskTimeoutException]
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Raise TaskTimeoutException in the managed block, if it lasts more than `seconds`.
+
+    The limit is enforced with SIGALRM, so it is only available in the main thread
+    of the process; elsewhere, or if `seconds` is not set, the block runs without limits.
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TaskTimeoutException(_(f"Job exceeded the timeout of {seconds} seconds"))
+
+    previous_handler = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def jittered_start(task: Task):
+    """
+    Return the first execution time of a scheduled task, delayed by a random jitter.
+
+    The jitter is at most the task's effective_schedule_jitter seconds; the delay of periodic
+    tasks is kept by all the following runs, spreading tasks scheduled at round times.
+    """
+    jitter = task.effective_schedule_jitter
+    if not jitter:
+        return task.scheduling_utc
+    return task.scheduling_utc + datetime.timedelta(seconds=random.uniform(0, jitter))
+
+
+# the available services, by EZTASKMANAGER_QUEUE_SERVICE_TYPE value
+SERVICES = {}
+
+
+class DatabaseTaskQueueService(TaskQueueService):
+    """
+    A subclass of TaskQueueService that manages tasks using a database table as queue.
+
+    No broker is needed. Jobs are stored as QueuedJob records and are executed by the
+    workers started with the `dbqueueworker` management command.
+
+    Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so that any number
+    of them, on any number of nodes, can consume the same table without blocking each other.
+    On databases not supporting it (SQLite), jobs are claimed with conditional
+    updates and deletes, that only one of the competing workers can win.
+
+    The job timeout of the task is enforced by the workers; claimed jobs are deleted,
+    no results are kept, so the TTLs do not apply.
+
+    Methods:
+        - add(task): Enqueues a task to be executed either immediately or at its scheduling time.
+        - enqueue(task, at=None): Enqueues a run of the task, for immediate execution or at `at`.
+        - remove(task): Removes the scheduled job of the task, if any.
+        - claim(): Claims the next due job, to be executed by a worker.
+
+    """
+
+    @staticmethod
+    def _job_pk(job_id):
+        """Return the primary key corresponding to a job id, or None if it's not one of ours."""
+        try:
+            return int(job_id)
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, task: Task):
+        """
+        Add the task to the database queue.
+
+        If the task already has a scheduled job, it is removed before creating a new one.
+
+        Args:
+            task: The task to be added.
+
+        Returns:
+            The QueuedJob created for the task.
+
+        Raises:
+            TaskQueueException: If there is an error while launching the task.
+        """
+        if task.scheduling and not task.is_cron and task.scheduling_utc < timezone.now():
+            raise TaskQueueException(_("It is not possible to schedule tasks in the past"))
+
+        try:
+            if task.scheduled_job_id:
+                QueuedJob.objects.filter(pk=self._job_pk(task.scheduled_job_id)).delete()
+                task.reset_scheduled_job()
+
+            if task.scheduling or task.is_cron:
+                with transaction.atomic():
+                    job = QueuedJob.objects.create(
+                        task=task,
+                        run_at=task.next_cron_time() if task.is_cron else jittered_start(task),
+                        interval=task.interval_in_seconds if task.is_periodic else None,
+                        cron_string=task.cron_string,
+                        queue=task.queue_name,
+                        priority=task.effective_priority
+                    )
+                    move_task(task, Task.STATUS_SCHEDULED, scheduled_job_id=str(job.id), cached_next_ride=job.run_at)
+            else:
+                job = self.enqueue_once(task)
+            return job
+        except Exception as e:
+            raise TaskQueueException(_(f"Failed to add task: {e}")) from e
+
+    def enqueue(self, task, at=None, **kwargs):
+        """Enqueue a run of the task, for immediate execution or at `at`."""
+        return QueuedJob.objects.create(
+            task=task, run_at=at or timezone.now(), queue=task.queue_name, priority=task.effective_priority,
+            kwargs=kwargs
+        )
+
+    def enqueue_once(self, task):
+        """Enqueue an immediate run of the task, unless one is already waiting; the dedup key is unique."""
+        job, _created = QueuedJob.objects.get_or_create(
+            dedup_key=dedup_key(task),
+            defaults=dict(
+                task=task, run_at=timezone.now(), queue=task.queue_name, priority=task.effective_priority
+            )
+        )
+        return job
+
+    def fetch_job_with_next_time(self, task):
+        """Fetch the scheduled job of the task, with its execution time."""
+        job = QueuedJob.objects.filter(pk=self._job_pk(task.scheduled_job_id)).first()
+        if job is None:
+            return None, None
+        return job, job.run_at
+
+    def remove(self, task):
+        """Remove the job from the queue and updates the tasks' values."""
+        QueuedJob.objects.filter(pk=self._job_pk(task.scheduled_job_id)).delete()
+
+        move_task(task, Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
+
+    @staticmethod
+    def _consume(job, now):
+        """Consume a claimed job: move periodic jobs to their next run and delete one-off ones.
+
+        Return True if the job was consumed by this call, False if another worker consumed it first.
+        """
+        jobs = QueuedJob.objects.filter(pk=job.pk, run_at=job.run_at)
+        if job.is_periodic:
+            return jobs.update(run_at=job.next_run_after(now)) == 1
+        return jobs.delete()[0] > 0
+
+    def claim(self, queues=None):
+        """
+        Claim the next due job in the queue, higher priorities first.
+
+        The claim is atomic, so each due execution is handed to one worker only.
+
+        Args:
+            queues: The names of the queues to consume, all queues if not given.
+
+        Returns:
+            The claimed QueuedJob, or None if there are no due jobs.
+        """
+        now = timezone.now()
+        due_jobs = QueuedJob.objects.filter(run_at__lte=now).order_by("-priority", "run_at", "id")
+        if queues:
+            due_jobs = due_jobs.filter(queue__in=queues)
+        connection = connections[router.db_for_write(QueuedJob)]
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=connection.alias):
+                job = due_jobs.select_for_update(skip_locked=True).first()
+                if job is not None:
+                    self._consume(job, now)
+                return job
+
+        # SQLite-compatible fallback: optimistic claim of one of the first due jobs
+        for job in due_jobs[:10]:
+            if self._consume(job, now):
+                return job
+        return None
+
+
+SERVICES["DB"] = DatabaseTaskQueueService
+
+
+class InProcessJob:
+    """A job scheduled in the in-process timer heap."""
+
+    def __init__(self, task_id, run_at, interval=None, job_id=None, cron_string=None, kwargs=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.task_id = task_id
+        self.run_at = run_at
+        self.interval = interval
+        self.cron_string = cron_string
+        self.kwargs = kwargs or {}
+
+    def __repr__(self):
+        """Return the representation of the job."""
+        return f"InProcessJob({self.id}, task={self.task_id}, run_at={self.run_at})"
+
+
+class InProcessScheduler:
+    """
+    A bounded thread pool, with an in-memory timer heap for scheduled and periodic jobs.
+
+    A single instance is shared by all the ThreadTaskQueueService instances of a process
+    (see get_in_process_scheduler). A daemon timer thread sleeps until the next job is due,
+    then submits it to the pool; periodic jobs are pushed back into the heap,
+    at their next execution time.
+    """
+
+    def __init__(self, max_workers=EZTASKMANAGER_THREAD_POOL_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="eztaskmanager")
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count()
+        self._waiting = {}
+        self._condition = threading.Condition()
+        self._timer = threading.Thread(target=self._run_timer, name="eztaskmanager-timer", daemon=True)
+        self._timer.start()
+
+    @staticmethod
+    def _execute(task_id, **kwargs):
+        """Execute the management command of the task in a pool thread."""
+        from eztaskmanager.services import run_management_command
+
+        db.close_old_connections()
+        try:
+            run_management_command(task_id, **kwargs)
+        except Exception as e:
+            logger.exception(f"Task {task_id} raised {e}")
+        finally:
+            db.close_old_connections()
+
+    def submit(self, task_id, **kwargs):
+        """Submit the task for immediate execution, returning a Future."""
+        return self.executor.submit(self._execute, task_id, **kwargs)
+
+    def submit_once(self, task_id):
+        """Submit the task for immediate execution, unless a submitted run is still waiting; return its Future."""
+        with self._condition:
+            future = self._waiting.get(task_id)
+            if future is not None and not future.running() and not future.done():
+                return future
+            future = self._waiting[task_id] = self.submit(task_id)
+        return future
+
+    def schedule(self, task_id, run_at, interval=None, job_id=None, cron_string=None, kwargs=None):
+        """Schedule the task at `run_at`, repeating every `interval` seconds or following `cron_string`, if given.
+
+        The `kwargs` of one-off jobs are passed to `run_management_command`.
+        """
+        job = InProcessJob(task_id, run_at, interval=interval, job_id=job_id, cron_string=cron_string, kwargs=kwargs)
+        with self._condition:
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.run_at, next(self._counter), job))
+            self._condition.notify()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a scheduled job; it is dropped by the timer when it surfaces in the heap."""
+        with self._condition:
+            return self._jobs.pop(job_id, None) is not None
+
+    def get_job(self, job_id):
+        """Return the scheduled job with the given id, or None."""
+        return self._jobs.get(job_id)
+
+    def _run_timer(self):
+        """Submit due jobs to the pool, sleeping until the next one is due."""
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                run_at, _count, job = self._heap[0]
+                if self._jobs.get(job.id) is not job or job.run_at != run_at:
+                    # cancelled job
+                    heapq.heappop(self._heap)
+                    continue
+                now = timezone.now()
+                if run_at > now:
+                    self._condition.wait(timeout=(run_at - now).total_seconds())
+                    continue
+                heapq.heappop(self._heap)
+                # runs of recurring jobs are passed their fire time, to detect misfires
+                if job.cron_string or job.interval:
+                    run_kwargs = {"scheduled": True, "scheduled_at": run_at}
+                else:
+                    run_kwargs = job.kwargs
+                if job.cron_string:
+                    job.run_at = next_cron_time(job.cron_string, now)
+                    heapq.heappush(self._heap, (job.run_at, next(self._counter), job))
+                elif job.interval:
+                    n_intervals = int((now - run_at).total_seconds() // job.interval) + 1
+                    job.run_at = run_at + datetime.timedelta(seconds=n_intervals * job.interval)
+                    heapq.heappush(self._heap, (job.run_at, next(self._counter), job))
+                else:
+                    self._jobs.pop(job.id, None)
+            self.submit(job.task_id, **run_kwargs)
+
+    def restore(self):
+        """Re-schedule the tasks left in the SCHEDULED status, e.g. after a restart of the process."""
+        now = timezone.now()
+        for task in Task.objects.filter(status=Task.STATUS_SCHEDULED):
+            if not task.scheduled_job_id or task.scheduled_job_id in self._jobs:
+                continue
+            if task.is_cron:
+                self.schedule(
+                    task.id, task.next_cron_time(now), job_id=task.scheduled_job_id, cron_string=task.cron_string
+                )
+                continue
+            if not task.scheduling:
+                continue
+            interval = task.interval_in_seconds if task.is_periodic else None
+            if task.scheduling_utc < now and not interval:
+                continue
+            self.schedule(task.id, task.scheduling_utc, interval=interval, job_id=task.scheduled_job_id)
+
+
+_in_process_scheduler = None
+_in_process_scheduler_lock = threading.Lock()
+
+
+def get_in_process_scheduler():
+    """Return the InProcessScheduler of the current process, creating it at the first call."""
+    global _in_process_scheduler
+    with _in_process_scheduler_lock:
+        if _in_process_scheduler is None:
+            _in_process_scheduler = InProcessScheduler()
+            _in_process_scheduler.restore()
+    return _in_process_scheduler
+
+
+class ThreadTaskQueueService(TaskQueueService):
+    """
+    A subclass of TaskQueueService that executes tasks in a thread pool of the current process.
+
+    Meant for development, CI and small single-host installations: no broker and no worker
+    processes are needed, but jobs live in memory, so each process has its own queue.
+    All jobs share the same pool, regardless of the queue of their task.
+    Threads cannot be interrupted, so job timeouts are not enforced.
+    Tasks still in the SCHEDULED status are re-scheduled when the process starts.
+
+    Attributes:
+        scheduler (InProcessScheduler): The thread pool and timer heap of the process.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler or get_in_process_scheduler()
+
+    def add(self, task: Task):
+        """
+        Add the task to the thread pool, or to the timer heap if it has a scheduling.
+
+        Args:
+            task: The task to be added.
+
+        Returns:
+            The scheduled InProcessJob, or the Future of the immediate execution.
+
+        Raises:
+            TaskQueueException: If there is an error while launching the task.
+        """
+        if task.scheduling and not task.is_cron and task.scheduling_utc < timezone.now():
+            raise TaskQueueException(_("It is not possible to schedule tasks in the past"))
+
+        if task.scheduled_job_id:
+            self.scheduler.cancel(task.scheduled_job_id)
+            task.reset_scheduled_job()
+
+        try:
+            if task.scheduling or task.is_cron:
+                if task.is_cron:
+                    job = self.scheduler.schedule(task.id, task.next_cron_time(), cron_string=task.cron_string)
+                else:
+                    job = self.scheduler.schedule(
+                        task.id, jittered_start(task),
+                        interval=task.interval_in_seconds if task.is_periodic else None
+                    )
+                try:
+                    move_task(task, Task.STATUS_SCHEDULED, scheduled_job_id=job.id, cached_next_ride=job.run_at)
+                except TaskQueueException:
+                    self.scheduler.cancel(job.id)
+                    raise
+                return job
+            else:
+                return self.enqueue_once(task)
+        except Exception as e:
+            raise TaskQueueException(_(f"Failed to add task: {e}")) from e
+
+    def enqueue(self, task, at=None, **kwargs):
+        """Submit a run of the task to the thread pool, or to the timer heap if `at` is given."""
+        if at:
+            return self.scheduler.schedule(task.id, at, kwargs=kwargs)
+        return self.scheduler.submit(task.id, **kwargs)
+
+    def enqueue_once(self, task):
+        """Submit an immediate run of the task, unless one is already waiting in the pool."""
+        return self.scheduler.submit_once(task.id)
+
+    def fetch_job_with_next_time(self, task):
+        """Fetch the scheduled job of the task, with its next execution time."""
+        job = self.scheduler.get_job(task.scheduled_job_id)
+        if job is None:
+            return None, None
+        return job, job.run_at
+
+    def remove(self, task):
+        """Remove the job from the timer heap and updates the tasks' values."""
+        if task.scheduled_job_id:
+            self.scheduler.cancel(task.scheduled_job_id)
+
+        move_task(task, Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
+
+
+SERVICES["Thread"] = ThreadTaskQueueService
+
+
 # conditional import
 try:
     import django_rq
+    from rq import get_current_job
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+
+    def execute_immediate_run(task_id, key):
+        """Remove the dedup key of an immediate RQ launch, then run the task."""
+        from eztaskmanager.services import run_management_command
+
+        job = get_current_job()
+        if job is not None:
+            # once started, the run is no longer a duplicate of the next launches
+            job.connection.delete(key)
+        return run_management_command(task_id)
 
     class RQTaskQueueService(TaskQueueService):
         """
@@ -50,9 +567,15 @@ try:
 
         Attributes:
             queue (Queue): The default RQ queue.
+            scheduler (Scheduler): The RQ scheduler; scheduled jobs are moved to the task's queue when due.
+
+        Jobs are routed to the queue of the task (see Task.queue_name), so that dedicated workers
+        can consume them; high priority jobs are put in front of their queue.
+        The job timeout and the TTLs of the task are passed to RQ.
 
         Methods:
             - add(task, at=None): Enqueues a task to be executed either immediately or at a specific time.
+            - enqueue(task, at=None): Enqueues a run of the task, for immediate execution or at `at`.
             - remove(task): Cancels a task if it is currently in the queue.
 
         """
@@ -61,6 +584,12 @@ try:
             self.queue = django_rq.get_queue('default')
             self.scheduler = django_rq.get_scheduler('default', interval=60)
 
+        def get_queue(self, name):
+            """Return the RQ queue with the given name."""
+            if name == self.queue.name:
+                return self.queue
+            return django_rq.get_queue(name)
+
         def add(self, task: Task):
             """
             Add the task to the Redis queue.
@@ -81,7 +610,7 @@ try:
             """
             from eztaskmanager.services import run_management_command
 
-            if task.scheduling and task.scheduling_utc < timezone.now():
+            if task.scheduling and not task.is_cron and task.scheduling_utc < timezone.now():
                 raise TaskQueueException(_("It is not possible to schedule tasks in the past"))
 
             # Prevent duplicate scheduling - cancel existing job if present
@@ -107,46 +636,134 @@ try:
                     )
                 finally:
                     # Clear the old job ID to start fresh
-                    task.scheduled_job_id = None
+                    task.reset_scheduled_job()
 
+            at_front = task.effective_priority >= PRIORITY_HIGH
+            job_timeout = task.effective_job_timeout
+            result_ttl = task.effective_result_ttl
+            failure_ttl = task.effective_failure_ttl
             try:
-                if task.scheduling:
-                    if task.is_periodic:
-                        # schedule execution at a point in time, with periodicity
+                if task.scheduling or task.is_cron:
+                    if task.is_cron:
+                        # the next fire times are computed by rq-scheduler, in UTC;
+                        # the job is re-used at each run, so it is kept forever
+                        rq_job = self.scheduler.cron(
+                            task.cron_string,
+                            run_management_command, [task.id], {"scheduled": True},
+                            timeout=job_timeout,
+                            queue_name=task.queue_name,
+                            at_front=at_front
+                        )
+                    elif task.is_periodic:
+                        # schedule execution at a point in time, with periodicity;
+                        # the job is re-used by the scheduler at each run, so it must outlive the interval
                         rq_job = self.scheduler.schedule(
-                            task.scheduling_utc,
-                            run_management_command, [task.id],
+                            jittered_start(task),
+                            run_management_command, [task.id], {"scheduled": True},
                             interval=task.interval_in_seconds,
-                            result_ttl=int(1.5 * task.interval_in_seconds)
+                            result_ttl=max(int(1.5 * task.interval_in_seconds), result_ttl or 0),
+                            timeout=job_timeout,
+                            queue_name=task.queue_name,
+                            at_front=at_front
                         )
                     else:
                         # schedule execution at a point in time, with periodicity
                         rq_job = self.scheduler.enqueue_at(
-                            task.scheduling_utc,
-                            run_management_command, task.id
+                            jittered_start(task),
+                            run_management_command, task.id,
+                            timeout=job_timeout,
+                            job_result_ttl=result_ttl,
+                            queue_name=task.queue_name,
+                            at_front=at_front
                         )
+                    if failure_ttl is not None:
+                        # not accepted by the scheduler methods
+                        rq_job.failure_ttl = failure_ttl
+                        rq_job.save()
                     task.scheduled_job_id = rq_job.id
-                    task.status = Task.STATUS_SCHEDULED
-                    job_id, task.cached_next_ride = self.fetch_job_with_next_time(task)
-                    task.save()
+                    _job, next_ride = self.fetch_job_with_next_time(task)
+                    try:
+                        move_task(task, Task.STATUS_SCHEDULED, scheduled_job_id=rq_job.id, cached_next_ride=next_ride)
+                    except TaskQueueException:
+                        self.scheduler.cancel(rq_job)
+                        raise
                 else:
-                    # enqueue for immediate execution
-                    rq_job = self.queue.enqueue(run_management_command, task.id)
+                    rq_job = self.enqueue_once(task)
                 return rq_job
             except Exception as e:
                 raise TaskQueueException(_(f"Failed to add task: {e}")) from e
 
+        def enqueue(self, task: Task, at=None, **kwargs):
+            """Enqueue a run of the task on the task's queue, for immediate execution or at `at`."""
+            from eztaskmanager.services import run_management_command
+
+            if at:
+                return self.scheduler.enqueue_at(
+                    at, run_management_command, task.id,
+                    timeout=task.effective_job_timeout,
+                    job_result_ttl=task.effective_result_ttl,
+                    queue_name=task.queue_name,
+                    at_front=task.effective_priority >= PRIORITY_HIGH,
+                    **kwargs
+                )
+            return self.get_queue(task.queue_name).enqueue(
+                run_management_command, task.id,
+                job_timeout=task.effective_job_timeout,
+                result_ttl=task.effective_result_ttl,
+                failure_ttl=task.effective_failure_ttl,
+                at_front=task.effective_priority >= PRIORITY_HIGH,
+                **kwargs
+            )
+
+        def enqueue_once(self, task: Task):
+            """
+            Enqueue an immediate run of the task, unless one was enqueued and has not started yet.
+
+            The id of the enqueued job is stored in Redis under the task's dedup key, set atomically,
+            removed by the job when it starts (see execute_immediate_run), and expiring after
+            EZTASKMANAGER_ENQUEUE_DEDUP_TTL seconds.
+            """
+            queue = self.get_queue(task.queue_name)
+            connection = queue.connection
+            key = dedup_key(task)
+            job_id = str(uuid.uuid4())
+            if not connection.set(key, job_id, nx=True, ex=EZTASKMANAGER_ENQUEUE_DEDUP_TTL):
+                queued_id = connection.get(key)
+                if isinstance(queued_id, bytes):
+                    queued_id = queued_id.decode()
+                job = queue.fetch_job(queued_id) if queued_id else None
+                if job is not None and job.get_status() in ("queued", "deferred"):
+                    return job
+                # the key outlived its job, which was lost or removed before starting
+                connection.set(key, job_id, ex=EZTASKMANAGER_ENQUEUE_DEDUP_TTL)
+            return queue.enqueue(
+                execute_immediate_run, task.id, key,
+                job_id=job_id,
+                job_timeout=task.effective_job_timeout,
+                result_ttl=task.effective_result_ttl,
+                failure_ttl=task.effective_failure_ttl,
+                at_front=task.effective_priority >= PRIORITY_HIGH
+            )
+
         def fetch_job_with_next_time(self, task):
-            """Fetch the next job in the queue, with its execution time."""
+            """
+            Fetch the scheduled job of the task, with its execution time.
+
+            The job is looked up by its id, and its time is its score in the scheduler's sorted set,
+            a UTC timestamp, so that the cost does not grow with the number of scheduled jobs.
+            """
+            if not task.scheduled_job_id:
+                return None, None
+            connection = self.scheduler.connection
+            score = connection.zscore(self.scheduler.scheduled_jobs_key, task.scheduled_job_id)
+            if score is None:
+                return None, None
             try:
-                job_id, next_time = next(
-                    (j, next_time) for j, next_time in self.scheduler.get_jobs(with_times=True)
-                    if j.id == task.scheduled_job_id
-                )
-                next_time = timezone.make_aware(next_time, timezone=timezone.timezone.utc)
-                return job_id, next_time
-            except StopIteration:
+                # fetched from the connection, as the job may be routed to any queue
+                job = Job.fetch(task.scheduled_job_id, connection=connection)
+            except NoSuchJobError:
                 return None, None
+            return job, datetime.datetime.fromtimestamp(score, tz=datetime.timezone.utc)
 
         def remove(self, task):
             """Remove the job from the queue and updates the tasks' values."""
@@ -155,75 +772,231 @@ try:
             if job:
                 self.scheduler.cancel(job)
 
-            task.scheduled_job_id = None
-            task.cached_next_ride = None
-            task.status = Task.STATUS_IDLE
-            task.save()
+            move_task(task, Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
+
+    SERVICES["RQ"] = RQTaskQueueService
 
-    available_service = RQTaskQueueService
+    from rq.timeouts import JobTimeoutException
+    TIMEOUT_EXCEPTIONS.append(JobTimeoutException)
 
 except ImportError:
-    try:
-        from celery import Celery, shared_task
+    pass
 
 
-        class CeleryTaskQueueService(TaskQueueService):
-            """A subclass of TaskQueueService that manages tasks using Celery."""
+# conditional import
+try:
+    from celery import Celery, shared_task
+    from celery.exceptions import SoftTimeLimitExceeded
+    from celery.utils import uuid as celery_uuid
 
-            def __init__(self):
-                self.app = Celery(
-                    'tasks',
-                    broker='redis://redis:6379/1', backend='redis://redis:6379:2'
-                )
+    TIMEOUT_EXCEPTIONS.append(SoftTimeLimitExceeded)
 
-            def add(self, task: Task):
-                """Add a task to the Celery queue."""
-                try:
-                    if task.scheduling:
-                        delay = task.scheduling - datetime.datetime.now()
-                        self.app.send_task(
-                            'eztaskmanager.services.queues.execute_management_command',
-                            args=[task],
-                            countdown=delay.total_seconds()
-                        )
-                    else:
-                        self.app.send_task('eztaskmanager.services.queues.execute_management_command', args=[task])
+    EXECUTE_TASK_NAME = "eztaskmanager.execute_management_command"
 
-                    return True
-                except Exception as e:
-                    print(f"Error while launching task: {e}")
+    _celery_app = None
 
-            def remove(self, task):
-                """Remove a job from the Celery queue."""
-                try:
-                    # With Celery, it's not straightforward to remove a task from the queue
-                    # The recommended way to stop a task is to revoke it
-                    self.app.control.revoke(task.id)
-                except Exception as e:
-                    print(f"Error while halting task: {e}")
+    def get_celery_app():
+        """
+        Return the Celery app used to send the tasks.
 
+        The app set in EZTASKMANAGER_CELERY_APP is used, if any; otherwise an app is built,
+        configured from the CELERY_* django settings, with broker and result backend
+        overridden by EZTASKMANAGER_CELERY_BROKER_URL and EZTASKMANAGER_CELERY_RESULT_BACKEND.
+        """
+        global _celery_app
+        if _celery_app is None:
+            if EZTASKMANAGER_CELERY_APP:
+                _celery_app = locate(EZTASKMANAGER_CELERY_APP)
+            else:
+                app = Celery("eztaskmanager")
+                app.config_from_object("django.conf:settings", namespace="CELERY")
+                if EZTASKMANAGER_CELERY_BROKER_URL:
+                    app.conf.broker_url = EZTASKMANAGER_CELERY_BROKER_URL
+                if EZTASKMANAGER_CELERY_RESULT_BACKEND:
+                    app.conf.result_backend = EZTASKMANAGER_CELERY_RESULT_BACKEND
+                _celery_app = app
+        return _celery_app
+
+    class CeleryTaskQueueService(TaskQueueService):
+        """
+        A subclass of TaskQueueService that manages tasks using Celery.
 
-        @shared_task
-        def execute_management_command(task):
-            """Wrap the management command executor for Celery."""
-            from eztaskmanager.services import run_management_command
+        Only the id of the task is sent to the workers, on the task's queue and with its priority.
+        Scheduled executions are sent with an ETA,
+        and their Celery task id is stored in the task's scheduled_job_id.
 
-            return run_management_command(task)
+        Periodic executions form a chain: each run schedules the next one, before executing the command.
+        A scheduled run whose Celery task id is not the task's scheduled_job_id any longer
+        (the task was stopped or re-scheduled) is skipped, even if its revocation was lost.
 
+        The job timeout is sent as soft time limit, the worker process is killed
+        HARD_TIME_LIMIT_GRACE seconds later if the command does not stop.
+        Results expiration is a setting of the Celery app (result_expires),
+        so the TTLs of the task do not apply.
 
-        available_service = CeleryTaskQueueService
+        Attributes:
+            app (Celery): The Celery app, see get_celery_app.
+        """
 
-    except ImportError:
-        raise ImportError("Both django_rq and Celery packages are not installed.")
+        HARD_TIME_LIMIT_GRACE = 30
 
+        def __init__(self, app=None):
+            self.app = app or get_celery_app()
 
-def get_task_service():
-    """Fetch the correct queue service, based on settings."""
-    if EZTASKMANAGER_QUEUE_SERVICE_TYPE == 'RQ' or available_service == RQTaskQueueService:
-        return RQTaskQueueService()
-    else:
-        return CeleryTaskQueueService()
+        def _send(self, task: Task, eta=None, job_id=None, **kwargs):
+            """Send the execution of the task to the workers, at `eta` if given.
+
+            Only the runs of the task's schedule have a `job_id`, checked by the worker
+            (unless `scheduled=False` is passed in the `kwargs`).
+            The `kwargs` are passed to `run_management_command`.
+            """
+            options = {}
+            if task.effective_job_timeout:
+                options["soft_time_limit"] = task.effective_job_timeout
+                options["time_limit"] = task.effective_job_timeout + self.HARD_TIME_LIMIT_GRACE
+            return self.app.tasks[EXECUTE_TASK_NAME].apply_async(
+                args=[task.id], kwargs={"scheduled": job_id is not None, **kwargs},
+                eta=eta, task_id=job_id,
+                queue=task.queue_name, priority=task.effective_priority,
+                **options
+            )
+
+        def add(self, task: Task):
+            """
+            Add the task to the Celery queue.
+
+            Args:
+                task: The task to be added.
+
+            Returns:
+                The AsyncResult of the sent Celery task.
 
+            Raises:
+                TaskQueueException: If there is an error while launching the task.
+            """
+            if task.scheduling and not task.is_cron and task.scheduling_utc < timezone.now():
+                raise TaskQueueException(_("It is not possible to schedule tasks in the past"))
 
+            if task.scheduled_job_id:
+                self.app.control.revoke(task.scheduled_job_id)
+                task.reset_scheduled_job()
 
+            try:
+                if task.scheduling or task.is_cron:
+                    # the job id is stored before sending, so that the worker can always find it
+                    move_task(
+                        task, Task.STATUS_SCHEDULED, scheduled_job_id=celery_uuid(),
+                        cached_next_ride=task.next_cron_time() if task.is_cron else jittered_start(task)
+                    )
+                    return self._send(task, eta=task.cached_next_ride, job_id=task.scheduled_job_id)
+                else:
+                    return self.enqueue_once(task)
+            except Exception as e:
+                raise TaskQueueException(_(f"Failed to add task: {e}")) from e
+
+        def enqueue(self, task: Task, at=None, **kwargs):
+            """Send a run of the task, for immediate execution or at `at`."""
+            return self._send(task, eta=at, **kwargs)
+
+        def enqueue_once(self, task: Task):
+            """
+            Send an immediate run of the task, unless one was sent and has not started yet.
+
+            The id of the sent run is stored in the cache under the task's dedup key, removed by the
+            worker when the run starts, and expiring after EZTASKMANAGER_ENQUEUE_DEDUP_TTL seconds.
+            The cache must be shared with the workers, for the key to be removed when the run starts.
+            """
+            key = dedup_key(task)
+            job_id = str(uuid.uuid4())
+            if not cache.add(key, job_id, EZTASKMANAGER_ENQUEUE_DEDUP_TTL):
+                queued_id = cache.get(key)
+                if queued_id:
+                    return self.app.AsyncResult(queued_id)
+            return self._send(task, job_id=job_id, scheduled=False, dedup_key=key)
+
+        def fetch_job_with_next_time(self, task):
+            """Return the scheduled Celery task id and its ETA, as stored in the task."""
+            if not task.scheduled_job_id:
+                return None, None
+            return task.scheduled_job_id, task.cached_next_ride
+
+        def remove(self, task):
+            """Revoke the scheduled Celery task and updates the tasks' values."""
+            if task.scheduled_job_id:
+                self.app.control.revoke(task.scheduled_job_id)
+
+            move_task(task, Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
+
+        def schedule_next_run(self, task_id, job_id):
+            """
+            Schedule the next run of a periodic or cron task, replacing the running job `job_id`.
+
+            The next run of periodic tasks keeps the phase of the original scheduling.
+            The replacement is a conditional update, so a redelivered job schedules nothing.
+
+            Returns:
+                The id of the next job, or None if nothing was scheduled.
+            """
+            task = Task.objects.filter(pk=task_id, scheduled_job_id=job_id).first()
+            if task is None or not task.is_recurring or not task.cached_next_ride:
+                return None
+
+            if task.is_cron:
+                next_run = task.next_cron_time(max(timezone.now(), task.cached_next_ride))
+            else:
+                interval = task.interval_in_seconds
+                elapsed = (timezone.now() - task.cached_next_ride).total_seconds()
+                n_intervals = max(int(elapsed // interval) + 1, 1)
+                next_run = task.cached_next_ride + datetime.timedelta(seconds=n_intervals * interval)
+
+            next_job_id = celery_uuid()
+            if not Task.objects.filter(pk=task_id, scheduled_job_id=job_id).update(
+                scheduled_job_id=next_job_id, cached_next_ride=next_run
+            ):
+                return None
+            self._send(task, eta=next_run, job_id=next_job_id)
+            return next_job_id
+
+    @shared_task(bind=True, name=EXECUTE_TASK_NAME)
+    def execute_management_command(self, task_id, scheduled=False, dedup_key=None, **kwargs):
+        """Wrap the management command executor for Celery."""
+        from eztaskmanager.services import run_management_command
+
+        if dedup_key:
+            # the run has started, a new launch of the task is not a duplicate anymore
+            cache.delete(dedup_key)
+
+        if scheduled:
+            # the fire time of this run, before it is moved to the next one
+            fire_times = list(
+                Task.objects.filter(pk=task_id, scheduled_job_id=self.request.id).values_list(
+                    "cached_next_ride", flat=True
+                )
+            )
+            if not fire_times:
+                logger.info(f"Job {self.request.id} of task {task_id} was removed, skipping it")
+                return None
+            if not self.request.is_eager:
+                CeleryTaskQueueService(app=self.app).schedule_next_run(task_id, self.request.id)
+            return run_management_command(task_id, scheduled=True, scheduled_at=fire_times[0])
+
+        return run_management_command(task_id, **kwargs)
+
+    SERVICES["Celery"] = CeleryTaskQueueService
+
+except ImportError:
+    pass
+
+
+# the first available service, among RQ, Celery and the database queue, which needs no broker
+available_service = SERVICES.get("RQ") or SERVICES.get("Celery") or DatabaseTaskQueueService
+
+
+def get_task_service():
+    """Fetch the correct queue service, based on settings.
 
+    The service set in EZTASKMANAGER_QUEUE_SERVICE_TYPE is used, when available,
+    otherwise the first available one is returned.
+    """
+    service_class = SERVICES.get(EZTASKMANAGER_QUEUE_SERVICE_TYPE, available_service)
+    return service_class()
@@ -0,0 +1,41 @@
+"""Automatic retries of the failed runs.
+
+A run whose result is among the retryable results of its task is enqueued again,
+through the queue backend, after an exponential backoff:
+`retry_delay * retry_backoff ** (attempt - 1)` seconds, plus a random jitter,
+until the task's max number of attempts is reached.
+
+All the retries point to the report of the first attempt, so the attempt history
+of a run is fetched with a single query on `retry_of`.
+"""
+import datetime
+import random
+
+from django.utils import timezone
+
+from eztaskmanager.models import LaunchReport, Task
+
+
+def retry_delay(task: Task, attempt):
+    """Return the seconds to wait before retrying the failed `attempt` of a run of the task."""
+    delay = task.retry_delay * task.retry_backoff ** (attempt - 1)
+    if task.retry_jitter:
+        delay += random.uniform(0, task.retry_jitter)
+    return delay
+
+
+def schedule_retry(task: Task, report: LaunchReport, service):
+    """
+    Enqueue the next attempt of the run of the report, if its result is retryable and attempts are left.
+
+    The details of the retry are stored in the metadata of the report, to be saved by the caller.
+
+    Returns:
+        datetime: The time of the next attempt, or None if the run is not retried.
+    """
+    if report.invocation_result not in task.retryable_results or report.attempt >= task.retry_max_attempts:
+        return None
+    at = timezone.now() + datetime.timedelta(seconds=retry_delay(task, report.attempt))
+    service.enqueue(task, at=at, retry_of=report.retry_of_id or report.id, attempt=report.attempt + 1)
+    report.metadata["retry"] = {"attempt": report.attempt + 1, "at": at.isoformat()}
+    return at
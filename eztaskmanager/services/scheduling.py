@@ -0,0 +1,96 @@
+"""Scheduling helpers.
+
+- spread_schedules redistributes the start times of periodic tasks across their interval.
+- check_misfire detects the runs of recurring tasks starting too late, and the runs they missed.
+- add_catchup_runs and pop_catchup_run chain the missed runs, with the RUN ALL misfire policy.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db.models import F
+from django.utils import timezone
+
+from eztaskmanager.models import Task
+from eztaskmanager.settings import (EZTASKMANAGER_MISFIRE_GRACE_TIME,
+                                    EZTASKMANAGER_MISFIRE_MAX_CATCHUP_RUNS)
+
+
+def spread_schedules(tasks, start=None):
+    """
+    Spread the scheduling of periodic tasks evenly, across their interval.
+
+    Tasks with the same interval are the ones starting together at each period,
+    so they are spread among themselves: the k-th of n tasks with interval I
+    is scheduled at `start + k * I / n`. Non-periodic tasks are left alone.
+
+    The new scheduling is set on the tasks, not saved.
+
+    Args:
+        tasks: The tasks to spread.
+        start: The scheduling of the first task of each group; defaults to the beginning
+          of the next minute.
+
+    Returns:
+        list: The spread periodic tasks.
+    """
+    if start is None:
+        start = (timezone.now() + datetime.timedelta(minutes=1)).replace(second=0, microsecond=0)
+
+    groups = defaultdict(list)
+    for task in tasks:
+        if task.scheduling and task.is_periodic:
+            groups[task.interval_in_seconds].append(task)
+
+    spread = []
+    for interval, group in groups.items():
+        group.sort(key=lambda t: t.id)
+        for k, task in enumerate(group):
+            task.scheduling = start + datetime.timedelta(seconds=k * interval // len(group))
+            spread.append(task)
+    return spread
+
+
+def count_missed_runs(task: Task, scheduled_at, now, limit=EZTASKMANAGER_MISFIRE_MAX_CATCHUP_RUNS):
+    """Return the number of fire times of the task after `scheduled_at`, up to `now`, at most `limit`."""
+    if task.is_periodic:
+        return min(int((now - scheduled_at).total_seconds() // task.interval_in_seconds), limit)
+    n, fire_time = 0, task.next_cron_time(scheduled_at)
+    while fire_time <= now and n < limit:
+        n += 1
+        fire_time = task.next_cron_time(fire_time)
+    return n
+
+
+def check_misfire(task: Task, scheduled_at, now=None):
+    """
+    Check whether a run of a recurring task, fired at `scheduled_at`, starts later than its grace time.
+
+    Returns:
+        dict: The details of the misfire, stored in the metadata of the report, or None if the run is on time.
+    """
+    if scheduled_at is None or not task.is_recurring:
+        return None
+    now = now or timezone.now()
+    grace_time = task.misfire_grace_time
+    if grace_time is None:
+        grace_time = EZTASKMANAGER_MISFIRE_GRACE_TIME
+    delay = (now - scheduled_at).total_seconds()
+    if delay <= grace_time:
+        return None
+    return {
+        "scheduled_at": scheduled_at.isoformat(),
+        "delay": delay,
+        "missed_runs": count_missed_runs(task, scheduled_at, now),
+        "policy": task.misfire_policy,
+    }
+
+
+def add_catchup_runs(task: Task, n):
+    """Add `n` missed runs to be executed after the current one."""
+    if n:
+        Task.objects.filter(pk=task.pk).update(catchup_runs=F("catchup_runs") + n)
+
+
+def pop_catchup_run(task: Task):
+    """Take one of the missed runs to be executed, if any; return whether one was taken."""
+    return Task.objects.filter(pk=task.pk, catchup_runs__gt=0).update(catchup_runs=F("catchup_runs") - 1) == 1
@@ -0,0 +1,256 @@
+"""Execution of the commands in a pool of pre-started child processes.
+
+With `EZTASKMANAGER_EXECUTION_MODE = 'subprocess'`, run_management_command hands the command
+to one of the child processes of the pool, instead of calling it in the worker. The children
+are started once, with Django set up and the preloaded commands of the worker already imported,
+so each run costs little more than an in-process call, but a command leaking memory, or
+crashing its interpreter, only takes its child down: a new one is started in its place.
+
+The children are started by a fork server (see eztaskmanager.bootstrap), or spawned where it is
+not available, never forked from the worker: forking a process with running threads, such as
+the heartbeats and the consumers of a threaded worker, may leave the child with locks held forever.
+The pool is started by the `dbqueueworker` consumers before their threads. RQ forks a process for
+each job, that would start and throw away a whole pool: the mode is refused with the RQ service.
+
+The log records of the command are sent back over the pipe of the child, and logged by the
+worker in the report of the run. The job timeout is enforced by the worker, killing the child,
+so it is available also to the runs executed in threads.
+"""
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from django import db
+from django.core.management import call_command
+
+from eztaskmanager.services.cancellation import RunCancelled
+from eztaskmanager.services.limits import (ResourceLimitExceeded,
+                                           resource_limits)
+from eztaskmanager.services.logger import get_task_logger, route_task_logs
+from eztaskmanager.services.preload import (get_command, preload_commands,
+                                            preloaded_command_names)
+from eztaskmanager.services.queues import TaskTimeoutException
+from eztaskmanager.settings import EZTASKMANAGER_SUBPROCESS_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CommandProcessError(Exception):
+    """A command failed, or its child process died."""
+
+
+class PipeLogHandler(logging.Handler):
+    """Send the log records of the commands to the worker, over the pipe of the child process."""
+
+    def __init__(self, conn):
+        logging.Handler.__init__(self)
+        self.conn = conn
+
+    def emit(self, record):
+        """Send the level and the formatted message of the record."""
+        self.conn.send(("log", record.levelno, self.format(record)))
+
+
+def get_start_method():
+    """Return the start method of the child processes: 'forkserver', or 'spawn' where it is not available."""
+    methods = multiprocessing.get_all_start_methods()
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+def serve(conn, preloaded=()):
+    """Execute the commands received over the pipe, until it is closed, in a child process."""
+    # the worker handles the interruptions, and stops its children
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if preloaded:
+        preload_commands(preloaded)
+        db.connections.close_all()
+    route_task_logs(PipeLogHandler(conn))
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        name, args, limits, options = request
+        try:
+            with resource_limits(**limits):
+                call_command(get_command(name), *args, **options)
+            conn.send(("done", None))
+        except ResourceLimitExceeded as e:
+            conn.send(("limit", e.resource, e.limit))
+        except RunCancelled as e:
+            conn.send(("cancelled", f"{e}"))
+        except Exception as e:
+            conn.send(("failed", f"{e}"))
+        finally:
+            db.close_old_connections()
+
+
+class CommandProcess:
+    """A child process executing commands, one at a time."""
+
+    def __init__(self, context, preloaded=()):
+        from eztaskmanager.bootstrap import serve_commands
+
+        self.conn, child_conn = context.Pipe()
+        if context.get_start_method() == "fork":
+            # database connections must not be shared with a forked process
+            db.connections.close_all()
+        self.process = context.Process(target=serve_commands, args=(child_conn, tuple(preloaded)), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self):
+        """Return whether the child process is alive."""
+        return self.process.is_alive()
+
+    def call_command(self, name, *args, timeout=None, limits=None, stop=None, **options):
+        """
+        Execute the command in the child process, logging its records in the worker.
+
+        The resource `limits` (see resource_limits) are applied to the child process.
+
+        Raises:
+            TaskTimeoutException: If the command lasts more than `timeout` seconds; the child is killed.
+            ResourceLimitExceeded: If the command exceeds one of its limits; the child is killed.
+            RunCancelled: If the command is cancelled, or the `stop` event is set; then the child is killed.
+            CommandProcessError: If the command raises an exception, or the child process dies.
+        """
+        task_logger = get_task_logger()
+        deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send((name, args, limits or {}, options))
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if stop is not None:
+                # the stop event is checked every second
+                remaining = 1.0 if remaining is None else min(remaining, 1.0)
+            if not self.conn.poll(remaining):
+                if stop is not None and stop.is_set():
+                    self.kill()
+                    raise RunCancelled("stopped after the cancellation grace period")
+                if deadline is None or time.monotonic() < deadline:
+                    continue
+                self.kill()
+                raise TaskTimeoutException(f"Job exceeded the timeout of {timeout} seconds")
+            try:
+                message = self.conn.recv()
+            except EOFError:
+                self.process.join()
+                raise CommandProcessError(
+                    f"Command process {self.process.pid} died, with exit code {self.process.exitcode}"
+                )
+            if message[0] == "log":
+                task_logger.log(message[1], message[2])
+            elif message[0] == "limit":
+                # the state of the child is not reliable, once past its limits
+                self.kill()
+                raise ResourceLimitExceeded(message[1], message[2])
+            elif message[0] == "cancelled":
+                raise RunCancelled(message[1])
+            elif message[0] == "failed":
+                raise CommandProcessError(message[1])
+            else:
+                return
+
+    def kill(self):
+        """Kill the child process."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        """Stop the child process, once its current command is finished."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join()
+        self.conn.close()
+
+
+class CommandProcessPool:
+    """
+    A pool of pre-started CommandProcess.
+
+    Each command takes an idle child, waiting for one if all are busy; dead or killed children
+    are replaced by new ones.
+
+    Attributes:
+        size (int): The number of child processes.
+        start_method (str): The multiprocessing start method of the children, see get_start_method.
+    """
+
+    def __init__(self, size=EZTASKMANAGER_SUBPROCESS_POOL_SIZE, start_method=None):
+        self.size = size
+        self.start_method = start_method or get_start_method()
+        self._context = multiprocessing.get_context(self.start_method)
+        self._idle = queue.LifoQueue()
+        self._processes = []
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        process = CommandProcess(self._context, preloaded=preloaded_command_names())
+        with self._lock:
+            self._processes.append(process)
+        return process
+
+    def _discard(self, process):
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+    def start(self):
+        """Start the child processes."""
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(f"{self.size} command processes started")
+
+    def call_command(self, name, *args, timeout=None, limits=None, stop=None, **options):
+        """Execute the command in one of the child processes (see CommandProcess.call_command)."""
+        process = self._idle.get()
+        try:
+            return process.call_command(name, *args, timeout=timeout, limits=limits, stop=stop, **options)
+        finally:
+            if not process.is_alive():
+                self._discard(process)
+                process = self._spawn()
+            self._idle.put(process)
+
+    def close(self):
+        """Stop all the child processes."""
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for process in processes:
+            process.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_command_pool():
+    """
+    Return the pool of command processes of the worker, starting it on first use.
+
+    The `dbqueueworker` consumers start it before their threads, and before their first job.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CommandProcessPool()
+            _pool.start()
+        return _pool
+
+
+def close_command_pool():
+    """Stop the pool of command processes of the worker, if started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
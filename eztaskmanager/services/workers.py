@@ -0,0 +1,277 @@
+"""Workers consuming the database queue.
+
+- DatabaseQueueWorker claims due jobs from the database queue and executes them,
+  one at a time or in a bounded pool of threads.
+- run_workers starts a number of concurrent consumers, each in its own process,
+  optionally preloading the commands and recycling the consumers.
+
+Workers are started with the `dbqueueworker` management command.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from multiprocessing.connection import wait
+
+from django import db
+
+from eztaskmanager.settings import (EZTASKMANAGER_DBQUEUE_POLL_INTERVAL,
+                                    EZTASKMANAGER_EXECUTION_MODE,
+                                    EZTASKMANAGER_HEARTBEAT_INTERVAL,
+                                    EZTASKMANAGER_WORKER_MAX_JOBS,
+                                    EZTASKMANAGER_WORKER_MAX_MEMORY)
+
+logger = logging.getLogger(__name__)
+
+RECYCLE_EXIT_CODE = 3
+"""Exit code of the consumer processes asking to be replaced."""
+
+
+def get_rss_mb():
+    """Return the resident memory of the current process, in MB (the peak one, where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, KB elsewhere
+        return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
+
+
+class DatabaseQueueWorker:
+    """
+    A consumer of the database queue.
+
+    Claims due jobs one at a time, executing `run_management_command` for each of them,
+    within the job timeout of their task.
+    With `threads` > 1, jobs are executed concurrently by a pool of consumer threads,
+    each claiming its own jobs with its own database connection: this suits I/O bound commands,
+    that do not need a process per job. Job timeouts are not enforced in the threads, as they need
+    the main thread's SIGALRM, unless the commands are executed in subprocesses (see EZTASKMANAGER_EXECUTION_MODE).
+    The worker stops gracefully on SIGINT or SIGTERM, once the current jobs are finished.
+    It also stops, as recycled, after `max_jobs` jobs or when its memory grows past `max_memory` MB,
+    to be replaced by run_workers with a fresh process.
+    When idle, it also reaps the runs lost by dead workers, every EZTASKMANAGER_HEARTBEAT_INTERVAL seconds.
+
+    Attributes:
+        name (str): The name of the worker, used in logs.
+        poll_interval (float): Seconds to sleep when no jobs are due.
+        burst (bool): Whether to stop as soon as there are no more due jobs.
+        queues (list): The names of the queues to consume, all queues if empty.
+        threads (int): The number of jobs executed at once.
+        max_jobs (int): The number of jobs after which the worker is recycled.
+        max_memory (float): The MB of resident memory past which the worker is recycled.
+        n_executed (int): The number of jobs executed so far.
+        recycled (bool): Whether the worker stopped to be recycled.
+    """
+
+    def __init__(
+        self, name=None, poll_interval=EZTASKMANAGER_DBQUEUE_POLL_INTERVAL, burst=False, queues=None, threads=1,
+        max_jobs=EZTASKMANAGER_WORKER_MAX_JOBS, max_memory=EZTASKMANAGER_WORKER_MAX_MEMORY
+    ):
+        self.name = name or f"dbworker-{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.queues = queues or []
+        self.threads = max(threads, 1)
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.n_executed = 0
+        self.recycled = False
+        self._stopped = False
+        self._last_reap = None
+        self._lock = threading.Lock()
+
+    def stop(self, *args):
+        """Ask the worker to stop, once the current job is finished."""
+        self._stopped = True
+
+    def install_signal_handlers(self):
+        """Stop gracefully on SIGINT and SIGTERM."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+    def execute(self, job):
+        """Execute the management command of a claimed job."""
+        from eztaskmanager.services import run_management_command
+
+        logger.info(f"{self.name}: executing job {job.id} for task {job.task_id}")
+        try:
+            if job.is_periodic:
+                # runs of recurring jobs are passed their fire time, to detect misfires
+                run_management_command(job.task_id, enforce_timeout=True, scheduled=True, scheduled_at=job.run_at)
+            else:
+                run_management_command(job.task_id, enforce_timeout=True, **job.kwargs)
+        except Exception as e:
+            logger.exception(f"{self.name}: job {job.id} for task {job.task_id} raised {e}")
+        finally:
+            with self._lock:
+                self.n_executed += 1
+            db.close_old_connections()
+            self.check_health()
+
+    def check_health(self):
+        """Stop the worker to be recycled, if it executed `max_jobs` jobs or grew past `max_memory` MB."""
+        if self.recycled:
+            return
+        reason = None
+        if self.max_jobs and self.n_executed >= self.max_jobs:
+            reason = f"{self.n_executed} jobs executed"
+        elif self.max_memory and get_rss_mb() > self.max_memory:
+            reason = f"memory past {self.max_memory} MB"
+        if reason:
+            logger.info(f"{self.name}: recycling, {reason}")
+            self.recycled = True
+            self.stop()
+
+    def reap(self):
+        """Reap the lost runs, if the last reap is older than the heartbeat interval, and heartbeats are enabled."""
+        from eztaskmanager.services.heartbeats import reap_lost_runs
+
+        if not EZTASKMANAGER_HEARTBEAT_INTERVAL:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._last_reap is not None and now - self._last_reap < EZTASKMANAGER_HEARTBEAT_INTERVAL:
+                return
+            self._last_reap = now
+        try:
+            reap_lost_runs()
+        except Exception as e:
+            logger.exception(f"{self.name}: reaping the lost runs raised {e}")
+
+    def work(self):
+        """Consume the queue until stopped, or until no jobs are due, in burst mode.
+
+        Returns:
+            int: The number of executed jobs.
+        """
+        from eztaskmanager.services.subprocesses import (close_command_pool,
+                                                         get_command_pool)
+
+        logger.info(f"{self.name}: started, with {self.threads} threads")
+        if EZTASKMANAGER_EXECUTION_MODE == "subprocess":
+            # the command processes are forked before the first job
+            get_command_pool()
+        try:
+            if self.threads == 1:
+                self.consume()
+            else:
+                consumers = [
+                    threading.Thread(target=self._consume_in_thread, name=f"{self.name}-{n}")
+                    for n in range(self.threads)
+                ]
+                for consumer in consumers:
+                    consumer.start()
+                for consumer in consumers:
+                    # joined with a timeout, so that the signals are handled by the main thread
+                    while consumer.is_alive():
+                        consumer.join(timeout=1.0)
+        finally:
+            close_command_pool()
+        logger.info(f"{self.name}: stopped, after {self.n_executed} jobs")
+        return self.n_executed
+
+    def consume(self):
+        """Claim and execute jobs, until stopped, or until no jobs are due, in burst mode."""
+        from eztaskmanager.services.queues import DatabaseTaskQueueService
+
+        service = DatabaseTaskQueueService()
+        while not self._stopped:
+            job = service.claim(self.queues)
+            if job is None:
+                self.reap()
+                if self.burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            self.execute(job)
+
+    def _consume_in_thread(self):
+        try:
+            self.consume()
+        finally:
+            # each thread has its own database connection
+            db.connection.close()
+
+
+def _start_consumer(name, **kwargs):
+    """Run a worker in a consumer process, exiting with RECYCLE_EXIT_CODE if it is to be recycled."""
+    worker = DatabaseQueueWorker(name=name, **kwargs)
+    worker.install_signal_handlers()
+    worker.work()
+    if worker.recycled:
+        sys.exit(RECYCLE_EXIT_CODE)
+
+
+def run_workers(concurrency=1, preload=False, **kwargs):
+    """
+    Start `concurrency` workers consuming the database queue, and wait for them.
+
+    A single worker runs in the current process, more workers are forked as
+    separate processes, each with its own database connection.
+    Each worker executes up to `threads` jobs at once (see DatabaseQueueWorker).
+    SIGTERM received by the main process is forwarded to the consumers.
+
+    With `preload`, the commands are imported once, before starting the workers (see preload_commands):
+    the forked consumers share them, and run the jobs without importing them again.
+    Workers with `max_jobs` or `max_memory` always run in consumer processes, and the consumers
+    stopping to be recycled are replaced by new ones, forked from the warm main process.
+
+    Args:
+        concurrency: The number of concurrent consumers.
+        preload: Whether to preload the commands of the active AppCommands.
+        **kwargs: The arguments passed to each DatabaseQueueWorker.
+    """
+    if preload:
+        from eztaskmanager.services.preload import preload_commands
+
+        preload_commands()
+
+    recycling = kwargs.get("max_jobs", EZTASKMANAGER_WORKER_MAX_JOBS) or \
+        kwargs.get("max_memory", EZTASKMANAGER_WORKER_MAX_MEMORY)
+    if concurrency <= 1 and not recycling:
+        worker = DatabaseQueueWorker(**kwargs)
+        worker.install_signal_handlers()
+        worker.work()
+        return
+
+    context = multiprocessing.get_context("fork")
+    stopping = False
+
+    def start(n):
+        # database connections must not be shared with the forked processes
+        db.connections.close_all()
+        consumer = context.Process(
+            target=_start_consumer, args=(f"dbworker-{os.getpid()}-{n}",), kwargs=kwargs
+        )
+        consumer.start()
+        return consumer
+
+    consumers = {n: start(n) for n in range(max(concurrency, 1))}
+
+    def terminate(*args):
+        nonlocal stopping
+        stopping = True
+        for c in consumers.values():
+            if c.is_alive():
+                c.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    while consumers:
+        exited = wait([c.sentinel for c in consumers.values()])
+        for n, consumer in list(consumers.items()):
+            if consumer.sentinel not in exited:
+                continue
+            consumer.join()
+            if consumer.exitcode == RECYCLE_EXIT_CODE and not stopping:
+                consumers[n] = start(n)
+            else:
+                del consumers[n]
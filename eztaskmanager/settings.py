@@ -7,6 +7,157 @@ from django.conf import settings as django_project_settings
 EZTASKMANAGER_QUEUE_SERVICE_TYPE: str = getattr(
     django_project_settings, "EZTASKMANAGER_QUEUE_SERVICE_TYPE", 'RQ'
 )
+"""The queue service to use: 'RQ', 'Celery', 'DB' (database table, no broker needed) or 'Thread' (in-process)."""
+
+EZTASKMANAGER_DEFAULT_QUEUE: str = getattr(
+    django_project_settings, "EZTASKMANAGER_DEFAULT_QUEUE", "default"
+)
+"""The queue tasks are sent to, when neither the task nor its category set one."""
+
+EZTASKMANAGER_JOB_TIMEOUT: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_JOB_TIMEOUT", None
+)
+"""Default max execution time of jobs, in seconds; None keeps the queue backend's default."""
+
+EZTASKMANAGER_MEMORY_LIMIT: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_MEMORY_LIMIT", None
+)
+"""Default MB of memory a run can allocate, beyond the memory of its process when it starts (None: unlimited)."""
+
+EZTASKMANAGER_CPU_TIME_LIMIT: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_CPU_TIME_LIMIT", None
+)
+"""Default CPU seconds a run can use (None: unlimited)."""
+
+EZTASKMANAGER_RESULT_TTL: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_RESULT_TTL", 500
+)
+"""Default seconds the results of the jobs are kept by the queue backend."""
+
+EZTASKMANAGER_FAILURE_TTL: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_FAILURE_TTL", None
+)
+"""Default seconds the failed jobs are kept by the queue backend; None keeps the backend's default."""
+
+EZTASKMANAGER_SCHEDULE_JITTER: int = getattr(
+    django_project_settings, "EZTASKMANAGER_SCHEDULE_JITTER", 0
+)
+"""Default max seconds of random delay added to the scheduling of the tasks, when they are launched."""
+
+EZTASKMANAGER_MISFIRE_GRACE_TIME: int = getattr(
+    django_project_settings, "EZTASKMANAGER_MISFIRE_GRACE_TIME", 60
+)
+"""Default seconds a run of a recurring task can be late, before its misfire policy is applied."""
+
+EZTASKMANAGER_MISFIRE_MAX_CATCHUP_RUNS: int = getattr(
+    django_project_settings, "EZTASKMANAGER_MISFIRE_MAX_CATCHUP_RUNS", 100
+)
+"""Max number of missed runs executed after a misfire, with the RUN ALL policy."""
+
+EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_CIRCUIT_BREAKER_THRESHOLD", None
+)
+"""Default consecutive failures suspending the schedule of a recurring task (None disables the circuit breaker)."""
+
+EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL: int = getattr(
+    django_project_settings, "EZTASKMANAGER_CIRCUIT_BREAKER_PROBE_INTERVAL", 600
+)
+"""Default seconds between the probe runs of a task suspended by its circuit breaker."""
+
+EZTASKMANAGER_RUN_LOCK_TTL: int = getattr(
+    django_project_settings, "EZTASKMANAGER_RUN_LOCK_TTL", 24 * 60 * 60
+)
+"""Seconds after which the run lock of a task without job timeout is considered stale (e.g. a killed worker)."""
+
+EZTASKMANAGER_MAX_CONCURRENCY: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_MAX_CONCURRENCY", None
+)
+"""Max number of tasks running at once, on all workers; None for no limit. See also TaskCategory.max_concurrency."""
+
+EZTASKMANAGER_CONCURRENCY_RETRY_DELAY: int = getattr(
+    django_project_settings, "EZTASKMANAGER_CONCURRENCY_RETRY_DELAY", 30
+)
+"""Seconds after which a run deferred by the concurrency limits is tried again (plus a random jitter)."""
+
+EZTASKMANAGER_FORECAST_DEFAULT_DURATION: float = getattr(
+    django_project_settings, "EZTASKMANAGER_FORECAST_DEFAULT_DURATION", 60
+)
+"""Expected duration in seconds, in the schedule forecast, of the tasks without timed executions."""
+
+EZTASKMANAGER_FORECAST_CACHE_TIMEOUT: int = getattr(
+    django_project_settings, "EZTASKMANAGER_FORECAST_CACHE_TIMEOUT", 300
+)
+"""Seconds the schedule forecast is cached for."""
+
+EZTASKMANAGER_ENQUEUE_DEDUP_TTL: int = getattr(
+    django_project_settings, "EZTASKMANAGER_ENQUEUE_DEDUP_TTL", 60
+)
+"""Seconds the dedup key of an immediate launch lives in Redis or in the cache, for the RQ and Celery services."""
+
+EZTASKMANAGER_HEARTBEAT_INTERVAL: int = getattr(
+    django_project_settings, "EZTASKMANAGER_HEARTBEAT_INTERVAL", 30
+)
+"""Seconds between the heartbeats of a running task (0 disables them)."""
+
+EZTASKMANAGER_HEARTBEAT_TIMEOUT: int = getattr(
+    django_project_settings, "EZTASKMANAGER_HEARTBEAT_TIMEOUT", 120
+)
+"""Seconds without heartbeats after which a running task is considered lost, with its worker."""
+
+EZTASKMANAGER_CANCEL_CHECK_INTERVAL: float = getattr(
+    django_project_settings, "EZTASKMANAGER_CANCEL_CHECK_INTERVAL", 5
+)
+"""Seconds a command caches the result of `should_stop()`, before checking the cancellation of its run again."""
+
+EZTASKMANAGER_CANCEL_GRACE_PERIOD: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_CANCEL_GRACE_PERIOD", None
+)
+"""Seconds a cancelled run has to stop, before it is stopped by force, at its next heartbeat (None: never)."""
+
+EZTASKMANAGER_DBQUEUE_POLL_INTERVAL: float = getattr(
+    django_project_settings, "EZTASKMANAGER_DBQUEUE_POLL_INTERVAL", 1.0
+)
+"""Seconds a database queue worker sleeps, when no jobs are due."""
+
+EZTASKMANAGER_WORKER_MAX_JOBS: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_WORKER_MAX_JOBS", None
+)
+"""Number of jobs after which a database queue worker is recycled, replaced by a new process (None: never)."""
+
+EZTASKMANAGER_WORKER_MAX_MEMORY: Optional[int] = getattr(
+    django_project_settings, "EZTASKMANAGER_WORKER_MAX_MEMORY", None
+)
+"""MB of resident memory above which a database queue worker is recycled, replaced by a new process (None: never)."""
+
+EZTASKMANAGER_THREAD_POOL_SIZE: int = getattr(
+    django_project_settings, "EZTASKMANAGER_THREAD_POOL_SIZE", 4
+)
+"""Max number of tasks executed concurrently by the in-process thread pool ('Thread' queue service)."""
+
+EZTASKMANAGER_EXECUTION_MODE: str = getattr(
+    django_project_settings, "EZTASKMANAGER_EXECUTION_MODE", "inprocess"
+)
+"""Where the workers execute the commands: 'inprocess', or 'subprocess', in a pool of child processes (not with RQ)."""
+
+EZTASKMANAGER_SUBPROCESS_POOL_SIZE: int = getattr(
+    django_project_settings, "EZTASKMANAGER_SUBPROCESS_POOL_SIZE", 4
+)
+"""Number of child processes executing the commands of a worker, with the 'subprocess' execution mode."""
+
+EZTASKMANAGER_CELERY_APP: Optional[str] = getattr(
+    django_project_settings, "EZTASKMANAGER_CELERY_APP", None
+)
+"""Dotted path to the project's Celery app (e.g. "proj.celery.app"), used by the 'Celery' queue service."""
+
+EZTASKMANAGER_CELERY_BROKER_URL: Optional[str] = getattr(
+    django_project_settings, "EZTASKMANAGER_CELERY_BROKER_URL", None
+)
+"""Broker URL of the Celery app built when EZTASKMANAGER_CELERY_APP is not set (defaults to CELERY_BROKER_URL)."""
+
+EZTASKMANAGER_CELERY_RESULT_BACKEND: Optional[str] = getattr(
+    django_project_settings, "EZTASKMANAGER_CELERY_RESULT_BACKEND", None
+)
+"""Result backend of the Celery app built when EZTASKMANAGER_CELERY_APP is not set."""
 
 EZTASKMANAGER_BASE_URL: Optional[str] = getattr(
     django_project_settings, "EZTASKMANAGER_BASE_URL", None
@@ -0,0 +1,3 @@
+"""Celery tasks, found by the autodiscover_tasks() of the project's Celery app."""
+
+from eztaskmanager.services.queues import execute_management_command  # noqa: F401
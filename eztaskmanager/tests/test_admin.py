@@ -226,6 +226,35 @@ class TaskAdminTest(TestCase):
             request, messages.INFO, f'{len(queryset)} tasks stopped.', extra_tags='', fail_silently=False
         )
 
+    @patch.object(messages, "add_message")
+    @patch('eztaskmanager.services.queues.get_task_service')
+    def test_spread_tasks(self, mock_get_task_service, mock_add_message):
+        mock_service = mock_get_task_service.return_value
+        command = AppCommand.objects.create(app_name='testapp', name='testcmd')
+        scheduling = timezone.now() + timedelta(hours=1)
+        tasks = [
+            Task.objects.create(
+                name=f'task {n}', command=command, scheduling=scheduling,
+                repetition_period=Task.REPETITION_PERIOD_HOUR, repetition_rate=1,
+                status=Task.STATUS_SCHEDULED if n == 0 else Task.STATUS_IDLE
+            )
+            for n in range(4)
+        ]
+        one_off = Task.objects.create(name='one off', command=command, scheduling=scheduling)
+
+        self.admin.spread_tasks(request, Task.objects.all())
+
+        offsets = sorted(
+            (t.scheduling - Task.objects.get(pk=tasks[0].pk).scheduling).total_seconds()
+            for t in Task.objects.filter(pk__in=[t.pk for t in tasks])
+        )
+        self.assertEqual(offsets, [0, 900, 1800, 2700])
+        self.assertEqual(Task.objects.get(pk=one_off.pk).scheduling, scheduling)
+        self.assertEqual(mock_service.add.call_count, 1)
+        mock_add_message.assert_called_once_with(
+            request, messages.INFO, '4 periodic tasks spread.', extra_tags='', fail_silently=False
+        )
+
     def test_repetition_no_rate_or_period(self):
         command = AppCommand.objects.create(app_name='testapp', name='testcmd')
         task = Task.objects.create(
@@ -362,6 +391,18 @@ class TaskAdminButtonsTest(TestCase):
 
         service.remove.assert_called_once_with(task)
 
+    @patch('eztaskmanager.services.cancellation.request_cancellation', return_value=1)
+    def test_response_change_cancel_task(self, mock_request_cancellation):
+        request = self.factory.post('/dummyurl/', {'_cancel-task': 'some value'})
+        request.user = MockSuperUser()
+        request.session = 'session'
+        request._messages = FallbackStorage(request)
+        task = MagicMock()  # assuming Task instance
+
+        self.admin.response_change(request, task)
+
+        mock_request_cancellation.assert_called_once_with(task)
+
     @patch('eztaskmanager.services.queues.get_task_service')
     def test_response_change_without_start_or_stop_task(self, mocked_service):
         request = self.factory.post('/dummyurl/', {'some-other-field': 'Some value'})
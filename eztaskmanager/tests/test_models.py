@@ -1,9 +1,10 @@
-from unittest.mock import MagicMock
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from django.test import TestCase
 from django.utils import timezone
 
-from eztaskmanager.models import AppCommand, Task, LaunchReport, Log, TaskCategory
+from eztaskmanager.models import (AppCommand, Task, LaunchReport, Log, TaskCategory,
+                                  PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL)
 from unittest import mock
 from eztaskmanager.management.commands.test_command import Command
 
@@ -22,26 +23,13 @@ class AppCommandTestCase(TestCase):
             name='test_command'
         )  # Assert if the function is called once
 
-    @mock.patch('eztaskmanager.models.load_command_class', return_value=MagicMock())
+    @mock.patch('eztaskmanager.models.load_command_class')
     def test_help_text(self, mock_load_command_class):
-        # The text you expect to be written to output
-        expected_output = "sample text"
-
-        # Create a mock parser that writes expected text to its 'file' argument when print_help is called
-        mock_parser = MagicMock()
-        def mock_print_help(file):
-            file.write(expected_output)
-        mock_parser.print_help = mock_print_help
-
-        # Configure the mocked command class to return the mocked parser
-        mock_command_class = mock_load_command_class.return_value
-        mock_command_class.create_parser.return_value = mock_parser
-
-        # Now when you call help_text, it should return the content written by the mocked parser
-        response = self.appCommand.help_text
-        self.assertEqual(response, expected_output)
-
-        mock_load_command_class.assert_called_once()  # Check whether mock_load_command_class() is called
+        # the help text collected by collectcommands is shown, without loading the command
+        self.appCommand.cached_help_text = "sample text"
+        self.assertEqual(self.appCommand.help_text, "sample text")
+        self.assertIsNone(self.appCommand.get_parser())
+        mock_load_command_class.assert_not_called()
 
     def test_str(self):
         self.assertEqual(str(self.appCommand), f"{self.appCommand.app_name}: {self.appCommand.name}")
@@ -163,6 +151,68 @@ class TaskTestCase(TestCase):
         result = []
         self.assertEqual(self.empty_task.complete_args, result)
 
+    def test_queue_and_priority_inheritance(self):
+        self.assertEqual(self.task.queue_name, "default")
+        self.assertEqual(self.task.effective_priority, PRIORITY_NORMAL)
+
+        self.task.category = TaskCategory.objects.create(name="etl", queue="long", priority=PRIORITY_LOW)
+        self.assertEqual(self.task.queue_name, "long")
+        self.assertEqual(self.task.effective_priority, PRIORITY_LOW)
+
+        self.task.queue = "short"
+        self.task.priority = PRIORITY_HIGH
+        self.assertEqual(self.task.queue_name, "short")
+        self.assertEqual(self.task.effective_priority, PRIORITY_HIGH)
+
+    def test_timeout_and_ttls_inheritance(self):
+        self.assertIsNone(self.task.effective_job_timeout)
+        self.assertEqual(self.task.effective_result_ttl, 500)
+
+        self.task.category = TaskCategory.objects.create(name="etl", job_timeout=3600, failure_ttl=86400)
+        self.assertEqual(self.task.effective_job_timeout, 3600)
+        self.assertEqual(self.task.effective_failure_ttl, 86400)
+
+        self.task.job_timeout = 60
+        self.assertEqual(self.task.effective_job_timeout, 60)
+
+    def test_save_leaves_runtime_fields_alone(self):
+        Task.objects.filter(pk=self.task.pk).update(n_skipped_runs=3, pending_run=True)
+        self.task.note = "changed"
+        self.task.save()
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.note, "changed")
+        self.assertEqual((self.task.n_skipped_runs, self.task.pending_run), (3, True))
+
+    def test_next_cron_time(self):
+        from django.core.exceptions import ValidationError
+        from eztaskmanager.models import next_cron_time
+
+        monday = datetime(2026, 10, 19, 2, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(next_cron_time("0 2 * * 1-5", monday), monday + timedelta(days=1))
+        self.assertEqual(next_cron_time("0 2 * * 1-5", monday - timedelta(days=2)), monday)
+
+        # the initial scheduling is the earliest fire time
+        self.task.cron_string = "0 2 * * *"
+        self.task.scheduling = monday + timedelta(days=7)
+        self.assertEqual(self.task.next_cron_time(monday), monday + timedelta(days=7))
+        self.assertTrue(self.task.is_recurring)
+        self.assertFalse(self.task.is_periodic)
+
+        self.task.cron_string = "0 2 * *"
+        with self.assertRaises(ValidationError):
+            self.task.full_clean()
+
+    def test_retryable_results(self):
+        from django.core.exceptions import ValidationError
+
+        self.task.retry_on = "Failed, timeout"
+        self.assertEqual(self.task.retryable_results, ["failed", "timeout"])
+
+        self.task.retry_on = "failed,crashed"
+        with self.assertRaises(ValidationError):
+            self.task.full_clean()
+
     def test_prune_reports(self):
         self.task.prune_reports(n=2)  # Try to leave just two reports
         self.assertEqual(LaunchReport.objects.filter(task=self.task).count(), 2)
@@ -170,6 +220,96 @@ class TaskTestCase(TestCase):
     def test_str(self):
         self.assertEqual(str(self.task), 'Test Task (idle)')
 
+    def test_parsed_arguments(self):
+        self.assertEqual(self.task.parsed_arguments[:3], [
+            ["-f", None], ["--firstarg", "param1"], ["--secondarg", "param2"]
+        ])
+        self.assertEqual(self.empty_task.parsed_arguments, [])
+
+        # parsed again when the arguments are saved, and only then
+        self.empty_task.arguments = "--verbosity=2, -x"
+        self.empty_task.save(update_fields=["arguments"])
+        self.empty_task.refresh_from_db()
+        self.assertEqual(self.empty_task.parsed_arguments, [["--verbosity", "2"], ["-x", None]])
+        self.assertEqual(self.empty_task.complete_args, ["--verbosity", "2", "-x"])
+
+    def test_clean_arguments(self):
+        from django.core.exceptions import ValidationError
+
+        from eztaskmanager.services.commands import collect_command_metadata
+
+        command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        task = Task(name="Validated Task", command=command, arguments="first, --unknown")
+        # not validated until the command is collected
+        task.full_clean()
+
+        collect_command_metadata(command)
+        task.arguments = "first, second, -a"
+        with mock.patch('eztaskmanager.models.load_command_class') as mock_load_command_class:
+            task.full_clean()
+        mock_load_command_class.assert_not_called()
+        self.assertEqual(task.complete_args, ["first", "second", "-a"])
+
+        task.arguments = "first, --unknown"
+        with self.assertRaises(ValidationError) as cm:
+            task.full_clean()
+        self.assertIn("arguments", cm.exception.message_dict)
+
+    def test_transition(self):
+        from eztaskmanager.models import InvalidStatusTransition
+
+        stale = Task.objects.get(pk=self.task.pk)
+        self.assertTrue(self.task.transition(Task.STATUS_SCHEDULED, scheduled_job_id="job-id"))
+        self.assertEqual((self.task.status, self.task.scheduled_job_id), (Task.STATUS_SCHEDULED, "job-id"))
+
+        # a stale copy does not move the task
+        self.assertFalse(stale.transition(Task.STATUS_STARTED))
+        self.assertEqual(stale.status, Task.STATUS_IDLE)
+        self.assertTrue(stale.transition(Task.STATUS_STARTED, expected=Task.STATUS_SCHEDULED))
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.scheduled_job_id), (Task.STATUS_STARTED, "job-id"))
+
+        with self.assertRaises(InvalidStatusTransition):
+            self.task.transition(Task.STATUS_STARTED)
+
+    def test_save_leaves_the_state_alone(self):
+        stale = Task.objects.get(pk=self.task.pk)
+        next_ride = timezone.now() + timedelta(hours=1)
+        self.task.transition(Task.STATUS_SCHEDULED, cached_next_ride=next_ride)
+
+        stale.name = "Renamed Task"
+        stale.save()
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.name, "Renamed Task")
+        self.assertEqual((self.task.status, self.task.cached_next_ride), (Task.STATUS_SCHEDULED, next_ride))
+
+    def test_save_refuses_unsaved_state(self):
+        from eztaskmanager.models import UnsavedTaskState
+
+        self.task.status = Task.STATUS_SCHEDULED
+        with self.assertRaises(UnsavedTaskState):
+            self.task.save()
+        self.task.save(update_fields=["status"])
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, Task.STATUS_SCHEDULED)
+
+        # the values written by the atomic updates are not changes
+        self.task.mark_written(n_skipped_runs=3)
+        self.task.name = "Renamed Task"
+        self.task.save()
+
+    def test_transition_writes_the_edits(self):
+        scheduling = timezone.now() + timedelta(hours=1)
+        self.task.scheduling = scheduling
+        self.task.arguments = "--verbosity 2"
+        self.assertEqual(self.task.changed_fields(), ["arguments", "scheduling"])
+
+        self.assertTrue(self.task.transition(Task.STATUS_SCHEDULED, scheduled_job_id="job-id"))
+        self.assertEqual(self.task.changed_fields(), [])
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual((task.status, task.scheduling), (Task.STATUS_SCHEDULED, scheduling))
+        self.assertEqual(task.parsed_arguments, [["--verbosity", "2"]])
+
     def test_compute_cache(self):
         # Let's simulate that a new execution report was created after compute_cache function ran
         latest_report = LaunchReport.objects.create(task=self.task, invocation_result=LaunchReport.RESULT_FAILED)
@@ -1,5 +1,7 @@
 # Unittest Test case
 from datetime import datetime, timedelta
+from importlib.util import find_spec
+from unittest import skipUnless
 from unittest.mock import patch, MagicMock
 
 from django.test import TestCase
@@ -7,14 +9,15 @@ from django.urls import reverse
 from django.utils import timezone
 
 import eztaskmanager
-from eztaskmanager.models import Task, LaunchReport
+from eztaskmanager.models import PRIORITY_HIGH, PRIORITY_NORMAL, Task, LaunchReport, QueuedJob, TaskCategory, \
+    ConcurrencySlot
 from eztaskmanager.services.notifications import SlackNotificationHandler, LEVEL_MAPPING, MESSAGES, \
     EmailNotificationHandler, get_base_url, emit_notifications
 
-from eztaskmanager.services.queues import get_task_service, TaskQueueException
+from eztaskmanager.services.queues import get_task_service, TaskQueueException, DatabaseTaskQueueService
 tsq_imported_module = None
 try:
-    from eztaskmanager.services.queues import RQTaskQueueService
+    from eztaskmanager.services.queues import RQTaskQueueService, execute_immediate_run
     tsq_imported_module = 'rq'
 except ImportError:
     try:
@@ -77,6 +80,13 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock Task instance
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduling = (datetime.now() + timedelta(days=5)).strftime("%Y-%m-%d %H:%M:%S")
             mock_task.scheduling_utc = timezone.make_aware(
                 datetime.strptime(mock_task.scheduling, "%Y-%m-%d %H:%M:%S")
@@ -101,18 +111,26 @@ class TestRQTaskQueueService(TestCase):
             # Assert the methods were called with the right parameters
             service.scheduler.enqueue_at.assert_called_once_with(
                 mock_task.scheduling_utc,
-                mock_run_management_command, mock_task.id
+                mock_run_management_command, mock_task.id,
+                timeout=None, job_result_ttl=None,
+                queue_name='default', at_front=False
             )
 
             # Assert that the task has been assigned the correct attributes
             self.assertEqual(mock_task.scheduled_job_id, mock_rq_enqueued_job.id)
-            self.assertEqual(mock_task.status, Task.STATUS_SCHEDULED)
-            self.assertEqual(mock_task.cached_next_ride, mock_fetch_job_with_next_time.return_value[1])
+            mock_task.transition.assert_called_with(
+                Task.STATUS_SCHEDULED, scheduled_job_id=mock_task.scheduled_job_id,
+                cached_next_ride=mock_fetch_job_with_next_time.return_value[1]
+            )
 
             # If the task does not contain the schedule attribute, the queue.enqueue method should be called
             mock_task.scheduling = None
             service.add(mock_task)
-            service.queue.enqueue.assert_called_once_with(mock_run_management_command, mock_task.id)
+            service.queue.enqueue.assert_called_once_with(
+                execute_immediate_run, mock_task.id, f'eztaskmanager-task-{mock_task.id}-immediate',
+                job_id=service.queue.connection.set.call_args.args[1],
+                job_timeout=None, result_ttl=None, failure_ttl=None, at_front=False
+            )
 
     @patch('django_rq.get_queue', return_value=MagicMock())
     @patch('django_rq.get_scheduler', return_value=MagicMock())
@@ -130,6 +148,13 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock Task instance
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduling = (datetime.now() + timedelta(days=5)).strftime("%Y-%m-%d %H:%M:%S")
             mock_task.scheduling_utc = timezone.make_aware(
                 datetime.strptime(mock_task.scheduling, "%Y-%m-%d %H:%M:%S")
@@ -156,20 +181,28 @@ class TestRQTaskQueueService(TestCase):
             # Assert the methods were called with the right parameters
             service.scheduler.schedule.assert_called_once_with(
                 mock_task.scheduling_utc,
-                mock_run_management_command, [mock_task.id],
+                mock_run_management_command, [mock_task.id], {"scheduled": True},
                 interval=mock_task.interval_in_seconds,
-                result_ttl=int(1.5 * mock_task.interval_in_seconds)
+                result_ttl=int(1.5 * mock_task.interval_in_seconds),
+                timeout=None,
+                queue_name='default', at_front=False
             )
 
             # Assert that the task has been assigned the correct attributes
             self.assertEqual(mock_task.scheduled_job_id, mock_rq_scheduled_job.id)
-            self.assertEqual(mock_task.status, Task.STATUS_SCHEDULED)
-            self.assertEqual(mock_task.cached_next_ride, mock_fetch_job_with_next_time.return_value[1])
+            mock_task.transition.assert_called_with(
+                Task.STATUS_SCHEDULED, scheduled_job_id=mock_task.scheduled_job_id,
+                cached_next_ride=mock_fetch_job_with_next_time.return_value[1]
+            )
 
             # If the task does not contain the schedule attribute, the queue.enqueue method should be called
             mock_task.scheduling = False
             service.add(mock_task)
-            service.queue.enqueue.assert_called_once_with(mock_run_management_command, mock_task.id)
+            service.queue.enqueue.assert_called_once_with(
+                execute_immediate_run, mock_task.id, f'eztaskmanager-task-{mock_task.id}-immediate',
+                job_id=service.queue.connection.set.call_args.args[1],
+                job_timeout=None, result_ttl=None, failure_ttl=None, at_front=False
+            )
 
     @patch('django_rq.get_queue', return_value=MagicMock())
     @patch('django_rq.get_scheduler', return_value=MagicMock())
@@ -184,6 +217,13 @@ class TestRQTaskQueueService(TestCase):
             # Setup
             service = RQTaskQueueService()
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduling = (datetime.now() - timedelta(days=5)).strftime("%Y-%m-%d %H:%M:%S")
             mock_task.scheduling_utc = timezone.make_aware(
                 datetime.strptime(mock_task.scheduling, "%Y-%m-%d %H:%M:%S")
@@ -198,6 +238,157 @@ class TestRQTaskQueueService(TestCase):
             # Assert the exception message is as expected
             self.assertTrue('It is not possible to schedule tasks in the past' in str(context.exception))
 
+    @patch('django_rq.get_queue')
+    @patch('django_rq.get_scheduler', return_value=MagicMock())
+    def test_add_routes_to_task_queue(self, mock_get_scheduler, mock_get_queue):
+        if tsq_imported_module == 'rq':
+            default_queue = MagicMock()
+            default_queue.name = 'default'
+            long_queue = MagicMock()
+            long_queue.name = 'long'
+            mock_get_queue.side_effect = lambda name: {'default': default_queue, 'long': long_queue}[name]
+            service = RQTaskQueueService()
+            # the mocked scheduled jobs are not found in the scheduler
+            service.scheduler.connection.zscore.return_value = None
+
+            mock_task = MagicMock()
+            mock_task.scheduled_job_id = None
+            mock_task.scheduling = None
+            mock_task.queue_name = 'long'
+            mock_task.effective_priority = PRIORITY_HIGH
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
+
+            service.add(mock_task)
+
+            default_queue.enqueue.assert_not_called()
+            self.assertTrue(long_queue.enqueue.call_args.kwargs['at_front'])
+
+            # scheduled jobs are moved to the task's queue by the scheduler
+            mock_task.scheduling = datetime.now() + timedelta(days=1)
+            mock_task.scheduling_utc = timezone.make_aware(mock_task.scheduling)
+            mock_task.is_periodic = False
+            service.add(mock_task)
+            self.assertEqual(service.scheduler.enqueue_at.call_args.kwargs['queue_name'], 'long')
+
+    @patch('django_rq.get_queue', return_value=MagicMock())
+    @patch('django_rq.get_scheduler', return_value=MagicMock())
+    def test_immediate_launch_returns_queued_job(self, mock_get_scheduler, mock_get_queue):
+        if tsq_imported_module == 'rq':
+            service = RQTaskQueueService()
+            mock_task = MagicMock()
+            mock_task.id = 7
+            mock_task.scheduled_job_id = None
+            mock_task.scheduling = None
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.is_cron = False
+            connection = service.queue.connection
+            # the dedup key is free: the run is enqueued under a fresh job id, stored in the key
+            connection.set.return_value = True
+            job = service.add(mock_task)
+            key, job_id = connection.set.call_args.args
+            self.assertEqual(key, 'eztaskmanager-task-7-immediate')
+            self.assertEqual(connection.set.call_args.kwargs, {'nx': True, 'ex': 60})
+            self.assertIs(job, service.queue.enqueue.return_value)
+            self.assertEqual(service.queue.enqueue.call_args.args, (execute_immediate_run, 7, key))
+            self.assertEqual(service.queue.enqueue.call_args.kwargs['job_id'], job_id)
+
+            # the key is taken by a queued job, which is returned
+            service.queue.enqueue.reset_mock()
+            connection.set.return_value = False
+            connection.get.return_value = b'job-1'
+            queued_job = MagicMock()
+            queued_job.get_status.return_value = "queued"
+            service.queue.fetch_job.return_value = queued_job
+            self.assertIs(service.add(mock_task), queued_job)
+            service.queue.fetch_job.assert_called_once_with('job-1')
+            service.queue.enqueue.assert_not_called()
+
+            # a started job is not a duplicate, and its id is never reused
+            queued_job.get_status.return_value = "started"
+            service.add(mock_task)
+            service.queue.enqueue.assert_called_once()
+            self.assertNotEqual(service.queue.enqueue.call_args.kwargs['job_id'], 'job-1')
+            self.assertEqual(connection.set.call_args.args[1], service.queue.enqueue.call_args.kwargs['job_id'])
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_immediate_run_clears_dedup_key(self, mock_run):
+        if tsq_imported_module == 'rq':
+            job = MagicMock()
+            with patch('eztaskmanager.services.queues.get_current_job', return_value=job):
+                execute_immediate_run(7, 'eztaskmanager-task-7-immediate')
+            job.connection.delete.assert_called_once_with('eztaskmanager-task-7-immediate')
+            mock_run.assert_called_once_with(7)
+
+    @patch('django_rq.get_queue', return_value=MagicMock())
+    @patch('django_rq.get_scheduler', return_value=MagicMock())
+    def test_add_with_timeout_and_ttls(self, mock_get_scheduler, mock_get_queue):
+        if tsq_imported_module == 'rq':
+            service = RQTaskQueueService()
+            mock_task = MagicMock()
+            mock_task.scheduled_job_id = None
+            mock_task.scheduling = None
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = 600
+            mock_task.effective_result_ttl = 3600
+            mock_task.effective_failure_ttl = 86400
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
+
+            # the mocked scheduled jobs are not found in the scheduler
+            service.scheduler.connection.zscore.return_value = None
+            service.add(mock_task)
+            self.assertEqual(
+                service.queue.enqueue.call_args.kwargs,
+                {
+                    'job_id': service.queue.connection.set.call_args.args[1],
+                    'job_timeout': 600, 'result_ttl': 3600, 'failure_ttl': 86400, 'at_front': False
+                }
+            )
+
+            # periodic jobs are kept at least for their interval
+            mock_task.scheduling = datetime.now() + timedelta(days=1)
+            mock_task.scheduling_utc = timezone.make_aware(mock_task.scheduling)
+            mock_task.is_periodic = True
+            mock_task.interval_in_seconds = 86400
+            rq_job = service.add(mock_task)
+            kwargs = service.scheduler.schedule.call_args.kwargs
+            self.assertEqual((kwargs['timeout'], kwargs['result_ttl']), (600, int(1.5 * 86400)))
+            self.assertEqual(rq_job.failure_ttl, 86400)
+            rq_job.save.assert_called_once()
+
+    @patch('django_rq.get_queue', return_value=MagicMock())
+    @patch('django_rq.get_scheduler', return_value=MagicMock())
+    @patch('eztaskmanager.services.run_management_command')
+    @patch('eztaskmanager.services.queues.RQTaskQueueService.fetch_job_with_next_time')
+    def test_add_cron_task(
+            self, mock_fetch_job_with_next_time, mock_run_management_command, mock_get_scheduler, mock_get_queue
+    ):
+        if tsq_imported_module == 'rq':
+            service = RQTaskQueueService()
+            mock_task = MagicMock()
+            mock_task.scheduled_job_id = None
+            mock_task.scheduling = None
+            mock_task.is_cron = True
+            mock_task.cron_string = '0 2 * * 1-5'
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_failure_ttl = None
+            mock_fetch_job_with_next_time.return_value = ('job', 'next time')
+
+            service.add(mock_task)
+
+            service.scheduler.cron.assert_called_once_with(
+                '0 2 * * 1-5', mock_run_management_command, [mock_task.id], {"scheduled": True},
+                timeout=None, queue_name='default', at_front=False
+            )
+            mock_task.transition.assert_called_once_with(
+                Task.STATUS_SCHEDULED, scheduled_job_id=mock_task.scheduled_job_id, cached_next_ride='next time'
+            )
+
     @patch('django_rq.get_scheduler', return_value=MagicMock())
     @patch('eztaskmanager.services.queues.RQTaskQueueService.fetch_job_with_next_time')
     def test_remove(self, mock_fetch_job_with_next_time, mock_get_scheduler):
@@ -207,6 +398,13 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock Task instance
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.id = 1
             mock_task.scheduled_job_id = 'job-id'
 
@@ -222,11 +420,9 @@ class TestRQTaskQueueService(TestCase):
             # Assert the methods were called with the right parameters
             service.scheduler.cancel.assert_called_once_with(mock_job)
 
-            # Assert the task attributes are correctly updated
-            self.assertEqual(mock_task.scheduled_job_id, None)
-            self.assertEqual(mock_task.cached_next_ride, None)
-            self.assertEqual(mock_task.status, Task.STATUS_IDLE)
-            mock_task.save.assert_called_once()
+            # Assert the task is moved to IDLE, writing only the changed fields
+            mock_task.transition.assert_called_once_with(Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
+            mock_task.save.assert_not_called()
 
     @patch('django_rq.get_scheduler', return_value=MagicMock())
     @patch('eztaskmanager.services.queues.RQTaskQueueService.fetch_job_with_next_time')
@@ -237,6 +433,13 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock Task instance in Started status
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'job-id'
             mock_task.cached_next_ride = (datetime.now() + timedelta(days=5)).strftime("%Y-%m-%d %H:%M:%S")
             mock_task.status = Task.STATUS_STARTED
@@ -254,12 +457,8 @@ class TestRQTaskQueueService(TestCase):
             # Assert scheduler.cancel was not called
             service.scheduler.cancel.assert_not_called()
 
-            # Assert the task attributes were reset
-            # The task status is now Idle
-            assert not mock_task.scheduled_job_id
-            assert not mock_task.cached_next_ride
-            assert mock_task.status == Task.STATUS_IDLE
-            mock_task.save.assert_called()
+            # Assert the task is moved to IDLE, resetting its job
+            mock_task.transition.assert_called_once_with(Task.STATUS_IDLE, scheduled_job_id=None, cached_next_ride=None)
 
     @patch('django_rq.get_scheduler', return_value=MagicMock())
     def test_fetch_job_with_next_time_job_exists(self, mock_get_scheduler):
@@ -269,19 +468,32 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock task
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'job-id'
 
-            # mock the return value of scheduler.get_jobs
+            # the job is looked up by its id, and its time is its score in the scheduler
             mock_job = MagicMock(id='job-id')
-            next_time = datetime.now() + timedelta(days=1)
-            service.scheduler.get_jobs.return_value = [(mock_job, next_time)]
+            next_time = timezone.now().replace(microsecond=0) + timedelta(days=1)
+            service.scheduler.connection.zscore.return_value = next_time.timestamp()
 
             # Call the method
-            job, next_run_time = service.fetch_job_with_next_time(mock_task)
+            with patch('eztaskmanager.services.queues.Job.fetch', return_value=mock_job) as mock_fetch:
+                job, next_run_time = service.fetch_job_with_next_time(mock_task)
 
             # Assert the method returns the correct job and next_time
             self.assertEqual(job, mock_job)
-            self.assertEqual(next_run_time, timezone.make_aware(next_time, timezone=timezone.timezone.utc))
+            self.assertEqual(next_run_time, next_time)
+            service.scheduler.connection.zscore.assert_called_once_with(
+                service.scheduler.scheduled_jobs_key, 'job-id'
+            )
+            mock_fetch.assert_called_once_with('job-id', connection=service.scheduler.connection)
+            service.scheduler.get_jobs.assert_not_called()
 
     @patch('django_rq.get_scheduler', return_value=MagicMock())
     def test_fetch_job_with_next_time_job_not_exists(self, mock_scheduler):
@@ -291,10 +503,17 @@ class TestRQTaskQueueService(TestCase):
 
             # Create a mock task
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'job_id'
 
-            # mock the return value of scheduler.get_jobs
-            mock_scheduler.get_jobs.return_value = [(MagicMock(id='other_job_id'), 'next_time')]
+            # the job is not in the scheduler
+            service.scheduler.connection.zscore.return_value = None
 
             # Call the method
             job, next_time = service.fetch_job_with_next_time(mock_task)
@@ -474,6 +693,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = None  # No existing job
             mock_task.scheduling = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
             mock_task.scheduling_utc = timezone.make_aware(
@@ -512,6 +738,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'old-job-123'  # Existing job
             mock_task.name = 'test_task'
             mock_task.id = 42
@@ -555,6 +788,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'orphaned-job-999'  # Job doesn't exist in Redis
             mock_task.name = 'test_task'
             mock_task.id = 99
@@ -598,6 +838,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'old-periodic-job-111'
             mock_task.name = 'periodic_task'
             mock_task.id = 55
@@ -638,6 +885,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.name = 'rapid_reschedule_task'
             mock_task.id = 77
             mock_task.scheduling = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
@@ -689,6 +943,13 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service = RQTaskQueueService()
 
             mock_task = MagicMock()
+            mock_task.queue_name = 'default'
+            mock_task.effective_priority = PRIORITY_NORMAL
+            mock_task.effective_job_timeout = None
+            mock_task.effective_result_ttl = None
+            mock_task.effective_failure_ttl = None
+            mock_task.effective_schedule_jitter = 0
+            mock_task.is_cron = False
             mock_task.scheduled_job_id = 'leftover-job-888'
             mock_task.name = 'immediate_task'
             mock_task.scheduling = None  # Immediate execution
@@ -703,7 +964,11 @@ class TestRQTaskQueueServiceDeduplication(TestCase):
             service.scheduler.cancel.assert_called_once_with('leftover-job-888')
 
             # Assert immediate execution was queued
-            service.queue.enqueue.assert_called_once_with(mock_run_management_command, mock_task.id)
+            service.queue.enqueue.assert_called_once_with(
+                execute_immediate_run, mock_task.id, f'eztaskmanager-task-{mock_task.id}-immediate',
+                job_id=service.queue.connection.set.call_args.args[1],
+                job_timeout=None, result_ttl=None, failure_ttl=None, at_front=False
+            )
 
 
 class TestEmitNotifications(TestCase):
@@ -752,3 +1017,1365 @@ class TestEmitNotifications(TestCase):
         assert res is None
         mock_slack_handler.handle.assert_not_called()
         mock_email_handler.handle.assert_not_called()
+
+
+class TestDatabaseTaskQueueService(TestCase):
+    """Test the database queue service and its workers."""
+
+    def setUp(self):
+        from eztaskmanager.models import AppCommand
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        self.task = Task.objects.create(name="db task", command=self.command, arguments="a, b")
+        self.service = DatabaseTaskQueueService()
+
+    @patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='DB')
+    def test_get_task_service_with_db(self):
+        self.assertIsInstance(get_task_service(), DatabaseTaskQueueService)
+
+    def test_add_immediate_task(self):
+        job = self.service.add(self.task)
+
+        self.assertEqual(QueuedJob.objects.count(), 1)
+        self.assertLessEqual(job.run_at, timezone.now())
+        self.assertIsNone(job.interval)
+        self.assertIsNone(self.task.scheduled_job_id)
+
+    def test_add_periodic_task(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.task.repetition_period = Task.REPETITION_PERIOD_HOUR
+        self.task.repetition_rate = 2
+        job = self.service.add(self.task)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_SCHEDULED)
+        self.assertEqual(self.task.scheduled_job_id, str(job.id))
+        self.assertEqual(self.task.cached_next_ride, job.run_at)
+        self.assertEqual(job.interval, 7200)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (job, job.run_at))
+
+        # re-adding replaces the scheduled job
+        new_job = self.service.add(self.task)
+        self.assertEqual(list(QueuedJob.objects.all()), [new_job])
+
+    def test_add_in_the_past(self):
+        self.task.scheduling = timezone.now() - timedelta(hours=1)
+        with self.assertRaises(TaskQueueException):
+            self.service.add(self.task)
+
+    def test_remove(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.service.add(self.task)
+        self.service.remove(self.task)
+
+        self.task.refresh_from_db()
+        self.assertEqual(QueuedJob.objects.count(), 0)
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertIsNone(self.task.scheduled_job_id)
+        self.assertIsNone(self.task.cached_next_ride)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (None, None))
+
+    def test_claim_one_off_job(self):
+        QueuedJob.objects.create(task=self.task, run_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(self.service.claim())
+
+        due_job = QueuedJob.objects.create(task=self.task, run_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.service.claim(), due_job)
+        self.assertFalse(QueuedJob.objects.filter(pk=due_job.pk).exists())
+        self.assertIsNone(self.service.claim())
+
+    def test_claim_periodic_job(self):
+        run_at = timezone.now() - timedelta(seconds=250)
+        job = QueuedJob.objects.create(task=self.task, run_at=run_at, interval=100)
+
+        self.assertEqual(self.service.claim(), job)
+
+        # the job is moved to its next execution time, keeping its phase
+        job.refresh_from_db()
+        self.assertEqual(job.run_at, run_at + timedelta(seconds=300))
+        self.assertIsNone(self.service.claim())
+
+    def test_add_with_jitter(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.task.schedule_jitter = 600
+        job = self.service.add(self.task)
+
+        self.assertGreaterEqual(job.run_at, self.task.scheduling_utc)
+        self.assertLessEqual(job.run_at, self.task.scheduling_utc + timedelta(seconds=600))
+        self.assertEqual(self.task.cached_next_ride, job.run_at)
+
+    def test_cron_job(self):
+        self.task.cron_string = "*/15 * * * *"
+        job = self.service.add(self.task)
+
+        self.assertEqual(job.run_at.minute % 15, 0)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(self.task.cached_next_ride, job.run_at)
+
+        # claimed cron jobs are moved to the next fire time
+        run_at = job.run_at
+        QueuedJob.objects.filter(pk=job.pk).update(run_at=run_at - timedelta(minutes=15))
+        self.assertEqual(self.service.claim(), job)
+        job.refresh_from_db()
+        self.assertEqual(job.run_at, run_at)
+
+    def test_immediate_launch_is_idempotent(self):
+        job = self.service.add(self.task)
+        self.assertEqual(self.service.add(self.task), job)
+        self.assertEqual(QueuedJob.objects.count(), 1)
+
+        # once claimed, the task can be launched again
+        self.service.claim()
+        self.assertNotEqual(self.service.add(self.task), job)
+        self.assertEqual(QueuedJob.objects.count(), 1)
+
+    def test_claim_by_queue_and_priority(self):
+        category = TaskCategory.objects.create(name="etl", queue="long", priority=PRIORITY_HIGH)
+        etl_task = Task.objects.create(name="etl task", command=self.command, category=category)
+        low_job = self.service.add(self.task)
+        etl_job = self.service.add(etl_task)
+
+        self.assertEqual((etl_job.queue, etl_job.priority), ("long", PRIORITY_HIGH))
+        self.assertEqual((low_job.queue, low_job.priority), ("default", PRIORITY_NORMAL))
+        self.assertIsNone(self.service.claim(queues=["other"]))
+        self.assertEqual(self.service.claim(), etl_job)
+        self.assertEqual(self.service.claim(queues=["default"]), low_job)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_worker_burst(self, mock_run_management_command):
+        from eztaskmanager.services.workers import DatabaseQueueWorker
+
+        self.service.add(self.task)
+        self.service.enqueue(self.task)
+
+        n_executed = DatabaseQueueWorker(burst=True).work()
+
+        self.assertEqual(n_executed, 2)
+        mock_run_management_command.assert_called_with(self.task.id, enforce_timeout=True)
+        self.assertEqual(QueuedJob.objects.count(), 0)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_threaded_worker(self, mock_run_management_command):
+        import threading
+        import time
+        from eztaskmanager.services.workers import DatabaseQueueWorker
+
+        jobs = [QueuedJob(id=n, task_id=self.task.id, run_at=timezone.now()) for n in range(6)]
+        lock = threading.Lock()
+
+        def claim(service, queues=None):
+            with lock:
+                return jobs.pop() if jobs else None
+
+        running, max_running, thread_names = [0], [0], set()
+
+        def run(task_id, **kwargs):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+                thread_names.add(threading.current_thread().name)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        mock_run_management_command.side_effect = run
+        with patch.object(DatabaseTaskQueueService, 'claim', claim):
+            n_executed = DatabaseQueueWorker(name="w", burst=True, threads=3).work()
+
+        self.assertEqual(n_executed, 6)
+        self.assertEqual(mock_run_management_command.call_count, 6)
+        # jobs ran at once, in the pool threads, never more than the pool size
+        self.assertGreater(max_running[0], 1)
+        self.assertLessEqual(max_running[0], 3)
+        self.assertTrue(thread_names <= {"w-0", "w-1", "w-2"})
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_worker_is_recycled(self, mock_run_management_command):
+        from eztaskmanager.services.workers import DatabaseQueueWorker, get_rss_mb
+
+        for _ in range(3):
+            self.service.enqueue(self.task)
+
+        worker = DatabaseQueueWorker(burst=True, max_jobs=2)
+        self.assertEqual(worker.work(), 2)
+        self.assertTrue(worker.recycled)
+        self.assertEqual(QueuedJob.objects.count(), 1)
+
+        self.assertGreater(get_rss_mb(), 0)
+        worker = DatabaseQueueWorker(burst=True, max_memory=1)
+        self.assertEqual(worker.work(), 1)
+        self.assertTrue(worker.recycled)
+
+
+@patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='DB')
+class TestRunManagementCommand(TestCase):
+    """Test the execution of the tasks' management commands."""
+
+    def setUp(self):
+        from eztaskmanager.models import AppCommand
+
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        self.task = Task.objects.create(name="timed task", command=self.command, job_timeout=1)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_timeout_is_reported(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.queues import TaskTimeoutException
+
+        mock_call_command.side_effect = TaskTimeoutException("expired")
+        run_management_command(self.task.id)
+
+        report = LaunchReport.objects.get(task=self.task)
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_TIMEOUT)
+        self.assertEqual(report.metadata["limit"], {"resource": "wall_clock", "limit": 1})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.cached_last_invocation_result, LaunchReport.RESULT_TIMEOUT)
+        mock_emit_notifications.assert_called_once_with(report)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_overlapping_run_is_skipped(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        Task.objects.filter(pk=self.task.pk).update(
+            overlap_policy=Task.OVERLAP_SKIP, running_since=timezone.now()
+        )
+        run_management_command(self.task.id)
+
+        mock_call_command.assert_not_called()
+        self.assertFalse(LaunchReport.objects.filter(task=self.task).exists())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.n_skipped_runs, 1)
+        self.assertFalse(self.task.pending_run)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_overlapping_runs_are_coalesced(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        Task.objects.filter(pk=self.task.pk).update(overlap_policy=Task.OVERLAP_COALESCE)
+
+        def overlapping_runs(*args, **kwargs):
+            run_management_command(self.task.id)
+            run_management_command(self.task.id)
+
+        mock_call_command.side_effect = overlapping_runs
+        run_management_command(self.task.id)
+
+        # both overlapping runs are coalesced into a single one, enqueued at the end of the running one
+        self.assertEqual(mock_call_command.call_count, 1)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.n_skipped_runs, 2)
+        self.assertFalse(self.task.pending_run)
+        self.assertIsNone(self.task.running_since)
+        self.assertEqual(QueuedJob.objects.filter(task=self.task).count(), 1)
+
+    def test_stale_run_lock_is_taken_over(self):
+        from eztaskmanager.services.locks import acquire_run_lock, release_run_lock
+
+        stale = timezone.now() - timedelta(seconds=120)
+        Task.objects.filter(pk=self.task.pk).update(running_since=stale)
+        self.assertTrue(acquire_run_lock(self.task))
+
+        # the stale holder does not release the lock of the new one
+        stale_holder = Task.objects.get(pk=self.task.pk)
+        stale_holder.running_since = stale
+        release_run_lock(stale_holder)
+        self.assertFalse(acquire_run_lock(Task.objects.get(pk=self.task.pk)))
+
+    def test_concurrency_slots(self):
+        from eztaskmanager.services.locks import (acquire_concurrency_slots,
+                                                  release_concurrency_slots)
+
+        self.assertEqual(acquire_concurrency_slots(self.task), "")
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=2)
+        holders = [acquire_concurrency_slots(self.task) for _ in range(3)]
+        self.assertTrue(holders[0] and holders[1])
+        self.assertIsNone(holders[2])
+
+        release_concurrency_slots(holders[0])
+        self.assertTrue(acquire_concurrency_slots(self.task))
+
+        # the global limit is entered too, and no slots are held when it is reached
+        with patch('eztaskmanager.services.locks.EZTASKMANAGER_MAX_CONCURRENCY', new=1):
+            release_concurrency_slots(holders[1])
+            other_task = Task.objects.create(name="other task", command=self.command)
+            self.assertTrue(acquire_concurrency_slots(other_task))
+            self.assertIsNone(acquire_concurrency_slots(self.task))
+            self.assertEqual(ConcurrencySlot.objects.filter(scope=f"category:{self.task.category_id}").exclude(
+                holder="").count(), 1)
+
+    def test_expired_concurrency_slot_is_taken_over(self):
+        from eztaskmanager.services.locks import acquire_concurrency_slots
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=1)
+        self.assertTrue(acquire_concurrency_slots(self.task))
+        ConcurrencySlot.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(acquire_concurrency_slots(self.task))
+
+    @patch('eztaskmanager.services.call_command')
+    def test_run_is_deferred_at_concurrency_limit(self, mock_call_command):
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.locks import acquire_concurrency_slots
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=1)
+        self.task.save()
+        acquire_concurrency_slots(self.task)
+
+        run_management_command(self.task.id)
+
+        mock_call_command.assert_not_called()
+        self.assertFalse(LaunchReport.objects.filter(task=self.task).exists())
+        job = QueuedJob.objects.get(task=self.task)
+        self.assertGreater(job.run_at, timezone.now())
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_deferred_retry_keeps_its_attempt(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.locks import (acquire_concurrency_slots,
+                                                  release_concurrency_slots)
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=1)
+        self.task.retry_max_attempts = 2
+        self.task.save()
+        mock_call_command.side_effect = Exception("connection reset")
+
+        run_management_command(self.task.id)
+        first = LaunchReport.objects.get(task=self.task)
+        retry = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(retry.kwargs, {"retry_of": first.id, "attempt": 2})
+        retry.delete()
+
+        # the retry is deferred by the concurrency limit, keeping its attempt
+        holder = acquire_concurrency_slots(self.task)
+        run_management_command(self.task.id, **retry.kwargs)
+        deferred = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(deferred.kwargs, {"retry_of": first.id, "attempt": 2})
+        deferred.delete()
+
+        # the last attempt is not retried again
+        release_concurrency_slots(holder)
+        run_management_command(self.task.id, **deferred.kwargs)
+        second = LaunchReport.objects.get(retry_of=first)
+        self.assertEqual((second.attempt, second.invocation_result), (2, LaunchReport.RESULT_FAILED))
+        self.assertFalse(QueuedJob.objects.filter(task=self.task).exists())
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_deferred_probe_keeps_the_circuit_open(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.locks import (acquire_concurrency_slots,
+                                                  release_concurrency_slots)
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=1)
+        self.task.save()
+        Task.objects.filter(pk=self.task.pk).update(circuit_state=Task.CIRCUIT_OPEN)
+        holder = acquire_concurrency_slots(self.task)
+
+        run_management_command(self.task.id, probe=True)
+
+        mock_call_command.assert_not_called()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.circuit_state, Task.CIRCUIT_OPEN)
+        job = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(job.kwargs, {"probe": True})
+
+        # the deferred probe is executed, once a slot is available
+        release_concurrency_slots(holder)
+        run_management_command(self.task.id, **job.kwargs)
+        mock_call_command.assert_called_once()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.circuit_state, Task.CIRCUIT_CLOSED)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_failed_run_is_retried_with_backoff(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        Task.objects.filter(pk=self.task.pk).update(retry_max_attempts=3, retry_delay=10, retry_backoff=3)
+        mock_call_command.side_effect = Exception("connection reset")
+
+        run_management_command(self.task.id)
+        first = LaunchReport.objects.get(task=self.task)
+        job = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(job.kwargs, {"retry_of": first.id, "attempt": 2})
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(first.metadata["retry"]["attempt"], 2)
+
+        job.delete()
+        run_management_command(self.task.id, retry_of=first.id, attempt=2)
+        job = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(job.kwargs, {"retry_of": first.id, "attempt": 3})
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 30, delta=2)
+
+        # the last attempt is not retried
+        job.delete()
+        run_management_command(self.task.id, retry_of=first.id, attempt=3)
+        self.assertFalse(QueuedJob.objects.filter(task=self.task).exists())
+
+        retries = first.retries.order_by("attempt")
+        self.assertEqual([r.attempt for r in retries], [2, 3])
+        self.assertTrue(all(r.invocation_result == LaunchReport.RESULT_FAILED for r in retries))
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_only_retryable_results_are_retried(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        Task.objects.filter(pk=self.task.pk).update(retry_max_attempts=3, retry_on="timeout")
+        mock_call_command.side_effect = Exception("bug")
+        run_management_command(self.task.id)
+
+        self.assertFalse(QueuedJob.objects.filter(task=self.task).exists())
+
+    def test_retry_delay(self):
+        from eztaskmanager.services.retries import retry_delay
+
+        self.task.retry_delay, self.task.retry_backoff = 60, 2
+        self.assertEqual([retry_delay(self.task, attempt) for attempt in (1, 2, 3)], [60, 120, 240])
+
+        self.task.retry_jitter = 5
+        self.assertTrue(60 <= retry_delay(self.task, 1) <= 65)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_circuit_breaker(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        self.task.repetition_period = Task.REPETITION_PERIOD_MINUTE
+        self.task.repetition_rate = 1
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.task.circuit_breaker_threshold = 2
+        self.task.save()
+        DatabaseTaskQueueService().add(self.task)
+        mock_call_command.side_effect = Exception("upstream down")
+
+        run_management_command(self.task.id)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.circuit_state, self.task.n_consecutive_failures), (Task.CIRCUIT_CLOSED, 1))
+
+        # the circuit opens: the schedule is replaced by a probe run
+        run_management_command(self.task.id)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.circuit_state, Task.CIRCUIT_OPEN)
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        probe = QueuedJob.objects.get(task=self.task)
+        self.assertEqual(probe.kwargs, {"probe": True})
+        self.assertEqual(self.task.cached_next_ride, probe.run_at)
+        report = LaunchReport.objects.filter(task=self.task).latest("id")
+        self.assertEqual(report.metadata["circuit"], {"from": "closed", "to": "open", "consecutive_failures": 2})
+
+        # scheduled runs still firing are skipped
+        run_management_command(self.task.id, scheduled=True)
+        self.assertEqual(mock_call_command.call_count, 2)
+
+        # a failed probe opens the circuit again, with a new probe
+        probe.delete()
+        run_management_command(self.task.id, probe=True)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.circuit_state, self.task.n_consecutive_failures), (Task.CIRCUIT_OPEN, 3))
+        self.assertEqual(QueuedJob.objects.get(task=self.task).kwargs, {"probe": True})
+
+        # a successful probe closes the circuit and restores the schedule
+        QueuedJob.objects.all().delete()
+        mock_call_command.side_effect = None
+        run_management_command(self.task.id, probe=True)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.circuit_state, self.task.n_consecutive_failures), (Task.CIRCUIT_CLOSED, 0))
+        self.assertEqual(self.task.status, Task.STATUS_SCHEDULED)
+        self.assertEqual(QueuedJob.objects.get(task=self.task).interval, 60)
+        report = LaunchReport.objects.filter(task=self.task).latest("id")
+        self.assertEqual(report.metadata["circuit"]["from"], Task.CIRCUIT_HALF_OPEN)
+
+        # probes of a closed circuit are dropped
+        run_management_command(self.task.id, probe=True)
+        self.assertEqual(mock_call_command.call_count, 4)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_heartbeat_is_cleared_at_the_end_of_the_run(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        def running(*args, launch_report_id=None):
+            report = LaunchReport.objects.get(pk=launch_report_id)
+            self.assertIsNotNone(report.heartbeat_at)
+            self.assertTrue(report.worker_id)
+
+        mock_call_command.side_effect = running
+        run_management_command(self.task.id)
+
+        mock_call_command.assert_called_once()
+        self.assertIsNone(LaunchReport.objects.get(task=self.task).heartbeat_at)
+
+    @patch('eztaskmanager.services.heartbeats.EZTASKMANAGER_HEARTBEAT_INTERVAL', new=0)
+    @patch('eztaskmanager.services.EZTASKMANAGER_HEARTBEAT_INTERVAL', new=0)
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_disabled_heartbeats(self, mock_call_command, mock_emit_notifications):
+        from django.core.exceptions import ImproperlyConfigured
+        from django.apps import apps
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.heartbeats import reap_lost_runs
+
+        def running(*args, launch_report_id=None):
+            report = LaunchReport.objects.get(pk=launch_report_id)
+            self.assertIsNone(report.heartbeat_at)
+            # a long run is not reaped
+            self.assertEqual(reap_lost_runs(now=timezone.now() + timedelta(hours=1)), [])
+
+        mock_call_command.side_effect = running
+        run_management_command(self.task.id)
+        mock_call_command.assert_called_once()
+        self.assertEqual(LaunchReport.objects.get(task=self.task).invocation_result, LaunchReport.RESULT_OK)
+
+        config = apps.get_app_config("eztaskmanager")
+        with patch('eztaskmanager.apps.EZTASKMANAGER_HEARTBEAT_INTERVAL', new=0):
+            config._check_heartbeat_settings()
+        with patch('eztaskmanager.apps.EZTASKMANAGER_HEARTBEAT_TIMEOUT', new=30):
+            with self.assertRaises(ImproperlyConfigured):
+                config._check_heartbeat_settings()
+
+    @patch('eztaskmanager.services.heartbeats.emit_notifications')
+    def test_lost_runs_are_reaped(self, mock_emit_notifications):
+        from eztaskmanager.services.heartbeats import reap_lost_runs
+
+        Task.objects.filter(pk=self.task.pk).update(status=Task.STATUS_STARTED, running_since=timezone.now())
+        report = LaunchReport.objects.create(
+            task=self.task, heartbeat_at=timezone.now(), worker_id="host:1:MainThread",
+            metadata={"task_status": Task.STATUS_SCHEDULED}
+        )
+        other_report = LaunchReport.objects.create(task=self.task, heartbeat_at=timezone.now())
+
+        self.assertEqual(reap_lost_runs(), [])
+
+        # the other run keeps beating
+        later = timezone.now() + timedelta(minutes=10)
+        LaunchReport.objects.filter(pk=other_report.pk).update(heartbeat_at=later)
+        # one query to find the lost runs, four per lost run
+        with self.assertNumQueries(5):
+            self.assertEqual(reap_lost_runs(now=later), [report])
+
+        report.refresh_from_db()
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_LOST)
+        self.assertIsNone(report.heartbeat_at)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_SCHEDULED)
+        self.assertEqual(self.task.cached_last_invocation_result, LaunchReport.RESULT_LOST)
+        self.assertIsNone(self.task.running_since)
+        mock_emit_notifications.assert_called_once_with(report)
+
+        # a run is reaped once
+        self.assertEqual(reap_lost_runs(now=later), [])
+
+    @patch('eztaskmanager.services.emit_notifications')
+    def test_runs_log_to_their_own_reports(self, mock_emit_notifications):
+        from eztaskmanager.models import AppCommand, Log
+        from eztaskmanager.services import run_management_command
+
+        command = AppCommand.objects.create(name="test_logging_command", app_name="eztaskmanager")
+        first = Task.objects.create(name="first", command=command, arguments="--warning=first")
+        second = Task.objects.create(name="second", command=command, arguments="--warning=second")
+        run_management_command(first.id)
+        run_management_command(second.id)
+
+        for task in (first, second):
+            report = LaunchReport.objects.get(task=task)
+            self.assertIn(task.name, Log.objects.filter(launch_report=report).values_list("message", flat=True))
+            self.assertEqual(report.invocation_result, LaunchReport.RESULT_WARNINGS)
+
+    @patch('eztaskmanager.services.logger.Log')
+    def test_concurrent_runs_log_to_their_own_reports(self, mock_log):
+        import logging
+        import threading
+        from eztaskmanager.services.logger import get_task_logger, log_context
+
+        logger = get_task_logger()
+        barrier = threading.Barrier(2)
+
+        def run(report_id):
+            with log_context(report_id, logging.INFO):
+                for n in range(3):
+                    barrier.wait()
+                    logger.info(f"{report_id}-{n}")
+                    logger.debug("dropped")
+
+        threads = [threading.Thread(target=run, args=(report_id,)) for report_id in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # outside of any run, records are not saved
+        logger.error("no report")
+
+        saved = [c.kwargs for c in mock_log.call_args_list]
+        self.assertEqual(len(saved), 6)
+        for entry in saved:
+            self.assertTrue(entry["message"].startswith(f"{entry['launch_report_id']}-"))
+
+    @patch('eztaskmanager.services.emit_notifications')
+    def test_preloaded_commands(self, mock_emit_notifications):
+        from eztaskmanager.models import AppCommand, Log
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.preload import (clear_preloaded_commands,
+                                                    get_command,
+                                                    preload_commands)
+
+        command = AppCommand.objects.create(name="test_logging_command", app_name="eztaskmanager")
+        task = Task.objects.create(name="preloaded", command=command, arguments="--warning=preloaded")
+        self.assertEqual(get_command("test_logging_command"), "test_logging_command")
+
+        preload_commands()
+        self.addCleanup(clear_preloaded_commands)
+        first, second = get_command("test_logging_command"), get_command("test_logging_command")
+        self.assertIsNot(first, second)
+        self.assertIs(first.create_parser("", "test_logging_command"), second.create_parser("", "test_logging_command"))
+
+        with patch('django.core.management.load_command_class') as mock_load_command_class:
+            run_management_command(task.id)
+        mock_load_command_class.assert_not_called()
+        report = LaunchReport.objects.get(task=task)
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_WARNINGS)
+        self.assertTrue(Log.objects.filter(launch_report=report, message="preloaded").exists())
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_resource_limits(self, mock_call_command, mock_emit_notifications):
+        import resource
+        from eztaskmanager.services import run_management_command
+
+        limits = resource.getrlimit(resource.RLIMIT_AS), resource.getrlimit(resource.RLIMIT_CPU)
+        Task.objects.filter(pk=self.task.pk).update(memory_limit=50, cpu_time_limit=1)
+
+        mock_call_command.side_effect = lambda *args, **kwargs: bytearray(200 * 2 ** 20)
+        run_management_command(self.task.id)
+        report = LaunchReport.objects.filter(task=self.task).latest("id")
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_LIMIT)
+        self.assertEqual(report.metadata["limit"], {"resource": "memory", "limit": 50})
+
+        def spin(*args, **kwargs):
+            while True:
+                pass
+
+        mock_call_command.side_effect = spin
+        run_management_command(self.task.id)
+        report = LaunchReport.objects.filter(task=self.task).latest("id")
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_LIMIT)
+        self.assertEqual(report.metadata["limit"], {"resource": "cpu_time", "limit": 1})
+
+        # the limits of the process are restored
+        self.assertEqual((resource.getrlimit(resource.RLIMIT_AS), resource.getrlimit(resource.RLIMIT_CPU)), limits)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_cancelled_run_stops_cooperatively(self, mock_call_command, mock_emit_notifications):
+        from django.core.management import call_command
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.cancellation import request_cancellation
+
+        self.assertEqual(request_cancellation(self.task), 0)
+
+        def cancelled(name, *args, **options):
+            self.assertEqual(request_cancellation(self.task), 1)
+            call_command("test_livelogging_command", *args, error_prob=0, warning_prob=0, **options)
+
+        mock_call_command.side_effect = cancelled
+        run_management_command(self.task.id)
+
+        report = LaunchReport.objects.get(task=self.task)
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_CANCELLED)
+        self.assertIsNotNone(report.cancel_requested_at)
+        self.assertLess(report.duration, 1)
+
+    @patch('eztaskmanager.services.EZTASKMANAGER_HEARTBEAT_INTERVAL', new=0)
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_cancelled_run_without_heartbeats(self, mock_call_command, mock_emit_notifications):
+        from django.core.management import call_command
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.cancellation import request_cancellation
+
+        def cancelled(name, *args, **options):
+            self.assertIsNone(LaunchReport.objects.get(task=self.task).heartbeat_at)
+            self.assertEqual(request_cancellation(self.task), 1)
+            call_command("test_livelogging_command", *args, error_prob=0, warning_prob=0, **options)
+
+        mock_call_command.side_effect = cancelled
+        run_management_command(self.task.id)
+
+        report = LaunchReport.objects.get(task=self.task)
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_CANCELLED)
+        # finished runs are not asked to stop
+        self.assertEqual(request_cancellation(self.task), 0)
+
+    @patch('eztaskmanager.services.cancellation.get_cancel_request')
+    @patch('eztaskmanager.services.heartbeats.LaunchReport')
+    def test_cancelled_run_is_stopped_after_the_grace_period(self, mock_launch_report, mock_get_cancel_request):
+        import time
+        from eztaskmanager.services.cancellation import (RunCancelled,
+                                                         hard_stop_signal)
+        from eztaskmanager.services.heartbeats import Heartbeat
+
+        mock_get_cancel_request.return_value = timezone.now() - timedelta(seconds=10)
+        start = time.monotonic()
+        with self.assertRaises(RunCancelled), hard_stop_signal() as hard_stop:
+            with Heartbeat(MagicMock(pk=1), interval=0.01, grace_period=5) as heartbeat:
+                heartbeat.hard_stop = hard_stop
+                time.sleep(5)
+        self.assertLess(time.monotonic() - start, 5)
+
+    @patch('eztaskmanager.services.EZTASKMANAGER_EXECUTION_MODE', new='subprocess')
+    @patch('eztaskmanager.services.emit_notifications')
+    def test_subprocess_execution(self, mock_emit_notifications):
+        import os
+        import time
+        from eztaskmanager.models import AppCommand, Log
+        from eztaskmanager.services import run_management_command
+        from eztaskmanager.services.subprocesses import (CommandProcessPool,
+                                                         call_command)
+
+        command = AppCommand.objects.create(name="test_logging_command", app_name="eztaskmanager")
+        task = Task.objects.create(
+            name="isolated", command=command, arguments="--info=info, --warning=warning, --error=error"
+        )
+
+        def crash(name, *args, **options):
+            if name == "test_command":
+                os._exit(1)
+            if name == "test_logging_command":
+                return call_command(name, *args, **options)
+            if name == "test_livelogging_command":
+                time.sleep(5)
+            bytearray(200 * 2 ** 20)
+
+        # the children, and their replacements, are forked with the patches
+        with patch('eztaskmanager.services.subprocesses.call_command', side_effect=crash), \
+                patch('eztaskmanager.services.get_command_pool') as mock_get_command_pool:
+            pool = CommandProcessPool(size=1, start_method="fork")
+            pool.start()
+            self.addCleanup(pool.close)
+            mock_get_command_pool.return_value = pool
+
+            # logs are streamed back to the report
+            run_management_command(task.id)
+            report = LaunchReport.objects.get(task=task)
+            self.assertEqual(report.invocation_result, LaunchReport.RESULT_ERRORS)
+            self.assertEqual(
+                list(Log.objects.filter(launch_report=report).values_list("level", "message")),
+                [("WARNING", "warning"), ("ERROR", "error")]
+            )
+            child = pool._processes[0].process.pid
+
+            # a crashing command takes down only its child, replaced by a new one
+            run_management_command(self.task.id)
+            report = LaunchReport.objects.filter(task=self.task).latest("id")
+            self.assertEqual(report.invocation_result, LaunchReport.RESULT_FAILED)
+            self.assertNotEqual(pool._processes[0].process.pid, child)
+
+            # the timeout is enforced killing the child
+            other = AppCommand.objects.create(name="test_livelogging_command", app_name="eztaskmanager")
+            Task.objects.filter(pk=self.task.pk).update(command=other)
+            run_management_command(self.task.id, enforce_timeout=True)
+            report = LaunchReport.objects.filter(task=self.task).latest("id")
+            self.assertEqual(report.invocation_result, LaunchReport.RESULT_TIMEOUT)
+            self.assertTrue(pool._processes[0].is_alive())
+
+            # the limits are enforced in the child, replaced by a new one
+            other = AppCommand.objects.create(name="collectcommands", app_name="eztaskmanager")
+            Task.objects.filter(pk=self.task.pk).update(command=other, memory_limit=50)
+            child = pool._processes[0].process.pid
+            run_management_command(self.task.id)
+            report = LaunchReport.objects.filter(task=self.task).latest("id")
+            self.assertEqual(report.invocation_result, LaunchReport.RESULT_LIMIT)
+            self.assertEqual(report.metadata["limit"], {"resource": "memory", "limit": 50})
+            self.assertNotEqual(pool._processes[0].process.pid, child)
+
+        # a cancelled run is stopped killing the child
+        import threading
+        from eztaskmanager.services.cancellation import RunCancelled
+
+        with patch('eztaskmanager.services.subprocesses.call_command', side_effect=crash):
+            stop = threading.Event()
+            threading.Timer(0.1, stop.set).start()
+            with self.assertRaises(RunCancelled):
+                pool.call_command("test_livelogging_command", stop=stop)
+
+    def test_command_processes_are_not_forked_from_the_worker(self):
+        import logging
+        import os
+        from django.apps import apps
+        from django.core.exceptions import ImproperlyConfigured
+        from eztaskmanager.services.subprocesses import CommandProcessPool
+
+        # the children are forked by the fork server, with Django set up by eztaskmanager.bootstrap
+        pool = CommandProcessPool(size=1)
+        self.assertEqual(pool.start_method, "forkserver")
+        pool.start()
+        self.addCleanup(pool.close)
+        with self.assertLogs("eztaskmanager.services.logger", level=logging.WARNING) as logs:
+            pool.call_command("test_logging_command", warning="from the child")
+        self.assertEqual(logs.records[0].getMessage(), "from the child")
+        with open(f"/proc/{pool._processes[0].process.pid}/stat") as stat:
+            self.assertNotEqual(int(stat.read().rsplit(")", 1)[1].split()[1]), os.getpid())
+
+        # RQ forks a process for each job, which would start a whole pool
+        config = apps.get_app_config("eztaskmanager")
+        with patch('eztaskmanager.apps.EZTASKMANAGER_EXECUTION_MODE', new='subprocess'):
+            with patch('eztaskmanager.apps.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='DB'):
+                config._check_execution_mode()
+            with patch('eztaskmanager.apps.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='RQ'):
+                with self.assertRaises(ImproperlyConfigured):
+                    config._check_execution_mode()
+
+    def _misfired_periodic_task(self, policy):
+        late = timezone.now() - timedelta(minutes=5, seconds=30)
+        Task.objects.filter(pk=self.task.pk).update(
+            repetition_period=Task.REPETITION_PERIOD_MINUTE, repetition_rate=1, scheduling=late,
+            status=Task.STATUS_SCHEDULED, misfire_policy=policy
+        )
+        return late
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_misfired_run_is_skipped(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        late = self._misfired_periodic_task(Task.MISFIRE_SKIP)
+        run_management_command(self.task.id, scheduled=True, scheduled_at=late)
+
+        mock_call_command.assert_not_called()
+        self.assertFalse(LaunchReport.objects.filter(task=self.task).exists())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.n_skipped_runs, 1)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_misfired_run_is_executed_once(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        late = self._misfired_periodic_task(Task.MISFIRE_RUN_ONCE)
+        run_management_command(self.task.id, scheduled=True, scheduled_at=late)
+
+        mock_call_command.assert_called_once()
+        misfire = LaunchReport.objects.get(task=self.task).metadata["misfire"]
+        self.assertEqual(misfire["missed_runs"], 5)
+        self.assertEqual(misfire["policy"], Task.MISFIRE_RUN_ONCE)
+        self.assertEqual(misfire["scheduled_at"], late.isoformat())
+        self.assertFalse(QueuedJob.objects.filter(task=self.task).exists())
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_misfired_runs_are_all_executed(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        late = self._misfired_periodic_task(Task.MISFIRE_RUN_ALL)
+        run_management_command(self.task.id, scheduled=True, scheduled_at=late)
+
+        # the missed runs are chained: one is enqueued at the end of each run
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.catchup_runs, 4)
+        self.assertEqual(QueuedJob.objects.filter(task=self.task).count(), 1)
+
+        for _ in range(4):
+            run_management_command(self.task.id)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.catchup_runs, 0)
+        self.assertEqual(mock_call_command.call_count, 5)
+
+    def test_check_misfire(self):
+        from eztaskmanager.services.scheduling import check_misfire
+
+        now = timezone.now()
+        self.task.repetition_period = Task.REPETITION_PERIOD_MINUTE
+        self.task.repetition_rate = 1
+        self.assertIsNone(check_misfire(self.task, now - timedelta(seconds=30), now))
+        self.assertEqual(check_misfire(self.task, now - timedelta(minutes=3), now)["missed_runs"], 3)
+
+        self.task.misfire_grace_time = 600
+        self.assertIsNone(check_misfire(self.task, now - timedelta(minutes=3), now))
+
+        self.task.misfire_grace_time = 0
+        self.task.cron_string = "*/10 * * * *"
+        scheduled_at = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        self.assertEqual(check_misfire(self.task, scheduled_at, scheduled_at + timedelta(minutes=35))["missed_runs"], 3)
+
+        # on-demand tasks never misfire
+        self.task.cron_string = ""
+        self.task.repetition_rate = None
+        self.assertIsNone(check_misfire(self.task, now - timedelta(hours=1), now))
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_bookkeeping_query_budget(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.models import Log
+        from eztaskmanager.services import run_management_command
+
+        def warn(*args, launch_report_id=None, **kwargs):
+            Log.objects.create(launch_report_id=launch_report_id, level="WARNING", message="warned")
+
+        mock_call_command.side_effect = warn
+        # task, report, pruning, started, cancellation and log counts, report, next ride, task, catch-up runs,
+        # plus the log of the command
+        with self.assertNumQueries(10):
+            run_management_command(self.task.id)
+
+        report = mock_emit_notifications.call_args[0][0]
+        with self.assertNumQueries(0):
+            self.assertEqual((report.n_log_errors, report.n_log_warnings), (0, 1))
+        self.assertEqual(report.invocation_result, LaunchReport.RESULT_WARNINGS)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertEqual(self.task.cached_last_invocation_result, LaunchReport.RESULT_WARNINGS)
+        self.assertEqual(self.task.cached_last_invocation_n_warnings, 1)
+
+    @skipUnless(tsq_imported_module == 'rq', 'django-rq is not installed')
+    @patch('django_rq.get_queue', return_value=MagicMock())
+    @patch('django_rq.get_scheduler', return_value=MagicMock())
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_bookkeeping_query_budget_with_rq(
+            self, mock_call_command, mock_emit_notifications, mock_get_scheduler, mock_get_queue
+    ):
+        from eztaskmanager.services import run_management_command
+
+        scheduler = mock_get_scheduler.return_value
+        next_ride = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        scheduler.connection.zscore.return_value = next_ride.timestamp()
+        Task.objects.filter(pk=self.task.pk).update(scheduled_job_id="job-1")
+
+        # task, report, pruning, started, cancellation and log counts, report, task, catch-up runs:
+        # the next ride is read from the scheduler, by the id of the job
+        with patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='RQ'), \
+                patch('eztaskmanager.services.queues.Job.fetch') as mock_fetch, \
+                self.assertNumQueries(8):
+            run_management_command(self.task.id)
+
+        scheduler.get_jobs.assert_not_called()
+        scheduler.connection.zscore.assert_called_once_with(scheduler.scheduled_jobs_key, "job-1")
+        mock_fetch.assert_called_once_with("job-1", connection=scheduler.connection)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.cached_next_ride, next_ride)
+        self.assertEqual(self.task.cached_last_invocation_result, LaunchReport.RESULT_OK)
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    def test_task_moved_while_running(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services import run_management_command
+
+        def launch(*args, **kwargs):
+            # the task is launched from the admin while running
+            task = Task.objects.get(pk=self.task.pk)
+            self.assertEqual(task.status, Task.STATUS_STARTED)
+            task.transition(Task.STATUS_SCHEDULED, scheduled_job_id="job-id")
+
+        mock_call_command.side_effect = launch
+        run_management_command(self.task.id)
+
+        # the run does not restore its status, but writes its cache
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.scheduled_job_id), (Task.STATUS_SCHEDULED, "job-id"))
+        self.assertEqual(self.task.cached_last_invocation_result, LaunchReport.RESULT_OK)
+
+    def test_time_limit(self):
+        import time
+        from eztaskmanager.services.queues import TaskTimeoutException, time_limit
+
+        with self.assertRaises(TaskTimeoutException):
+            with time_limit(0.05):
+                time.sleep(1)
+
+        # no limits without seconds
+        with time_limit(None):
+            pass
+
+
+class TestCommandMetadata(TestCase):
+    """Test the metadata of the commands, collected by collectcommands."""
+
+    def setUp(self):
+        from eztaskmanager.models import AppCommand
+
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+
+    def test_collect_command_metadata(self):
+        from eztaskmanager.services.commands import collect_command_metadata
+
+        self.assertTrue(collect_command_metadata(self.command))
+        self.command.refresh_from_db()
+        self.assertEqual(len(self.command.fingerprint), 64)
+        self.assertIn("Test arg1", self.command.help_text)
+        self.assertIn("arg1", [spec["dest"] for spec in self.command.cached_arguments])
+
+        # the command is loaded again only if its module changed
+        with patch('eztaskmanager.models.load_command_class') as mock_load_command_class:
+            self.assertFalse(collect_command_metadata(self.command))
+            mock_load_command_class.assert_not_called()
+        with patch('eztaskmanager.services.commands.command_fingerprint', return_value="changed"):
+            self.assertTrue(collect_command_metadata(self.command))
+        self.assertEqual(self.command.fingerprint, "changed")
+
+    def test_rebuilt_parser(self):
+        from django.core.management import CommandError
+        from eztaskmanager.services.commands import collect_command_metadata
+
+        collect_command_metadata(self.command)
+        parser = self.command.get_parser()
+
+        options = parser.parse_args(["first", "second", "-b", "--verbosity", "2"])
+        self.assertEqual(
+            (options.arg1, options.arg2, options.action_b, options.verbosity), ("first", "second", True, "2")
+        )
+        for argv in (["first"], ["first", "second", "--unknown"], ["first", "second", "--verbosity", "5"]):
+            with self.assertRaises(CommandError):
+                parser.parse_args(argv)
+
+    def test_collectcommands(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from eztaskmanager.models import AppCommand
+
+        call_command("collectcommands", excludecore=True, stdout=StringIO())
+        command = AppCommand.objects.get(name="test_command", app_name="eztaskmanager")
+        self.assertTrue(command.fingerprint)
+        self.assertFalse(AppCommand.objects.filter(app_name__startswith="django").exists())
+
+
+class TestThreadTaskQueueService(TestCase):
+    """Test the in-process thread pool queue service."""
+
+    def setUp(self):
+        from eztaskmanager.models import AppCommand
+        from eztaskmanager.services.queues import InProcessScheduler, ThreadTaskQueueService
+
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        self.task = Task.objects.create(name="thread task", command=self.command, arguments="a, b")
+        self.scheduler = InProcessScheduler(max_workers=2)
+        self.service = ThreadTaskQueueService(scheduler=self.scheduler)
+
+    def tearDown(self):
+        self.scheduler.executor.shutdown(wait=True)
+
+    @patch('eztaskmanager.services.queues.get_in_process_scheduler')
+    @patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='Thread')
+    def test_get_task_service_with_thread(self, mock_get_in_process_scheduler):
+        from eztaskmanager.services.queues import ThreadTaskQueueService
+
+        self.assertIsInstance(get_task_service(), ThreadTaskQueueService)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_add_immediate_task(self, mock_run_management_command):
+        future = self.service.add(self.task)
+        future.result(timeout=5)
+
+        mock_run_management_command.assert_called_once_with(self.task.id)
+        self.assertIsNone(self.task.scheduled_job_id)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_add_scheduled_task(self, mock_run_management_command):
+        import threading
+        executed = threading.Event()
+        mock_run_management_command.side_effect = lambda task_id: executed.set()
+
+        self.task.scheduling = timezone.now() + timedelta(milliseconds=200)
+        job = self.service.add(self.task)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_SCHEDULED)
+        self.assertEqual(self.task.scheduled_job_id, job.id)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (job, job.run_at))
+
+        self.assertTrue(executed.wait(timeout=5))
+        mock_run_management_command.assert_called_once_with(self.task.id)
+        self.assertEqual(self.scheduler.get_job(job.id), None)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_immediate_launch_is_idempotent(self, mock_run_management_command):
+        import threading
+        release = threading.Event()
+        mock_run_management_command.side_effect = lambda task_id: release.wait(timeout=5)
+        other_task = Task.objects.create(name="other task", command=self.command)
+
+        # both pool threads are busy, the launches wait in the pool
+        busy = [self.service.enqueue(other_task) for _ in range(2)]
+        future = self.service.add(self.task)
+        self.assertIs(self.service.add(self.task), future)
+
+        release.set()
+        for f in busy + [future]:
+            f.result(timeout=5)
+        self.assertEqual(mock_run_management_command.call_count, 3)
+
+    def test_periodic_job_is_rescheduled(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.task.repetition_period = Task.REPETITION_PERIOD_MINUTE
+        self.task.repetition_rate = 1
+        job = self.service.add(self.task)
+        self.assertEqual(job.interval, 60)
+
+        # re-adding cancels the previous job
+        new_job = self.service.add(self.task)
+        self.assertIsNone(self.scheduler.get_job(job.id))
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (new_job, new_job.run_at))
+
+    def test_remove(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        job = self.service.add(self.task)
+        self.service.remove(self.task)
+
+        self.task.refresh_from_db()
+        self.assertIsNone(self.scheduler.get_job(job.id))
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertIsNone(self.task.scheduled_job_id)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (None, None))
+
+    def test_restore(self):
+        Task.objects.filter(pk=self.task.pk).update(
+            status=Task.STATUS_SCHEDULED, scheduled_job_id="restored-job",
+            scheduling=timezone.now() + timedelta(hours=1)
+        )
+        self.scheduler.restore()
+
+        job = self.scheduler.get_job("restored-job")
+        self.assertEqual(job.task_id, self.task.id)
+
+
+@skipUnless(find_spec("celery"), "celery is not installed")
+class TestCeleryTaskQueueService(TestCase):
+    """Test the Celery queue service, with the in-memory broker."""
+
+    def setUp(self):
+        from celery import Celery
+        from eztaskmanager.models import AppCommand
+        from eztaskmanager.services.queues import CeleryTaskQueueService
+
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        self.task = Task.objects.create(name="celery task", command=self.command, arguments="a, b")
+
+        self.app = Celery("test", broker="memory://", backend="cache+memory://")
+        self.app.conf.task_always_eager = True
+        self.service = CeleryTaskQueueService(app=self.app)
+
+    def _periodic_task(self):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        self.task.repetition_period = Task.REPETITION_PERIOD_HOUR
+        self.task.repetition_rate = 1
+        return self.task
+
+    @patch('eztaskmanager.services.queues.get_celery_app')
+    @patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='Celery')
+    def test_get_task_service_with_celery(self, mock_get_celery_app):
+        from eztaskmanager.services.queues import CeleryTaskQueueService
+
+        self.assertIsInstance(get_task_service(), CeleryTaskQueueService)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_add_immediate_task(self, mock_run_management_command):
+        self.service.add(self.task)
+
+        mock_run_management_command.assert_called_once_with(self.task.id)
+        self.assertIsNone(self.task.scheduled_job_id)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_add_scheduled_task(self, mock_run_management_command):
+        self.task.scheduling = timezone.now() + timedelta(hours=1)
+        result = self.service.add(self.task)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_SCHEDULED)
+        self.assertEqual(self.task.scheduled_job_id, result.id)
+        self.assertEqual(self.task.cached_next_ride, self.task.scheduling_utc)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (result.id, self.task.cached_next_ride))
+        mock_run_management_command.assert_called_once_with(
+            self.task.id, scheduled=True, scheduled_at=self.task.cached_next_ride
+        )
+
+    def test_immediate_launch_is_idempotent(self):
+        from django.core.cache import cache
+        from eztaskmanager.services.queues import EXECUTE_TASK_NAME, dedup_key
+
+        with patch.object(self.app.tasks[EXECUTE_TASK_NAME], 'apply_async') as mock_apply_async:
+            self.service.add(self.task)
+            queued_id = mock_apply_async.call_args.kwargs['task_id']
+            self.assertEqual(self.service.add(self.task).id, queued_id)
+            mock_apply_async.assert_called_once()
+
+        # the key is removed when the run starts
+        with patch('eztaskmanager.services.run_management_command'):
+            self.app.tasks[EXECUTE_TASK_NAME].apply(
+                args=[self.task.id], kwargs={"scheduled": False, "dedup_key": dedup_key(self.task)}
+            )
+        self.assertIsNone(cache.get(dedup_key(self.task)))
+
+    def test_job_timeout_is_sent_as_time_limits(self):
+        from eztaskmanager.services.queues import EXECUTE_TASK_NAME
+
+        self.task.job_timeout = 60
+        with patch.object(self.app.tasks[EXECUTE_TASK_NAME], 'apply_async') as mock_apply_async:
+            self.service.add(self.task)
+
+        kwargs = mock_apply_async.call_args.kwargs
+        self.assertEqual(kwargs['soft_time_limit'], 60)
+        self.assertEqual(kwargs['time_limit'], 60 + self.service.HARD_TIME_LIMIT_GRACE)
+
+    def test_schedule_next_cron_run(self):
+        self.task.cron_string = "0 2 * * *"
+        Task.objects.filter(pk=self.task.pk).update(
+            cron_string="0 2 * * *", scheduled_job_id="job-id", cached_next_ride=timezone.now()
+        )
+        with patch.object(self.service, '_send') as mock_send:
+            next_job_id = self.service.schedule_next_run(self.task.id, "job-id")
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.scheduled_job_id, next_job_id)
+        self.assertEqual(self.task.cached_next_ride.astimezone(timezone.timezone.utc).hour, 2)
+        self.assertEqual(mock_send.call_args.kwargs['eta'], self.task.cached_next_ride)
+
+    @patch('eztaskmanager.services.run_management_command')
+    def test_removed_scheduled_job_is_skipped(self, mock_run_management_command):
+        from eztaskmanager.services.queues import EXECUTE_TASK_NAME
+
+        self.app.tasks[EXECUTE_TASK_NAME].apply(
+            args=[self.task.id], kwargs={"scheduled": True}, task_id="stale-job-id"
+        )
+
+        mock_run_management_command.assert_not_called()
+
+    @patch('eztaskmanager.services.emit_notifications')
+    @patch('eztaskmanager.services.call_command')
+    @patch('eztaskmanager.services.queues.EZTASKMANAGER_QUEUE_SERVICE_TYPE', new='Celery')
+    def test_deferred_scheduled_run_is_executed(self, mock_call_command, mock_emit_notifications):
+        from eztaskmanager.services.locks import (acquire_concurrency_slots,
+                                                  release_concurrency_slots)
+        from eztaskmanager.services.queues import EXECUTE_TASK_NAME
+
+        self.task.category = TaskCategory.objects.create(name="etl", max_concurrency=1)
+        self._periodic_task().save()
+        fire_time = timezone.now().replace(microsecond=0) - timedelta(seconds=5)
+        Task.objects.filter(pk=self.task.pk).update(
+            scheduled_job_id="job-id", cached_next_ride=fire_time, status=Task.STATUS_SCHEDULED
+        )
+        execute = self.app.tasks[EXECUTE_TASK_NAME]
+
+        # the scheduled run is deferred by the concurrency limit, as an unscheduled job with its fire time
+        holder = acquire_concurrency_slots(self.task)
+        with patch('eztaskmanager.services.queues.get_celery_app', return_value=self.app), \
+                patch.object(execute, 'apply_async') as mock_apply_async:
+            execute.apply(args=[self.task.id], kwargs={"scheduled": True}, task_id="job-id")
+        mock_call_command.assert_not_called()
+        kwargs = mock_apply_async.call_args.kwargs['kwargs']
+        self.assertEqual(kwargs, {"scheduled": False, "fired_at": fire_time.isoformat()})
+        self.assertIsNone(mock_apply_async.call_args.kwargs['task_id'])
+
+        # the deferred run is executed, though the schedule moved on meanwhile
+        release_concurrency_slots(holder)
+        Task.objects.filter(pk=self.task.pk).update(scheduled_job_id="next-job-id")
+        execute.apply(args=[self.task.id], kwargs=kwargs, task_id="deferred-job-id")
+        mock_call_command.assert_called_once()
+        self.assertTrue(LaunchReport.objects.filter(task=self.task).exists())
+
+    def test_remove(self):
+        Task.objects.filter(pk=self.task.pk).update(
+            scheduled_job_id="job-id", status=Task.STATUS_SCHEDULED
+        )
+        self.task.refresh_from_db()
+
+        with patch.object(self.app.control, 'revoke') as mock_revoke:
+            self.service.remove(self.task)
+            mock_revoke.assert_called_once_with("job-id")
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertIsNone(self.task.scheduled_job_id)
+        self.assertEqual(self.service.fetch_job_with_next_time(self.task), (None, None))
+
+    def test_schedule_next_run(self):
+        self.app.conf.task_always_eager = False
+        self._periodic_task()
+        result = self.service.add(self.task)
+        first_run = self.task.cached_next_ride
+
+        next_job_id = self.service.schedule_next_run(self.task.id, result.id)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.scheduled_job_id, next_job_id)
+        self.assertEqual(self.task.cached_next_ride, first_run + timedelta(hours=1))
+
+        # a redelivered job does not schedule anything
+        self.assertIsNone(self.service.schedule_next_run(self.task.id, result.id))
+
+
+class TestForecast(TestCase):
+    """Test the schedule forecast."""
+
+    def setUp(self):
+        from eztaskmanager.models import AppCommand
+
+        self.command = AppCommand.objects.create(name="test_command", app_name="eztaskmanager")
+        self.start = timezone.now().replace(second=0, microsecond=0)
+
+    def _task(self, name, delay, period=None, rate=None, category=None):
+        return Task.objects.create(
+            name=name, command=self.command, status=Task.STATUS_SCHEDULED, category=category,
+            scheduling=self.start + timedelta(seconds=delay),
+            repetition_period=period or "", repetition_rate=rate
+        )
+
+    def test_load_accumulator(self):
+        from eztaskmanager.services.forecast import LoadAccumulator
+
+        acc = LoadAccumulator(4, 60)
+        acc.add_interval(30, 150)  # half of the first bucket, all the second, half of the third
+        acc.add_interval(-100, 10)  # clipped to the start
+        acc.add_rate(180, 0.5)
+        self.assertEqual(acc.loads, [0.5 + 10 / 60, 1.0, 0.5, 0.5])
+
+    def test_compute_forecast(self):
+        from eztaskmanager.services.forecast import compute_forecast
+
+        etl = TaskCategory.objects.create(name="etl")
+        hourly = self._task("hourly", 600, Task.REPETITION_PERIOD_HOUR, 1, category=etl)
+        LaunchReport.objects.create(task=hourly, duration=1200)
+        LaunchReport.objects.create(task=hourly, duration=2400)
+        self._task("every minute", 0, Task.REPETITION_PERIOD_MINUTE, 1)
+        self._task("once", 3600)
+
+        forecast = compute_forecast(hours=3, bucket_minutes=60, start=self.start)
+
+        rows = dict(forecast["rows"])
+        # 30 minutes long hourly runs, starting at 10 past
+        self.assertEqual(rows["etl"], [0.5, 0.5, 0.5])
+        # 60 seconds long runs every minute, plus a single 60 seconds long run in the second hour
+        self.assertEqual(rows["No category"], [1.0, 1.0 + 1 / 60, 1.0])
+        self.assertEqual(forecast["total"], [1.5, 1.5 + 1 / 60, 1.5])
+        self.assertEqual(len(forecast["buckets"]), 3)
+
+    def test_compute_forecast_with_cron(self):
+        from eztaskmanager.services.forecast import compute_forecast
+
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        Task.objects.create(
+            name="twice a day", command=self.command, status=Task.STATUS_SCHEDULED, cron_string="0 6,18 * * *"
+        )
+        Task.objects.create(
+            name="every minute", command=self.command, status=Task.STATUS_SCHEDULED, cron_string="* * * * *"
+        )
+
+        forecast = compute_forecast(hours=24, bucket_minutes=60, start=start)
+
+        # the 60 seconds long runs every minute are a constant load, the others are added at their fire times
+        loads = dict(forecast["rows"])["No category"]
+        self.assertAlmostEqual(loads[6], 1 + 1 / 60)
+        self.assertAlmostEqual(loads[18], 1 + 1 / 60)
+        self.assertAlmostEqual(loads[0], 1.0)
+
+    def test_get_forecast_is_cached(self):
+        from django.core.cache import cache
+        from eztaskmanager.services.forecast import get_forecast
+
+        cache.clear()
+        with patch('eztaskmanager.services.forecast.compute_forecast', return_value={"total": []}) as mock_compute:
+            get_forecast(hours=2)
+            get_forecast(hours=2)
+        mock_compute.assert_called_once_with(hours=2, bucket_minutes=60)
@@ -2,6 +2,7 @@ from unittest.mock import MagicMock, patch
 
 from django.http import JsonResponse
 from django.test import TestCase, RequestFactory
+from django.urls import reverse
 from django.utils import timezone
 
 from eztaskmanager.models import LaunchReport, AppCommand, Task, Log
@@ -184,6 +185,7 @@ class TestAjaxReadLogLines(TestCase):
         expected_response = JsonResponse({
             'new_log_lines': [],  # replace with expected log lines
             'task_status': self.launch_report.task.status,
+            'invocation_result': self.launch_report.invocation_result,
             'log_size': self.launch_report.n_log_lines
         })
         self.assertEqual(response.content, expected_response.content)
@@ -197,6 +199,33 @@ class TestAjaxReadLogLines(TestCase):
         expected_response = JsonResponse({
             'new_log_lines': ["No log for the report {pk}.".format(pk=non_existent_pk), ],
             'task_status': None,
+            'invocation_result': None,
             'log_size': 0
         })
         self.assertEqual(response.content, expected_response.content)
+
+
+class ForecastViewTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        command = AppCommand.objects.create(name='test_command', app_name='eztaskmanager')
+        Task.objects.create(
+            name='hourly', command=command, status=Task.STATUS_SCHEDULED,
+            scheduling=timezone.now() + timezone.timedelta(minutes=10),
+            repetition_period=Task.REPETITION_PERIOD_HOUR, repetition_rate=1
+        )
+
+    def test_requires_staff(self):
+        response = self.client.get(reverse('eztaskmanager:forecast'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_heatmap(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('eztaskmanager:forecast'), {'hours': 6, 'bucket': 30, 'workers': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['buckets']), 12)
+        self.assertEqual([name for name, cells in response.context['rows']], ['No category'])
+        self.assertFalse(any(over for load, over in response.context['total']))
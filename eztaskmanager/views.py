@@ -1,9 +1,13 @@
 """Define Django views for the taskmanager app."""
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import TemplateView
 
 from eztaskmanager.models import LaunchReport
+from eztaskmanager.services.forecast import get_forecast
+from eztaskmanager.settings import EZTASKMANAGER_MAX_CONCURRENCY
 
 
 class LogViewerView(TemplateView):
@@ -87,6 +91,7 @@ class AjaxReadLogLines(LogViewerView):
             JsonResponse: A response object with JSON data containing the following keys:
                 - new_log_lines (list): List of log lines.
                 - task_status (str): The status of the task.
+                - invocation_result (str): The result of the report, empty while running.
                 - log_size (int): The size of the log.
 
         Raises:
@@ -95,11 +100,13 @@ class AjaxReadLogLines(LogViewerView):
         pk = context.get("pk", None)
         offset = int(self.request.GET.get('offset', 0))
         try:
-            report = LaunchReport.objects.get(pk=pk)
+            report = LaunchReport.objects.select_related("task").get(pk=pk)
             task_status = report.task.status
+            invocation_result = report.invocation_result
         except LaunchReport.DoesNotExist:
             log_lines = [_("No log for the report {pk}.").format(pk=pk), ]
             task_status = None
+            invocation_result = None
             log_size = 0
         else:
             log_lines, log_size = report.read_log_lines(offset)
@@ -107,5 +114,52 @@ class AjaxReadLogLines(LogViewerView):
         return JsonResponse({
             'new_log_lines': log_lines,
             'task_status': task_status,
+            'invocation_result': invocation_result,
             'log_size': log_size
         })
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ForecastView(TemplateView):
+    """Show the forecast of the scheduled executions, as a heatmap of the load per category.
+
+    Query parameters:
+        - hours: the forecast horizon (default 24, at most 14 days);
+        - bucket: the width of the time buckets, in minutes (default 60);
+        - workers: the number of tasks the workers can run at once; buckets exceeding it are highlighted.
+    """
+
+    template_name = "forecast.html"
+    max_hours = 14 * 24
+
+    def _int_param(self, name, default, min_value=1, max_value=None):
+        """Return the integer value of a query parameter, within bounds."""
+        try:
+            value = int(self.request.GET.get(name, default))
+        except (TypeError, ValueError):
+            value = default
+        value = max(value, min_value)
+        return min(value, max_value) if max_value else value
+
+    def get_context_data(self, **kwargs):
+        """Return the context data for the view."""
+        context = super().get_context_data(**kwargs)
+        hours = self._int_param("hours", 24, max_value=self.max_hours)
+        bucket_minutes = self._int_param("bucket", 60, min_value=5, max_value=24 * 60)
+        workers = self._int_param("workers", EZTASKMANAGER_MAX_CONCURRENCY or 0, min_value=0)
+
+        forecast = get_forecast(hours=hours, bucket_minutes=bucket_minutes)
+        peak = max(forecast["total"], default=0) or 1
+        context.update({
+            "hours": hours,
+            "bucket_minutes": bucket_minutes,
+            "workers": workers,
+            "buckets": forecast["buckets"],
+            "rows": [
+                (name, [(load, load / peak) for load in loads])
+                for name, loads in forecast["rows"]
+            ],
+            "total": [(load, bool(workers) and load > workers) for load in forecast["total"]],
+            "peak": max(forecast["total"], default=0),
+        })
+        return context